@@ -2,23 +2,26 @@ from datetime import datetime, timedelta
 from airflow.decorators import dag, task
 from airflow.operators.python import BranchPythonOperator
 from airflow.providers.postgres.operators.postgres import PostgresOperator
-from sqlalchemy import create_engine
-from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from airflow.hooks.base import BaseHook
-import os
-import pandas as pd
 import logging
+# the scheduler re-parses this file every parse interval: heavy modules (pandas, pyarrow, SQLAlchemy,
+# psycopg2) are imported inside the task bodies and no database connection is made at import
+from etl_db import create_table_sql, get_engine
+from etl_metrics import start_task_metrics, task_failure_metrics, task_retry_metrics, task_success_metrics
+from etl_tasks import etl_check_quality, etl_ingest, etl_load, etl_transform
 
 
 RAW_DATA_PATH = '/opt/airflow/dags/data/raw/AB_NYC_2019.csv'
-TRANSFORMED_DATA_PATH = '/opt/airflow/dags/data/transformed/AB_NYC_2019_transformed.csv'
+# typed columnar intermediates, XCom only carries their path and metadata
+RAW_ARROW_PATH = '/opt/airflow/dags/data/raw/AB_NYC_2019.arrow'
+TRANSFORMED_DATA_PATH = '/opt/airflow/dags/data/transformed/AB_NYC_2019_transformed.arrow'
+LISTING_HASHES_PATH = '/opt/airflow/dags/data/transformed/AB_NYC_2019_hashes.arrow'
+LOADED_HASHES_PATH = '/opt/airflow/dags/data/state/AB_NYC_2019_loaded_hashes.arrow'
 FAILURE_LOG_FILE_PATH = '/opt/airflow/logs/airflow_failures.log'
 QUALITY_LOG_FILE_PATH = './logs/data_quality_errors.log'
 AIRFLOW_POSTGRES_CONNECTION_ID = 'airflow-airbnb'
 POSTGRES_TABLE_NAME = 'airbnb_listings'
-
-conn = BaseHook.get_connection(AIRFLOW_POSTGRES_CONNECTION_ID)
-engine = create_engine(f"postgresql+psycopg2://{conn.login}:{conn.password}@{conn.host}:{conn.port}/{conn.schema}")
+# only write inserted/updated/deleted listings instead of replacing the whole table
+INCREMENTAL_LOAD = True
 
 
 def failure_callback(context):
@@ -32,7 +35,11 @@ default_args = {
     'email_on_failure': False,
     'retries': 2,
     'retry_delay': timedelta(minutes=5),
-    'on_failure_callback': failure_callback
+    # every task appends its wall/CPU time, rows, bytes, peak RSS and DB round trips to etl_metrics.METRICS_FILE_PATH
+    'on_execute_callback': start_task_metrics,
+    'on_success_callback': task_success_metrics,
+    'on_retry_callback': task_retry_metrics,
+    'on_failure_callback': [failure_callback, task_failure_metrics]
 }
 
 @dag(
@@ -46,101 +53,83 @@ def nyc_airbnb_etl_dag():
     @task
     def ingest_data_task():
         """
-        Check if file 
+        Check if file exists and parse it once into a typed Arrow file
         """
-        if not os.path.exists(RAW_DATA_PATH):
-            raise FileNotFoundError(f"File {RAW_DATA_PATH} does not exist.")
-        df = pd.read_csv(RAW_DATA_PATH)
         logging.info("------------Data ingestion-----------")
-        logging.info(f"File path - {RAW_DATA_PATH}")
+        raw = etl_ingest(RAW_DATA_PATH, RAW_ARROW_PATH)
         logging.info("Data ingestion completed.")
-        return df
+        return raw
 
     @task
-    def transform_data_task():
+    def transform_data_task(raw):
         """
-        Read all data and make all necessary transformations: filtering, cleaning, format converting, nan-value handling
+        Stream raw data in fixed-size chunks and make all necessary transformations: filtering, cleaning, format converting, nan-value handling
         """
-        data = pd.read_csv(RAW_DATA_PATH)
-        # Filter out rows where price is 0 or negative
-        data = data[data['price'] > 0]
-        # Convert last_review to a datetime object
-        data['last_review'] = pd.to_datetime(data['last_review'], errors='coerce')
-        # Handle missing (if any) last_review dates by filling them with the earliest date in the dataset or a default date.
-        earliest_date = data['last_review'].min()
-        data['last_review'].fillna(earliest_date, inplace=True)
-        # Handle missing values in reviews_per_month by filling them with 0.
-        data['reviews_per_month'].fillna(0, inplace=True)
-        # Drop any rows(if any) with missing latitude or longitude values
-        data.dropna(axis='index', how='any', subset=['latitude', 'longitude'], inplace=True)
-        data.to_csv(TRANSFORMED_DATA_PATH, index=False)
+        transformed = etl_transform(raw, TRANSFORMED_DATA_PATH, LISTING_HASHES_PATH)
         logging.info("Data transformation completed.")
+        return transformed
 
 
     # check if target table exists
     create_listing_table = PostgresOperator(
         task_id="create_employees_temp_table",
         postgres_conn_id=AIRFLOW_POSTGRES_CONNECTION_ID,
-        sql="""
-            CREATE TABLE IF NOT EXISTS {} (
-                id SERIAL PRIMARY KEY,
-                name TEXT,
-                host_id INTEGER,
-                host_name TEXT,
-                neighbourhood_group TEXT,
-                neighbourhood TEXT,
-                latitude DECIMAL(9,6),
-                longitude DECIMAL(9,6),
-                room_type TEXT,
-                price INTEGER,
-                minimum_nights INTEGER,
-                number_of_reviews INTEGER,
-                last_review DATE,
-                reviews_per_month DECIMAL(5,2),
-                calculated_host_listings_count INTEGER,
-                availability_365 INTEGER
-        );""".format(POSTGRES_TABLE_NAME)
+        sql=create_table_sql(POSTGRES_TABLE_NAME)
     )
     
     @task
-    def load_data_to_postgres():
+    def load_data_to_postgres(transformed):
         """"
-        Load processed data from .csv file to a postgres table
+        Load processed data from Arrow file to a postgres table: COPY into a staging table and swap it in,
+        or upsert only the changed listings in incremental mode
         """
+        import psycopg2
+        from sqlalchemy.exc import SQLAlchemyError
         try:
-            df = pd.read_csv(TRANSFORMED_DATA_PATH)
-            df.to_sql(POSTGRES_TABLE_NAME, con=engine, if_exists='replace', index=False, method='multi')
+            connection = get_engine(AIRFLOW_POSTGRES_CONNECTION_ID).raw_connection()
+            try:
+                if INCREMENTAL_LOAD:
+                    etl_load(connection, transformed, POSTGRES_TABLE_NAME, LISTING_HASHES_PATH, LOADED_HASHES_PATH)
+                else:
+                    etl_load(connection, transformed, POSTGRES_TABLE_NAME)
+            finally:
+                connection.close()
         except SQLAlchemyError as sae:
             logging.info("SQLAlchemy error occurred while loading data.")
             logging.info(f"Error details: {sae}")
         except FileNotFoundError:
-            logging.info(f"Error: The file at {TRANSFORMED_DATA_PATH} was not found.")
-        except pd.errors.ParserError:
-            logging.info("Error reading the CSV file. Please check the file format and contents.")
+            logging.info(f"Error: The file at {transformed['path']} was not found.")
+        except psycopg2.Error as pe:
+            logging.info("Error while copying the transformed data into PostgreSQL. Please check the file contents.")
+            logging.info(f"Error details: {pe}")
         except Exception as e:
             logging.info("An unexpected error occurred while loading data to PostgreSQL.")
             logging.info(f"Error details: {e}")
 
-    def check_data_quality():
+    def check_data_quality(ti):
+        """
+        Combine the rule report of the transform with one aggregate query over the loaded table and branch on it
+        """
+        import psycopg2
+        from sqlalchemy.exc import SQLAlchemyError
+        from etl_quality import failed_rules
         try:
-            df = pd.read_csv(TRANSFORMED_DATA_PATH)
-            expected_count = len(df)
-            actual_count = pd.read_sql(f"SELECT COUNT(*) FROM {POSTGRES_TABLE_NAME}", con=engine).iloc[0, 0]
-            if actual_count != expected_count:
-                logging.info(f"Data quality check failed: Expected {expected_count} rows, but found {actual_count} in the table.")
-                return 'log_error'
-            null_check_query = f"""
-                SELECT COUNT(*) FROM {POSTGRES_TABLE_NAME}
-                WHERE price IS NULL OR minimum_nights IS NULL OR availability_365 IS NULL;
-            """
-            null_count = pd.read_sql(null_check_query, con=engine).iloc[0, 0]
-            if null_count > 0:
-                logging.info(f"Data quality check failed: Found {null_count} NULL values in critical columns.")
+            transformed = ti.xcom_pull(task_ids='transform_data_task')
+            connection = get_engine(AIRFLOW_POSTGRES_CONNECTION_ID).raw_connection()
+            try:
+                report = etl_check_quality(connection, transformed, POSTGRES_TABLE_NAME)
+            finally:
+                connection.close()
+            ti.xcom_push(key='quality_report', value=report)
+            for result in report['rules']:
+                logging.info(f"{result['source']}.{result['name']}: value={result['value']}, passed={result['passed']}, seconds={result['seconds']}")
+            if not report['passed']:
+                logging.info(f"Data quality check failed: {', '.join(failed_rules(report))}")
                 return 'log_error'
             logging.info("Data quality checks passed successfully.")
             return 'proceed'
-        except SQLAlchemyError as e:
-            logging.info(f"SQLAlchemy error during data quality checks: {e}")
+        except (SQLAlchemyError, psycopg2.Error) as e:
+            logging.info(f"Database error during data quality checks: {e}")
             return 'log_error'
         
     quality_check_task = BranchPythonOperator(
@@ -155,13 +144,18 @@ def nyc_airbnb_etl_dag():
         logging.info("Test were passed")
 
     @task
-    def log_error():
+    def log_error(ti=None):
+        from etl_quality import failed_rules
+        report = ti.xcom_pull(task_ids='data_quality_checks', key='quality_report')
         with open(QUALITY_LOG_FILE_PATH, 'a') as log_file:
             log_file.write("Data quality checks failed. See above for details.\n")
+            if report:
+                log_file.write(f"Failed rules: {', '.join(failed_rules(report))}\n")
         logging.info("Error logged and further processing stopped.")
 
 
-    ingest_data_task() >> transform_data_task() >> create_listing_table >> load_data_to_postgres() >> quality_check_task
+    transformed = transform_data_task(ingest_data_task())
+    transformed >> create_listing_table >> load_data_to_postgres(transformed) >> quality_check_task
     quality_check_task >> log_error()
     quality_check_task >> proceed()
 
@@ -0,0 +1,82 @@
+"""
+Database access for the NYC Airbnb ETL DAG. Only standard library modules are imported at module level,
+so the DAG file stays cheap to parse: the Airflow connection and the SQLAlchemy engine are created
+on first use inside a task and reused by all tasks of the worker process
+"""
+import os
+
+
+LISTING_TABLE_COLUMNS_SQL = """
+    id SERIAL{primary_key},
+    name TEXT,
+    host_id INTEGER,
+    host_name TEXT,
+    neighbourhood_group TEXT,
+    neighbourhood TEXT,
+    latitude DECIMAL(9,6),
+    longitude DECIMAL(9,6),
+    room_type TEXT,
+    price INTEGER,
+    minimum_nights INTEGER,
+    number_of_reviews INTEGER,
+    last_review DATE,
+    reviews_per_month DECIMAL(5,2),
+    calculated_host_listings_count INTEGER,
+    availability_365 INTEGER
+"""
+# one engine per connection id and worker process
+_engines = {}
+
+
+def create_table_sql(table_name: str, primary_key: bool = True) -> str:
+    columns = LISTING_TABLE_COLUMNS_SQL.format(primary_key=' PRIMARY KEY' if primary_key else '')
+    return f"CREATE TABLE IF NOT EXISTS {table_name} ({columns});"
+
+
+def counting_cursor_class():
+    """
+    psycopg2 cursor that reports every statement and COPY to the task metrics as a database round trip
+    """
+    import psycopg2.extensions
+    from etl_metrics import count_db_round_trip
+
+    class CountingCursor(psycopg2.extensions.cursor):
+        def execute(self, query, vars=None):
+            count_db_round_trip()
+            return super().execute(query, vars)
+
+        def executemany(self, query, vars_list):
+            count_db_round_trip()
+            return super().executemany(query, vars_list)
+
+        def copy_expert(self, sql, file, size=8192):
+            count_db_round_trip()
+            return super().copy_expert(sql, file, size)
+
+    return CountingCursor
+
+
+def get_engine(connection_id: str):
+    """
+    Pooled SQLAlchemy engine of an Airflow connection, created once per worker process
+    """
+    if connection_id not in _engines:
+        from airflow.hooks.base import BaseHook
+        from sqlalchemy import create_engine
+        conn = BaseHook.get_connection(connection_id)
+        _engines[connection_id] = create_engine(
+            f"postgresql+psycopg2://{conn.login}:{conn.password}@{conn.host}:{conn.port}/{conn.schema}",
+            pool_pre_ping=True,
+            connect_args={'cursor_factory': counting_cursor_class()},
+        )
+    return _engines[connection_id]
+
+
+def _forget_engines_after_fork():
+    # pooled connections of the parent process must not be shared with a forked task process
+    for engine in _engines.values():
+        engine.dispose(close=False)
+    _engines.clear()
+
+
+os.register_at_fork(after_in_child=_forget_engines_after_fork)
@@ -0,0 +1,141 @@
+"""
+Bulk loading helpers for the NYC Airbnb ETL DAG
+"""
+import io
+import os
+import time
+import logging
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from etl_db import create_table_sql
+from etl_storage import open_arrow, write_csv_batch
+
+
+# secondary indexes are built on the staging table after the data is copied
+LISTING_INDEX_COLUMNS = ['neighbourhood_group', 'room_type']
+COPY_CHUNK_SIZE = 100_000
+DELETE_BATCH_SIZE = 10_000
+
+
+def copy_arrow_rows(cursor, table: pa.Table, table_name: str) -> int:
+    """
+    COPY the rows of an Arrow table into table_name in chunks of COPY_CHUNK_SIZE rows
+    """
+    columns = ', '.join(table.column_names)
+    rows = 0
+    for batch in table.to_batches(max_chunksize=COPY_CHUNK_SIZE):
+        buffer = io.BytesIO()
+        write_csv_batch(batch, buffer)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        rows += cursor.rowcount
+    return rows
+
+
+def copy_load_arrow(connection, arrow_path: str, table_name: str, index_columns=LISTING_INDEX_COLUMNS) -> dict:
+    """
+    Stream a transformed Arrow file into a staging table with COPY FROM STDIN, build the primary key
+    and indexes after the load and swap staging into table_name in a single transaction.
+    connection is a DBAPI (psycopg2) connection, so any Postgres instance can be used
+    """
+    staging_name = f"{table_name}_staging"
+    data = open_arrow(arrow_path)
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {staging_name};")
+        cursor.execute(create_table_sql(staging_name, primary_key=False))
+        rows = copy_arrow_rows(cursor, data, staging_name)
+        copy_seconds = time.perf_counter() - start
+        cursor.execute(f"ALTER TABLE {staging_name} ADD CONSTRAINT {staging_name}_pkey PRIMARY KEY (id);")
+        for column in index_columns:
+            cursor.execute(f"CREATE INDEX {staging_name}_{column}_idx ON {staging_name} ({column});")
+        cursor.execute(f"SELECT setval(pg_get_serial_sequence('{staging_name}', 'id'), COALESCE(MAX(id), 1)) FROM {staging_name};")
+        # swap: readers keep seeing the old table until commit
+        cursor.execute(f"DROP TABLE IF EXISTS {table_name};")
+        cursor.execute(f"ALTER TABLE {staging_name} RENAME TO {table_name};")
+        cursor.execute(f"ALTER INDEX {staging_name}_pkey RENAME TO {table_name}_pkey;")
+        for column in index_columns:
+            cursor.execute(f"ALTER INDEX {staging_name}_{column}_idx RENAME TO {table_name}_{column}_idx;")
+        cursor.execute(f"ALTER SEQUENCE {staging_name}_id_seq RENAME TO {table_name}_id_seq;")
+    connection.commit()
+    total_seconds = time.perf_counter() - start
+    stats = {
+        'rows': rows,
+        'copy_seconds': copy_seconds,
+        'total_seconds': total_seconds,
+        'rows_per_second': rows / copy_seconds if copy_seconds else float('inf'),
+    }
+    logging.info(f"Loaded {rows} rows into {table_name}: {stats['rows_per_second']:.0f} rows/sec (COPY), {total_seconds:.2f}s total")
+    return stats
+
+
+def read_listing_hashes(hash_path: str) -> pd.Series:
+    return open_arrow(hash_path).to_pandas().set_index('id')['row_hash']
+
+
+def diff_listing_hashes(current: pd.Series, previous: pd.Series) -> dict:
+    """
+    Ids of inserted, updated and deleted listings between two runs
+    """
+    common = current.index.intersection(previous.index)
+    changed = current.loc[common].to_numpy() != previous.loc[common].to_numpy()
+    return {
+        'inserted': current.index.difference(previous.index),
+        'updated': common[changed],
+        'deleted': previous.index.difference(current.index),
+    }
+
+
+def upsert_load_arrow(connection, arrow_path: str, hash_path: str, loaded_hash_path: str, table_name: str) -> dict:
+    """
+    Write only the listings that changed since the previous load: changed rows are copied into a
+    temporary table and merged with INSERT ... ON CONFLICT, removed listings are deleted in batches.
+    loaded_hash_path keeps the hashes of the rows that are currently in the table; without it
+    (first run, lost state or a table that does not match it) the full COPY load is used
+    """
+    current = read_listing_hashes(hash_path)
+    previous = read_listing_hashes(loaded_hash_path) if os.path.exists(loaded_hash_path) else None
+    if previous is not None:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {table_name};")
+            if cursor.fetchone()[0] != len(previous):
+                previous = None
+    if previous is None:
+        logging.info(f"No previous load state for {table_name}, falling back to the full load.")
+        stats = copy_load_arrow(connection, arrow_path, table_name)
+        os.replace(hash_path, loaded_hash_path)
+        return stats
+
+    start = time.perf_counter()
+    diff = diff_listing_hashes(current, previous)
+    changed_ids = diff['inserted'].union(diff['updated'])
+    temp_name = f"{table_name}_changes"
+    data = open_arrow(arrow_path)
+    columns = ', '.join(data.column_names)
+    updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in data.column_names if column != 'id')
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE TEMP TABLE {temp_name} (LIKE {table_name}) ON COMMIT DROP;")
+        if len(changed_ids):
+            changed = data.filter(pc.is_in(data.column('id'), value_set=pa.array(changed_ids.to_numpy())))
+            copy_arrow_rows(cursor, changed, temp_name)
+            cursor.execute(f"""
+                INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {temp_name}
+                ON CONFLICT (id) DO UPDATE SET {updates};
+            """)
+        deleted_ids = diff['deleted'].tolist()
+        for i in range(0, len(deleted_ids), DELETE_BATCH_SIZE):
+            cursor.execute(f"DELETE FROM {table_name} WHERE id = ANY(%s);", (deleted_ids[i:i + DELETE_BATCH_SIZE],))
+    connection.commit()
+    # the table now matches the current hashes
+    os.replace(hash_path, loaded_hash_path)
+    stats = {
+        'inserted': len(diff['inserted']),
+        'updated': len(diff['updated']),
+        'deleted': len(diff['deleted']),
+        'unchanged': len(current) - len(changed_ids),
+        'total_seconds': time.perf_counter() - start,
+    }
+    logging.info(f"Upserted {table_name}: {stats['inserted']} inserted, {stats['updated']} updated, "
+                 f"{stats['deleted']} deleted, {stats['unchanged']} unchanged in {stats['total_seconds']:.2f}s")
+    return stats
@@ -0,0 +1,129 @@
+"""
+Per-task performance telemetry for the NYC Airbnb ETL DAG: wall time, CPU time, rows in/out,
+bytes read/written, peak RSS and database round trips of every task are appended as one JSON line
+to METRICS_FILE_PATH by the task callbacks. Only standard library modules are imported, the
+callbacks are referenced by the DAG file at parse time
+"""
+import json
+import time
+import resource
+from datetime import datetime, timezone
+
+
+METRICS_FILE_PATH = '/opt/airflow/logs/etl_task_metrics.jsonl'
+
+# state of the task running in this process, set by the callbacks and by the task body
+_task_start = {}
+_task_counters = {}
+_db_round_trips = 0
+
+
+def count_db_round_trip():
+    global _db_round_trips
+    _db_round_trips += 1
+
+
+def record_task_metrics(rows_in: int = None, rows_out: int = None, bytes_in: int = None, bytes_out: int = None):
+    """
+    Called from a task body to report the logical amount of data it consumed and produced
+    """
+    _task_counters.update({key: value for key, value in
+                           {'rows_in': rows_in, 'rows_out': rows_out, 'bytes_in': bytes_in, 'bytes_out': bytes_out}.items()
+                           if value is not None})
+
+
+def _cpu_seconds() -> float:
+    usage_self = resource.getrusage(resource.RUSAGE_SELF)
+    # finished worker processes, e.g. of the parallel transform
+    usage_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage_self.ru_utime + usage_self.ru_stime + usage_children.ru_utime + usage_children.ru_stime
+
+
+def _process_io() -> dict:
+    """
+    Bytes passed through read/write system calls of this process (memory-mapped reads are not included)
+    """
+    try:
+        with open('/proc/self/io') as io_file:
+            counters = dict(line.split(': ') for line in io_file.read().splitlines())
+        return {'read': int(counters['rchar']), 'write': int(counters['wchar'])}
+    except (OSError, KeyError, ValueError):
+        return {'read': 0, 'write': 0}
+
+
+def _reset_peak_rss():
+    # Linux only: resets VmHWM, so the peak RSS of the task is not hidden by the peak of the parent process
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss_bytes() -> int:
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def start_task_metrics(context):
+    """
+    on_execute_callback: take the start snapshot of the task process
+    """
+    global _db_round_trips
+    _reset_peak_rss()
+    _task_counters.clear()
+    _db_round_trips = 0
+    _task_start.update({'wall': time.perf_counter(), 'cpu': _cpu_seconds(), 'io': _process_io()})
+
+
+def task_metrics(context, state: str) -> dict:
+    task_instance = context['task_instance']
+    io_counters = _process_io()
+    wall_seconds = time.perf_counter() - _task_start['wall'] if _task_start else None
+    metrics = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'dag_id': task_instance.dag_id,
+        'task_id': task_instance.task_id,
+        'run_id': task_instance.run_id,
+        'try_number': task_instance.try_number,
+        'state': state,
+        'wall_seconds': wall_seconds,
+        'cpu_seconds': _cpu_seconds() - _task_start['cpu'] if _task_start else None,
+        'rows_in': _task_counters.get('rows_in'),
+        'rows_out': _task_counters.get('rows_out'),
+        'bytes_in': _task_counters.get('bytes_in'),
+        'bytes_out': _task_counters.get('bytes_out'),
+        'io_read_bytes': io_counters['read'] - _task_start['io']['read'] if _task_start else None,
+        'io_write_bytes': io_counters['write'] - _task_start['io']['write'] if _task_start else None,
+        'peak_rss_bytes': _peak_rss_bytes(),
+        'peak_rss_children_bytes': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+        'db_round_trips': _db_round_trips,
+    }
+    rows = metrics['rows_out'] if metrics['rows_out'] is not None else metrics['rows_in']
+    metrics['rows_per_second'] = rows / wall_seconds if rows is not None and wall_seconds else None
+    if 'exception' in context and context['exception'] is not None:
+        metrics['error'] = repr(context['exception'])
+    return metrics
+
+
+def write_task_metrics(metrics: dict, path: str = METRICS_FILE_PATH):
+    with open(path, 'a') as metrics_file:
+        metrics_file.write(json.dumps(metrics, default=str) + '\n')
+
+
+def task_success_metrics(context):
+    write_task_metrics(task_metrics(context, 'success'))
+
+
+def task_failure_metrics(context):
+    write_task_metrics(task_metrics(context, 'failed'))
+
+
+def task_retry_metrics(context):
+    write_task_metrics(task_metrics(context, 'up_for_retry'))
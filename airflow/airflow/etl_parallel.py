@@ -0,0 +1,152 @@
+"""
+Parallel sharded transform of large raw listing files for the NYC Airbnb ETL DAG.
+The raw .csv file is split into byte ranges on record boundaries, every shard is parsed and
+cleaned in a process pool, and the shards are merged in file order into the transformed Arrow file
+"""
+import csv
+import os
+import mmap
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from etl_storage import HASH_SCHEMA, LISTING_SCHEMA, ArrowFileWriter, arrow_metadata, open_arrow, read_csv_batches
+from etl_transform import TRANSFORM_CHUNK_SIZE, clean_chunk, find_earliest_review_date, listing_hashes
+from etl_quality import QualityAccumulator
+
+
+QUOTE_COUNT_BLOCK_SIZE = 64 << 20
+
+
+def _count_quotes(mm, start: int, end: int) -> int:
+    quotes = 0
+    for block_start in range(start, end, QUOTE_COUNT_BLOCK_SIZE):
+        quotes += mm[block_start:min(block_start + QUOTE_COUNT_BLOCK_SIZE, end)].count(b'"')
+    return quotes
+
+
+def _record_end(mm, position: int, in_quotes: bool) -> int:
+    """
+    Offset right after the first line break at or after position that is not inside a quoted field
+    """
+    while True:
+        line_end = mm.find(b'\n', position)
+        if line_end == -1:
+            return len(mm)
+        in_quotes ^= _count_quotes(mm, position, line_end) % 2 == 1
+        if not in_quotes:
+            return line_end + 1
+        position = line_end + 1
+
+
+def find_shard_ranges(csv_path: str, n_shards: int) -> tuple:
+    """
+    Split the data part of a .csv file into at most n_shards byte ranges that start and end on record
+    boundaries. Line breaks inside quoted fields (e.g. in name) are skipped by tracking the quote parity,
+    which costs one quote-counting pass over the bytes. Returns the header columns and the ranges
+    """
+    with open(csv_path, 'rb') as csv_file, mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header_end = _record_end(mm, 0, False)
+        column_names = next(csv.reader([mm[:header_end].decode()]))
+        size = len(mm)
+        ranges = []
+        start = header_end
+        for k in range(1, n_shards + 1):
+            target = header_end + (size - header_end) * k // n_shards
+            if target <= start:
+                continue
+            # start is a record boundary, so the quote parity there is even
+            in_quotes = _count_quotes(mm, start, target) % 2 == 1
+            end = _record_end(mm, target, in_quotes) if k < n_shards else size
+            ranges.append((start, end))
+            start = end
+    return column_names, [(start, end) for start, end in ranges if end > start]
+
+
+def _clean_shard(csv_path: str, start: int, end: int, column_names: list, shard_path: str, chunksize: int):
+    """
+    Parse and clean one byte range of the raw file. The missing last_review dates are left empty,
+    they are filled with the global earliest date when the shards are merged. Returns the shard's earliest date
+    """
+    data = pa.memory_map(csv_path, 'r').read_at(end - start, start)
+    shard_earliest = pd.NaT
+    with ArrowFileWriter(shard_path) as writer:
+        for table in read_csv_batches(pa.BufferReader(data), LISTING_SCHEMA, column_names):
+            table_earliest = find_earliest_review_date(table)
+            if pd.notna(table_earliest) and (pd.isna(shard_earliest) or table_earliest < shard_earliest):
+                shard_earliest = table_earliest
+            for batch in table.to_batches(max_chunksize=chunksize):
+                writer.write_frame(clean_chunk(batch.to_pandas(date_as_object=False), pd.NaT))
+    return shard_earliest
+
+
+def _fill_missing_dates(batch: pa.RecordBatch, fill_value: pa.Scalar) -> pa.RecordBatch:
+    index = batch.schema.get_field_index('last_review')
+    return batch.set_column(index, 'last_review', pc.fill_null(batch.column('last_review'), fill_value))
+
+
+def _check_shard(shard_path: str, fill_value: pa.Scalar, chunksize: int, hash_path: str, quality_rules: list):
+    """
+    Write the hashes of a cleaned shard and check the quality rules on it, as if its missing dates were filled
+    """
+    quality = QualityAccumulator(quality_rules) if quality_rules else None
+    with ArrowFileWriter(hash_path, HASH_SCHEMA) if hash_path else nullcontext() as hash_writer:
+        for batch in open_arrow(shard_path).to_batches(max_chunksize=chunksize):
+            cleaned = _fill_missing_dates(batch, fill_value).to_pandas(date_as_object=False)
+            if hash_path:
+                hash_writer.write_frame(listing_hashes(cleaned))
+            if quality:
+                quality.update(cleaned)
+    return quality
+
+
+def _append_arrow(writer: ArrowFileWriter, path: str, fill_value: pa.Scalar = None):
+    for batch in open_arrow(path).to_batches():
+        if fill_value is not None:
+            batch = _fill_missing_dates(batch, fill_value)
+        writer.write_table(pa.Table.from_batches([batch]))
+    os.remove(path)
+
+
+def parallel_transform(raw_csv_path: str, output_path: str, workers: int = None, chunksize: int = TRANSFORM_CHUNK_SIZE,
+                       hash_path: str = None, quality_rules: list = None) -> dict:
+    """
+    Same result as csv_to_arrow + stream_transform, computed by workers processes.
+    The global earliest last_review date is reduced from the per-shard minimums before the deferred fill.
+    Returns metadata of the output file
+    """
+    workers = workers or os.cpu_count()
+    column_names, ranges = find_shard_ranges(raw_csv_path, workers)
+    shard_paths = [f"{output_path}.shard{i}" for i in range(len(ranges))]
+    hash_paths = [f"{hash_path}.shard{i}" if hash_path else None for i in range(len(ranges))]
+    # spawn: the task process may run threads, which do not survive a fork
+    with ProcessPoolExecutor(max_workers=max(1, len(ranges)), mp_context=multiprocessing.get_context('spawn')) as pool:
+        shard_minimums = list(pool.map(_clean_shard, [raw_csv_path] * len(ranges), *zip(*ranges),
+                                       [column_names] * len(ranges), shard_paths, [chunksize] * len(ranges)))
+        earliest_dates = [date for date in shard_minimums if pd.notna(date)]
+        earliest_date = min(earliest_dates) if earliest_dates else pd.NaT
+        logging.info(f"Earliest last_review date - {earliest_date}")
+        fill_value = pa.scalar(None if pd.isna(earliest_date) else earliest_date.date(), pa.date32())
+        qualities = []
+        if hash_path or quality_rules:
+            qualities = list(pool.map(_check_shard, shard_paths, [fill_value] * len(ranges), [chunksize] * len(ranges),
+                                      hash_paths, [quality_rules] * len(ranges)))
+
+    # the deferred fill of missing dates happens while the shards are merged in file order
+    with ArrowFileWriter(output_path) as writer:
+        for shard_path in shard_paths:
+            _append_arrow(writer, shard_path, fill_value)
+    if hash_path:
+        with ArrowFileWriter(hash_path, HASH_SCHEMA) as hash_writer:
+            for shard_hash_path in hash_paths:
+                _append_arrow(hash_writer, shard_hash_path)
+    metadata = arrow_metadata(output_path, writer.num_rows)
+    if quality_rules:
+        quality = QualityAccumulator(quality_rules)
+        for shard_quality in qualities:
+            quality.merge(shard_quality)
+        metadata['quality'] = quality.report()
+    return metadata
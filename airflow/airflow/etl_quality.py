@@ -0,0 +1,156 @@
+"""
+Declarative data quality rules for the NYC Airbnb ETL DAG.
+Rules are checked chunk by chunk during the transform (one vectorized pass over the data)
+and on the database side with a single aggregate query; both produce a structured report
+"""
+import time
+import numpy as np
+import pandas as pd
+
+
+QUALITY_RULES = [
+    {'name': 'row_count', 'type': 'row_count'},
+    {'name': 'critical_columns_not_null', 'type': 'not_null', 'columns': ['price', 'minimum_nights', 'availability_365']},
+    {'name': 'price_range', 'type': 'range', 'column': 'price', 'min': 1},
+    {'name': 'minimum_nights_range', 'type': 'range', 'column': 'minimum_nights', 'min': 1},
+    {'name': 'availability_365_range', 'type': 'range', 'column': 'availability_365', 'min': 0, 'max': 365},
+    {'name': 'latitude_range', 'type': 'range', 'column': 'latitude', 'min': 40.4, 'max': 41.0},
+    {'name': 'longitude_range', 'type': 'range', 'column': 'longitude', 'min': -74.3, 'max': -73.6},
+    {'name': 'unique_id', 'type': 'unique', 'column': 'id'},
+    {'name': 'room_type_values', 'type': 'allowed_values', 'column': 'room_type',
+     'values': ['Entire home/apt', 'Private room', 'Shared room']},
+]
+
+
+def _chunk_violations(rule: dict, chunk: pd.DataFrame) -> int:
+    if rule['type'] == 'not_null':
+        return int(chunk[rule['columns']].isna().any(axis=1).sum())
+    if rule['type'] == 'range':
+        column = chunk[rule['column']]
+        outside = np.zeros(len(column), dtype=bool)
+        if 'min' in rule:
+            outside |= (column < rule['min']).to_numpy()
+        if 'max' in rule:
+            outside |= (column > rule['max']).to_numpy()
+        return int(outside.sum())
+    if rule['type'] == 'allowed_values':
+        column = chunk[rule['column']]
+        return int((column.notna() & ~column.isin(rule['values'])).sum())
+    raise ValueError(f"Unknown rule type {rule['type']}")
+
+
+def _violations_sql(rule: dict) -> str:
+    if rule['type'] == 'row_count':
+        return "COUNT(*)"
+    if rule['type'] == 'not_null':
+        condition = ' OR '.join(f"{column} IS NULL" for column in rule['columns'])
+    elif rule['type'] == 'range':
+        bounds = []
+        if 'min' in rule:
+            bounds.append(f"{rule['column']} < {rule['min']}")
+        if 'max' in rule:
+            bounds.append(f"{rule['column']} > {rule['max']}")
+        condition = ' OR '.join(bounds)
+    elif rule['type'] == 'unique':
+        return f"COUNT({rule['column']}) - COUNT(DISTINCT {rule['column']})"
+    elif rule['type'] == 'allowed_values':
+        values = ', '.join("'{}'".format(value.replace("'", "''")) for value in rule['values'])
+        condition = f"{rule['column']} NOT IN ({values})"
+    else:
+        raise ValueError(f"Unknown rule type {rule['type']}")
+    return f"COUNT(*) FILTER (WHERE {condition})"
+
+
+def _rule_result(rule: dict, source: str, value: int, seconds: float = None, passed: bool = None) -> dict:
+    """
+    value is the number of rows for row_count rules and the number of violating rows for the rest
+    """
+    return {
+        'name': rule['name'],
+        'type': rule['type'],
+        'source': source,
+        'value': int(value),
+        'passed': bool(value == 0 if passed is None else passed),
+        'seconds': seconds,
+    }
+
+
+class QualityAccumulator:
+    """
+    Check the rules on every transformed chunk and keep only per-rule counters
+    (plus the keys of unique rules), so the data itself is scanned once
+    """
+    def __init__(self, rules=QUALITY_RULES):
+        self.rules = rules
+        self.rows = 0
+        self.violations = {rule['name']: 0 for rule in rules}
+        self.seconds = {rule['name']: 0.0 for rule in rules}
+        self._keys = {rule['name']: [] for rule in rules if rule['type'] == 'unique'}
+
+    def update(self, chunk: pd.DataFrame):
+        self.rows += len(chunk)
+        for rule in self.rules:
+            start = time.perf_counter()
+            if rule['type'] == 'unique':
+                self._keys[rule['name']].append(chunk[rule['column']].to_numpy())
+            elif rule['type'] != 'row_count':
+                self.violations[rule['name']] += _chunk_violations(rule, chunk)
+            self.seconds[rule['name']] += time.perf_counter() - start
+
+    def merge(self, other: 'QualityAccumulator'):
+        """
+        Combine the counters of an accumulator that checked another part of the data (e.g. another shard)
+        """
+        self.rows += other.rows
+        for name in self.violations:
+            self.violations[name] += other.violations[name]
+            self.seconds[name] += other.seconds[name]
+        for name in self._keys:
+            self._keys[name].extend(other._keys[name])
+
+    def report(self) -> dict:
+        results = []
+        for rule in self.rules:
+            start = time.perf_counter()
+            if rule['type'] == 'unique':
+                keys = np.concatenate(self._keys[rule['name']]) if self._keys[rule['name']] else np.array([])
+                self.violations[rule['name']] = len(keys) - len(np.unique(keys))
+            self.seconds[rule['name']] += time.perf_counter() - start
+            if rule['type'] == 'row_count':
+                results.append(_rule_result(rule, 'transform', self.rows, self.seconds[rule['name']], passed=self.rows > 0))
+            else:
+                results.append(_rule_result(rule, 'transform', self.violations[rule['name']], self.seconds[rule['name']]))
+        return {'passed': all(result['passed'] for result in results), 'rules': results}
+
+
+def check_table_quality(connection, table_name: str, expected_rows: int, rules=QUALITY_RULES) -> dict:
+    """
+    Check all rules on the loaded table with one combined aggregate query (a single table scan).
+    The row_count rule passes when the table holds exactly expected_rows rows. Rules share one query,
+    so its time is reported once for the whole report
+    """
+    expressions = ',\n'.join(f"{_violations_sql(rule)} AS {rule['name']}" for rule in rules)
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {expressions} FROM {table_name};")
+        row = cursor.fetchone()
+    seconds = time.perf_counter() - start
+    results = []
+    for rule, value in zip(rules, row):
+        if rule['type'] == 'row_count':
+            results.append(_rule_result(rule, 'database', value, passed=value == expected_rows))
+        else:
+            results.append(_rule_result(rule, 'database', value))
+    return {'passed': all(result['passed'] for result in results), 'seconds': seconds, 'rules': results}
+
+
+def merge_quality_reports(transform_report: dict, database_report: dict) -> dict:
+    return {
+        'passed': transform_report['passed'] and database_report['passed'],
+        'database_seconds': database_report['seconds'],
+        'rules': transform_report['rules'] + database_report['rules'],
+    }
+
+
+def failed_rules(report: dict) -> list:
+    return [f"{result['source']}.{result['name']}: {result['value']}" for result in report['rules'] if not result['passed']]
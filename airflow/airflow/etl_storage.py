@@ -0,0 +1,130 @@
+"""
+Typed columnar (Arrow IPC) intermediate files passed between the tasks of the NYC Airbnb ETL DAG.
+Files are written once with an explicit schema and opened memory-mapped, XCom only carries
+the path and metadata returned by arrow_metadata
+"""
+import json
+import os
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from airbnb_schema import arrow_schema
+from csv_cache import FINGERPRINT_KEY, fingerprint, is_current
+
+
+# compact column types shared with the analysis scripts, see common/airbnb_schema.py
+LISTING_SCHEMA = arrow_schema()
+# content hash of every transformed listing, see etl_transform.listing_hashes
+HASH_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('row_hash', pa.uint64()),
+])
+CSV_BLOCK_SIZE = 16 << 20
+
+
+class ArrowFileWriter:
+    """
+    Append record batches to an Arrow IPC file; the file appears at path only after a successful close
+    """
+    def __init__(self, path: str, schema: pa.Schema = LISTING_SCHEMA):
+        self.path = path
+        self.schema = schema
+        self.num_rows = 0
+        self._tmp_path = f"{path}.tmp"
+
+    def __enter__(self):
+        self._sink = pa.OSFile(self._tmp_path, 'wb')
+        self._writer = pa.ipc.new_file(self._sink, self.schema)
+        return self
+
+    def write_frame(self, df):
+        self.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+
+    def write_table(self, table: pa.Table):
+        self._writer.write_table(table)
+        self.num_rows += table.num_rows
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._writer.close()
+        self._sink.close()
+        if exc_type is None:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
+
+
+def open_arrow(path: str) -> pa.Table:
+    """
+    Zero-copy, memory-mapped view of an Arrow IPC file: only the touched columns are paged in
+    """
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def arrow_metadata(path: str, num_rows: int) -> dict:
+    return {'path': path, 'format': 'arrow', 'rows': num_rows, 'bytes': os.path.getsize(path)}
+
+
+def read_csv_batches(source, schema: pa.Schema = LISTING_SCHEMA, column_names: list = None):
+    """
+    Parse .csv data block by block into tables with the given schema. Date columns are parsed
+    as ISO dates, unparseable values become nulls. column_names is needed when source has no header
+    """
+    date_columns = [field.name for field in schema if pa.types.is_date(field.type)]
+    convert_options = pacsv.ConvertOptions(
+        column_types={field.name: pa.string() if field.name in date_columns else field.type for field in schema},
+        include_columns=schema.names,
+        strings_can_be_null=True,
+    )
+    reader = pacsv.open_csv(
+        source,
+        read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE, column_names=column_names),
+        # the name column may contain quoted line breaks
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=convert_options,
+    )
+    for batch in reader:
+        columns = []
+        for field in schema:
+            column = batch.column(field.name)
+            if field.name in date_columns:
+                column = pc.strptime(column, format='%Y-%m-%d', unit='s', error_is_null=True).cast(field.type)
+            columns.append(column)
+        yield pa.Table.from_arrays(columns, schema=schema)
+
+
+def current_arrow(csv_path: str, arrow_path: str, schema: pa.Schema = LISTING_SCHEMA):
+    """
+    Metadata of an Arrow file written by csv_to_arrow from the current csv with the same schema, None otherwise
+    """
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(arrow_path, 'r'))
+        stored = (reader.schema.metadata or {}).get(FINGERPRINT_KEY)
+        if stored is None or not reader.schema.equals(schema) or not is_current(json.loads(stored), csv_path):
+            return None
+        return arrow_metadata(arrow_path, reader.count_rows())
+    except (OSError, ValueError, pa.ArrowException):
+        return None
+
+
+def csv_to_arrow(csv_path: str, arrow_path: str, schema: pa.Schema = LISTING_SCHEMA, reuse: bool = True) -> dict:
+    """
+    Parse a .csv file once into an Arrow IPC file with the given schema. The file keeps the fingerprint of the csv
+    (see common/csv_cache.py), with reuse the file of an unchanged csv is returned without parsing it again
+    """
+    if reuse and os.path.exists(arrow_path):
+        existing = current_arrow(csv_path, arrow_path, schema)
+        if existing is not None:
+            return existing
+    # fingerprinted before parsing: a csv changed meanwhile is seen as stale by the next run
+    schema = schema.with_metadata({FINGERPRINT_KEY: json.dumps(fingerprint(csv_path)).encode()})
+    with ArrowFileWriter(arrow_path, schema) as writer:
+        for table in read_csv_batches(csv_path, schema):
+            writer.write_table(table)
+    return arrow_metadata(arrow_path, writer.num_rows)
+
+
+def write_csv_batch(table, sink):
+    """
+    Serialize rows as header-less CSV, the format expected by COPY ... WITH (FORMAT csv)
+    """
+    pacsv.write_csv(table, sink, write_options=pacsv.WriteOptions(include_header=False))
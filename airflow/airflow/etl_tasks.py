@@ -0,0 +1,79 @@
+"""
+Bodies of the NYC Airbnb ETL tasks as plain functions of paths and connections, called by the DAG tasks and by
+benchmarks/bench_etl.py, so the benchmark measures exactly what the pipeline runs. Heavy modules are imported
+inside the functions, the DAG file imports this module at parse time
+"""
+import os
+import logging
+from etl_metrics import record_task_metrics
+
+
+# raw files from this size on are parsed and cleaned by TRANSFORM_WORKERS processes, shard by shard
+TRANSFORM_WORKERS = os.cpu_count()
+PARALLEL_TRANSFORM_MIN_BYTES = 256 << 20
+
+
+def etl_ingest(raw_csv_path: str, raw_arrow_path: str) -> dict:
+    """
+    Check that the raw file exists and parse it once into a typed Arrow file, or leave large files to the
+    parallel transform
+    """
+    from etl_storage import csv_to_arrow
+    if not os.path.exists(raw_csv_path):
+        raise FileNotFoundError(f"File {raw_csv_path} does not exist.")
+    logging.info(f"File path - {raw_csv_path}")
+    raw_size = os.path.getsize(raw_csv_path)
+    if TRANSFORM_WORKERS > 1 and raw_size >= PARALLEL_TRANSFORM_MIN_BYTES:
+        # the parallel transform parses the raw file itself
+        raw = {'path': raw_csv_path, 'format': 'csv', 'bytes': raw_size}
+    else:
+        raw = csv_to_arrow(raw_csv_path, raw_arrow_path)
+        logging.info(f"Rows ingested - {raw['rows']}")
+        record_task_metrics(rows_out=raw['rows'], bytes_out=raw['bytes'])
+    record_task_metrics(bytes_in=raw_size)
+    return raw
+
+
+def etl_transform(raw: dict, transformed_path: str, hash_path: str) -> dict:
+    """
+    Filter, clean and convert the ingested data in fixed-size chunks (in shards across processes for raw csv files)
+    """
+    from etl_parallel import parallel_transform
+    from etl_quality import QUALITY_RULES
+    from etl_transform import stream_transform, TRANSFORM_CHUNK_SIZE
+    if raw['format'] == 'csv':
+        transformed = parallel_transform(raw['path'], transformed_path, workers=TRANSFORM_WORKERS, chunksize=TRANSFORM_CHUNK_SIZE,
+                                         hash_path=hash_path, quality_rules=QUALITY_RULES)
+    else:
+        transformed = stream_transform(raw['path'], transformed_path, chunksize=TRANSFORM_CHUNK_SIZE,
+                                       hash_path=hash_path, quality_rules=QUALITY_RULES)
+    logging.info(f"Rows written - {transformed['rows']}")
+    record_task_metrics(rows_in=raw.get('rows'), rows_out=transformed['rows'], bytes_in=raw['bytes'], bytes_out=transformed['bytes'])
+    return transformed
+
+
+def etl_load(connection, transformed: dict, table_name: str, hash_path: str = None, loaded_hash_path: str = None) -> dict:
+    """
+    Load the transformed Arrow file into table_name: upsert only the changed listings when both hash paths are
+    given, COPY into a staging table and swap it in otherwise
+    """
+    from etl_load import copy_load_arrow, upsert_load_arrow
+    record_task_metrics(rows_in=transformed['rows'], bytes_in=transformed['bytes'])
+    if hash_path and loaded_hash_path:
+        os.makedirs(os.path.dirname(loaded_hash_path), exist_ok=True)
+        stats = upsert_load_arrow(connection, transformed['path'], hash_path, loaded_hash_path, table_name)
+    else:
+        stats = copy_load_arrow(connection, transformed['path'], table_name)
+    # rows written to the table: all of them for a full load, only the changed ones for an upsert
+    record_task_metrics(rows_out=stats['rows'] if 'rows' in stats else stats['inserted'] + stats['updated'] + stats['deleted'])
+    return stats
+
+
+def etl_check_quality(connection, transformed: dict, table_name: str) -> dict:
+    """
+    Rule report of the transform combined with one aggregate query over the loaded table
+    """
+    from etl_quality import check_table_quality, merge_quality_reports
+    record_task_metrics(rows_in=transformed['rows'])
+    database_report = check_table_quality(connection, table_name, expected_rows=transformed['rows'])
+    return merge_quality_reports(transformed['quality'], database_report)
@@ -0,0 +1,74 @@
+"""
+Transformation helpers for the NYC Airbnb ETL DAG
+"""
+import logging
+from contextlib import nullcontext
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from etl_storage import HASH_SCHEMA, ArrowFileWriter, arrow_metadata, open_arrow
+from etl_quality import QualityAccumulator
+
+
+TRANSFORM_CHUNK_SIZE = 100_000
+
+
+def clean_chunk(data: pd.DataFrame, earliest_date) -> pd.DataFrame:
+    """
+    Apply the cleaning rules of the DAG to a single chunk of raw listings
+    """
+    # Filter out rows where price is 0 or negative
+    data = data[data['price'] > 0].copy()
+    # Convert last_review to a datetime object
+    data['last_review'] = pd.to_datetime(data['last_review'], errors='coerce')
+    # Fill missing last_review dates with the earliest date of the whole dataset
+    data['last_review'] = data['last_review'].fillna(earliest_date)
+    # Handle missing values in reviews_per_month by filling them with 0.
+    data['reviews_per_month'] = data['reviews_per_month'].fillna(0)
+    # Drop any rows(if any) with missing latitude or longitude values
+    data = data.dropna(axis='index', how='any', subset=['latitude', 'longitude'])
+    return data
+
+
+def listing_hashes(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Content hash of every cleaned listing (all columns except id), keyed by listing id
+    """
+    row_hash = pd.util.hash_pandas_object(data.drop(columns='id'), index=False)
+    return pd.DataFrame({'id': data['id'].to_numpy(), 'row_hash': row_hash.to_numpy()})
+
+
+def find_earliest_review_date(raw: pa.Table):
+    """
+    Earliest review date of the listings with a positive price; only the price and last_review columns are read
+    """
+    earliest_date = pc.min(raw.column('last_review').filter(pc.greater(raw.column('price'), 0))).as_py()
+    return pd.Timestamp(earliest_date) if earliest_date is not None else pd.NaT
+
+
+def stream_transform(raw_path: str, output_path: str, chunksize: int = TRANSFORM_CHUNK_SIZE, hash_path: str = None,
+                     quality_rules: list = None) -> dict:
+    """
+    Clean the memory-mapped raw Arrow file chunk by chunk and append every chunk to the output Arrow file,
+    so peak memory depends on chunksize and not on the size of the input file. If hash_path is given,
+    (id, row_hash) pairs of the cleaned listings are written there as well. If quality_rules are given,
+    they are checked on every cleaned chunk and their report is added under 'quality'.
+    Returns metadata of the output file
+    """
+    raw = open_arrow(raw_path)
+    earliest_date = find_earliest_review_date(raw)
+    logging.info(f"Earliest last_review date - {earliest_date}")
+    hash_writer = ArrowFileWriter(hash_path, HASH_SCHEMA) if hash_path else nullcontext()
+    quality = QualityAccumulator(quality_rules) if quality_rules else None
+    with ArrowFileWriter(output_path) as writer, hash_writer:
+        for batch in raw.to_batches(max_chunksize=chunksize):
+            cleaned = clean_chunk(batch.to_pandas(date_as_object=False), earliest_date)
+            writer.write_frame(cleaned)
+            if hash_path:
+                hash_writer.write_frame(listing_hashes(cleaned))
+            if quality:
+                quality.update(cleaned)
+    metadata = arrow_metadata(output_path, writer.num_rows)
+    if quality:
+        metadata['quality'] = quality.report()
+    return metadata
@@ -0,0 +1,66 @@
+"""
+DAG parse-time benchmark for airbnb_etl.py, run inside the Airflow environment.
+Every run parses the DAG file with a DagBag in a fresh interpreter (Airflow itself is imported
+beforehand, as in the scheduler) and records the parse time, the modules the DAG file pulled in and
+the calls to BaseHook.get_connection. Fails when the median parse time exceeds the budget,
+when heavy modules are imported at parse time or when the metadata DB is hit for connections.
+
+Usage: python airflow/benchmarks/bench_dag_parse.py [n_runs]
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+
+DAG_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'airflow')
+DAG_FILE = os.path.join(DAG_FOLDER, 'airbnb_etl.py')
+PARSE_TIME_BUDGET_SECONDS = float(os.environ.get('AIRBNB_DAG_PARSE_BUDGET', 1.5))
+FORBIDDEN_MODULES = ['pandas', 'pyarrow', 'numpy', 'psycopg2']
+N_RUNS = 5
+
+PARSE_SCRIPT = """
+import sys, json, time
+sys.path.append({dag_folder!r})
+from airflow.hooks.base import BaseHook
+from airflow.models.dagbag import DagBag
+get_connection_calls = []
+original_get_connection = BaseHook.get_connection
+def counting_get_connection(*args, **kwargs):
+    get_connection_calls.append(args)
+    return original_get_connection(*args, **kwargs)
+BaseHook.get_connection = counting_get_connection
+modules_before = set(sys.modules)
+start = time.perf_counter()
+dagbag = DagBag(dag_folder={dag_file!r}, include_examples=False, safe_mode=False)
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': seconds,
+    'dags': list(dagbag.dags),
+    'import_errors': dagbag.import_errors,
+    'get_connection_calls': len(get_connection_calls),
+    'new_modules': sorted({{name.split('.')[0] for name in set(sys.modules) - modules_before}}),
+}}))
+"""
+
+
+if __name__ == '__main__':
+    n_runs = int(sys.argv[1]) if len(sys.argv) > 1 else N_RUNS
+    script = PARSE_SCRIPT.format(dag_folder=DAG_FOLDER, dag_file=DAG_FILE)
+    runs = []
+    for _ in range(n_runs):
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    seconds = [run['seconds'] for run in runs]
+    heavy_modules = sorted({module for run in runs for module in run['new_modules'] if module in FORBIDDEN_MODULES})
+    print(f"DAG parse time over {n_runs} runs: median {statistics.median(seconds):.3f}s, min {min(seconds):.3f}s, max {max(seconds):.3f}s")
+    print(f"Modules imported by the DAG file: {', '.join(runs[-1]['new_modules'])}")
+    print(f"BaseHook.get_connection calls at parse time: {runs[-1]['get_connection_calls']}")
+
+    assert not runs[-1]['import_errors'], f"DAG import errors: {runs[-1]['import_errors']}"
+    assert 'nyc_airbnb_etl' in runs[-1]['dags'], 'DAG nyc_airbnb_etl was not found'
+    assert all(run['get_connection_calls'] == 0 for run in runs), 'DAG file reads connections at parse time'
+    assert not heavy_modules, f"Heavy modules imported at parse time: {heavy_modules}"
+    assert statistics.median(seconds) <= PARSE_TIME_BUDGET_SECONDS, \
+        f"Median parse time {statistics.median(seconds):.3f}s exceeds the budget of {PARSE_TIME_BUDGET_SECONDS}s"
@@ -0,0 +1,46 @@
+"""
+Scaling benchmark of the parallel sharded transform: time and speedup from 1 to N worker processes,
+compared with the single-process csv_to_arrow + stream_transform path. Every parallel result
+is checked to be identical to the single-process one.
+
+Usage: python airflow/benchmarks/bench_parallel_transform.py path/to/raw.csv [max_workers]
+"""
+import os
+import sys
+import time
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'airflow'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+from etl_parallel import parallel_transform
+from etl_quality import QUALITY_RULES
+from etl_storage import csv_to_arrow, open_arrow
+from etl_transform import stream_transform
+
+
+if __name__ == '__main__':
+    raw_csv_path = sys.argv[1]
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    worker_counts = sorted({1, max_workers} | {2 ** i for i in range(max_workers.bit_length()) if 2 ** i <= max_workers})
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        serial_path = os.path.join(tmp_dir, 'serial.arrow')
+        start = time.perf_counter()
+        csv_to_arrow(raw_csv_path, os.path.join(tmp_dir, 'raw.arrow'))
+        serial = stream_transform(os.path.join(tmp_dir, 'raw.arrow'), serial_path, quality_rules=QUALITY_RULES)
+        serial_seconds = time.perf_counter() - start
+        print(f"Single process (csv_to_arrow + stream_transform): {serial['rows']} rows, {serial_seconds:.2f}s")
+
+        timings = {}
+        for workers in worker_counts:
+            parallel_path = os.path.join(tmp_dir, f'parallel_{workers}.arrow')
+            start = time.perf_counter()
+            parallel = parallel_transform(raw_csv_path, parallel_path, workers=workers, quality_rules=QUALITY_RULES)
+            timings[workers] = time.perf_counter() - start
+            print(f"{workers} workers: {timings[workers]:.2f}s, speedup x{timings[1] / timings[workers]:.2f} "
+                  f"over 1 worker, x{serial_seconds / timings[workers]:.2f} over single process")
+            assert parallel['rows'] == serial['rows'], 'Parallel transform wrote an unexpected number of rows'
+            assert open_arrow(parallel_path).equals(open_arrow(serial_path)), 'Parallel transform result differs from the single-process one'
+            assert [rule['value'] for rule in parallel['quality']['rules']] == [rule['value'] for rule in serial['quality']['rules']], \
+                'Quality reports differ'
+            os.remove(parallel_path)
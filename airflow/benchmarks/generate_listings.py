@@ -0,0 +1,172 @@
+"""
+Synthetic AB_NYC_2019-shaped listings at a configurable scale for benchmarking the ETL.
+The column set, .csv formatting and the main statistics follow the real 48,895-row dataset:
+borough/room type shares, skewed price, minimum nights and review counts, missing last_review and
+reviews_per_month for listings without reviews, a few zero prices and missing names, and messy
+names with quotes, commas, line breaks and non-ASCII characters. Output is deterministic for a seed.
+
+Usage: python airflow/benchmarks/generate_listings.py scale path/to/output.csv [seed]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+
+BASE_ROWS = 48_895
+CHUNK_ROWS = 500_000
+MAX_LISTING_ID = 36_487_245
+COLUMNS = ['id', 'name', 'host_id', 'host_name', 'neighbourhood_group', 'neighbourhood', 'latitude', 'longitude',
+           'room_type', 'price', 'minimum_nights', 'number_of_reviews', 'last_review', 'reviews_per_month',
+           'calculated_host_listings_count', 'availability_365']
+
+# share of listings, centre (latitude, longitude), spread and a few neighbourhoods per borough
+NEIGHBOURHOOD_GROUPS = {
+    'Manhattan': (0.443, (40.765, -73.975), (0.035, 0.020),
+                  ['Harlem', 'Upper West Side', "Hell's Kitchen", 'East Village', 'Upper East Side', 'Midtown',
+                   'East Harlem', 'Chelsea', 'Lower East Side', 'Washington Heights']),
+    'Brooklyn': (0.411, (40.685, -73.950), (0.030, 0.030),
+                 ['Williamsburg', 'Bedford-Stuyvesant', 'Bushwick', 'Crown Heights', 'Greenpoint', 'Flatbush',
+                  'Clinton Hill', 'Park Slope', 'Prospect Heights', 'East Flatbush']),
+    'Queens': (0.116, (40.730, -73.870), (0.040, 0.050),
+               ['Astoria', 'Long Island City', 'Flushing', 'Ridgewood', 'Sunnyside', 'Ditmars Steinway', 'Jamaica',
+                'Woodside']),
+    'Bronx': (0.022, (40.850, -73.880), (0.030, 0.030),
+              ['Kingsbridge', 'Fordham', 'Longwood', 'Mott Haven', 'Concourse']),
+    'Staten Island': (0.008, (40.610, -74.100), (0.040, 0.040),
+                      ['St. George', 'Tompkinsville', 'Stapleton', 'Concord']),
+}
+ROOM_TYPES = {'Entire home/apt': 0.520, 'Private room': 0.457, 'Shared room': 0.023}
+MINIMUM_NIGHTS = {1: 0.260, 2: 0.239, 3: 0.164, 4: 0.068, 5: 0.062, 6: 0.015, 7: 0.042, 10: 0.010, 14: 0.011,
+                  15: 0.006, 20: 0.004, 30: 0.077, 31: 0.005, 60: 0.002, 90: 0.002, 365: 0.001, 1250: 0.00002}
+NO_REVIEWS_RATE = 0.2056
+ZERO_PRICE_RATE = 11 / BASE_ROWS
+MISSING_NAME_RATE = 16 / BASE_ROWS
+MISSING_HOST_NAME_RATE = 21 / BASE_ROWS
+ZERO_AVAILABILITY_RATE = 0.359
+FIRST_REVIEW_DATE = pd.Timestamp('2011-03-28')
+LAST_REVIEW_DATE = pd.Timestamp('2019-07-08')
+
+NAME_ADJECTIVES = ['Cozy', 'Sunny', 'Spacious', 'Charming', 'Modern', 'Quiet', 'Bright', 'Large', 'Lovely', 'Huge',
+                   'Beautiful', 'Clean', 'Private', 'Luxury', 'Stylish', 'Renovated', 'Comfy', 'Café-style', 'Chic']
+NAME_NOUNS = ['room', 'studio', 'apartment', 'loft', '1BR', '2BR', 'bedroom', 'duplex', 'brownstone', 'suite',
+              'townhouse', 'home', 'space', 'penthouse']
+NAME_PLACES = ['in Williamsburg', 'near Central Park', 'by the subway', 'in the heart of NYC', 'w/ balcony',
+               '@ Times Square', 'close to JFK', 'steps to the L train', 'with backyard', 'in Harlem', '']
+# ways real listing names break naive .csv parsing: delimiters, quotes, line breaks, stray whitespace, non-ASCII
+NAME_DECORATIONS = ['{}', '{}', '{}', '{}', '{}, great location', '"{}"', '{} - 5 min to "the city"', ' {} ',
+                    '{}!!', '{} ★★★', '{} ✨', '{}\nCheck out my other listings', '{}; pets OK', 'BEST {}, 24/7']
+HOST_NAMES = ['Michael', 'David', 'Sonder (NYC)', 'John', 'Alex', 'Blueground', 'Sarah', 'Daniel', 'Jessica', 'Maria',
+              'Mike', 'Anna', 'Chris', 'José', 'Ming', 'Amy & Tom', 'Kara', 'Laura', 'Carlos', 'Emily', 'Zoë']
+
+
+def _choice(rng, options: dict, size: int) -> np.ndarray:
+    values = list(options)
+    probabilities = np.array(list(options.values()))
+    return np.array(values)[rng.choice(len(values), size=size, p=probabilities / probabilities.sum())]
+
+
+def _listing_names(rng, size: int) -> np.ndarray:
+    adjectives = rng.choice(NAME_ADJECTIVES, size)
+    nouns = rng.choice(NAME_NOUNS, size)
+    places = rng.choice(NAME_PLACES, size)
+    decorations = rng.choice(NAME_DECORATIONS, size)
+    names = np.array([decoration.format(f"{adjective} {noun} {place}".rstrip())
+                      for decoration, adjective, noun, place in zip(decorations, adjectives, nouns, places)], dtype=object)
+    names[rng.random(size) < MISSING_NAME_RATE] = None
+    return names
+
+
+def generate_chunk(rng, first_id: int, size: int, id_gap: int = 746) -> pd.DataFrame:
+    """
+    size synthetic listings with ids increasing from first_id by id_gap on average
+    """
+    groups = list(NEIGHBOURHOOD_GROUPS)
+    group_index = rng.choice(len(groups), size=size, p=[NEIGHBOURHOOD_GROUPS[group][0] for group in groups])
+    neighbourhoods = np.empty(size, dtype=object)
+    latitude = np.empty(size)
+    longitude = np.empty(size)
+    for i, group in enumerate(groups):
+        _, (centre_latitude, centre_longitude), (spread_latitude, spread_longitude), names = NEIGHBOURHOOD_GROUPS[group]
+        in_group = group_index == i
+        n_group = int(in_group.sum())
+        neighbourhoods[in_group] = rng.choice(names, n_group)
+        latitude[in_group] = rng.normal(centre_latitude, spread_latitude, n_group)
+        longitude[in_group] = rng.normal(centre_longitude, spread_longitude, n_group)
+
+    # price: log-normal around the real median of $106, tail capped at the real maximum
+    price = np.clip(np.round(rng.lognormal(np.log(106), 0.8, size)), 10, 10_000).astype(np.int64)
+    price[rng.random(size) < ZERO_PRICE_RATE] = 0
+
+    # listings without reviews have neither last_review nor reviews_per_month
+    has_reviews = rng.random(size) >= NO_REVIEWS_RATE
+    number_of_reviews = np.where(has_reviews, np.minimum(1 + np.floor(rng.lognormal(np.log(9), 1.5, size)), 629), 0).astype(np.int64)
+    # reviews are skewed to the last months before the scrape
+    days_before_last = np.minimum(np.floor(rng.exponential(250, size)), (LAST_REVIEW_DATE - FIRST_REVIEW_DATE).days)
+    last_review = (LAST_REVIEW_DATE - pd.to_timedelta(days_before_last, unit='D')).strftime('%Y-%m-%d').to_numpy(dtype=object)
+    last_review[~has_reviews] = None
+    months_listed = np.clip(rng.lognormal(np.log(24), 1.0, size), 1, 100)
+    reviews_per_month = np.where(has_reviews, np.clip(np.round(number_of_reviews / months_listed, 2), 0.01, 58.5), np.nan)
+    # most hosts have one listing, a few professional hosts have hundreds
+    host_listings_count = np.where(rng.random(size) < 0.03, rng.integers(20, 328, size), np.minimum(rng.geometric(0.55, size), 19))
+
+    availability_365 = np.where(rng.random(size) < ZERO_AVAILABILITY_RATE, 0, rng.integers(1, 366, size))
+    host_names = rng.choice(HOST_NAMES, size).astype(object)
+    host_names[rng.random(size) < MISSING_HOST_NAME_RATE] = None
+
+    return pd.DataFrame({
+        # listing ids grow with gaps, like the real ones
+        'id': first_id + np.cumsum(rng.integers(1, 2 * id_gap, size)),
+        'name': _listing_names(rng, size),
+        'host_id': rng.integers(2_438, 274_321_313, size),
+        'host_name': host_names,
+        'neighbourhood_group': np.array(groups)[group_index],
+        'neighbourhood': neighbourhoods,
+        # bounding box of the real listings
+        'latitude': np.round(np.clip(latitude, 40.49979, 40.91306), 5),
+        'longitude': np.round(np.clip(longitude, -74.24442, -73.71299), 5),
+        'room_type': _choice(rng, ROOM_TYPES, size),
+        'price': price,
+        'minimum_nights': _choice(rng, MINIMUM_NIGHTS, size),
+        'number_of_reviews': number_of_reviews,
+        'last_review': last_review,
+        'reviews_per_month': reviews_per_month,
+        'calculated_host_listings_count': host_listings_count,
+        'availability_365': availability_365,
+    }, columns=COLUMNS)
+
+
+def generate_listings(output_path: str, n_rows: int, seed: int = 0, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Write n_rows synthetic listings to output_path chunk by chunk, so memory does not grow with the scale
+    """
+    rng = np.random.default_rng(seed)
+    last_id = 2_538
+    # ids stay in the range of the real ones, the id column of the target table is a 32-bit SERIAL
+    id_gap = max(1, MAX_LISTING_ID // max(n_rows, 1))
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w', newline='') as output_file:
+        for start in range(0, n_rows, chunk_rows):
+            chunk = generate_chunk(rng, last_id, min(chunk_rows, n_rows - start), id_gap)
+            chunk.to_csv(output_file, index=False, header=start == 0)
+            last_id = int(chunk['id'].iloc[-1])
+    os.replace(tmp_path, output_path)
+    return {'path': output_path, 'rows': n_rows, 'bytes': os.path.getsize(output_path)}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.exit(__doc__)
+    scale = float(sys.argv[1])
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    start = time.perf_counter()
+    generated = generate_listings(sys.argv[2], int(BASE_ROWS * scale), seed)
+    print(f"{generated['rows']} rows, {generated['bytes'] / 2**20:.1f} MiB written to {generated['path']} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    sample = pd.read_csv(generated['path'], nrows=CHUNK_ROWS)
+    assert list(sample.columns) == COLUMNS, 'Unexpected columns'
+    assert sample['id'].is_unique, 'Listing ids are not unique'
+    assert (sample['last_review'].isna() == sample['reviews_per_month'].isna()).all(), 'Missing review columns do not match'
+    assert abs(sample['last_review'].isna().mean() - NO_REVIEWS_RATE) < 0.02, 'Unexpected share of listings without reviews'
@@ -1,4 +1,5 @@
-import pandas as pd
+import os
+import sys
 
 from bokeh.plotting import figure, show, output_file
 from bokeh.models import ColumnDataSource, HoverTool, FactorRange, Select, CustomJS
@@ -6,8 +7,11 @@ from bokeh.layouts import column, row
 from bokeh.transform import dodge
 from bokeh.palettes import Category10
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from csv_cache import read_csv_cached
 
-df = pd.read_csv('data/Titanic/Titanic-Dataset.csv')
+
+df = read_csv_cached('data/Titanic/Titanic-Dataset.csv')
 
 
 def categorize_age(age):
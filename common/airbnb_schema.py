@@ -0,0 +1,144 @@
+"""
+Compact dtype schema of the NYC Airbnb dataset (AB_NYC_2019.csv and the cleaned file written by pandas/task1.py),
+shared by the Airflow ETL, the pandas tasks and the matplotlib plots instead of letting pandas infer dtypes.
+Low-cardinality text columns are categories, counts are downcast to the narrowest integer that fits the dataset,
+last_review is parsed while reading and every consumer reads only the columns it uses.
+
+Usage: python common/airbnb_schema.py path/to/AB_NYC_2019.csv [cleaned]
+"""
+import os
+import sys
+import time
+import pandas as pd
+
+
+# identifiers keep 64 bits, new listing ids already exceed the int32 range
+RAW_DTYPES = {
+    'id': 'int64',
+    'name': 'object',
+    'host_id': 'int64',
+    'host_name': 'object',
+    'neighbourhood_group': 'category',
+    'neighbourhood': 'category',
+    # float32 would move coordinates by up to ~4e-6 degrees, which changes the written .csv files
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'room_type': 'category',
+    'price': 'int32',
+    'minimum_nights': 'int16',
+    'number_of_reviews': 'int16',
+    'reviews_per_month': 'float32',
+    'calculated_host_listings_count': 'int16',
+    'availability_365': 'int16',
+}
+DATE_COLUMNS = ['last_review']
+RAW_COLUMNS = ['id', 'name', 'host_id', 'host_name', 'neighbourhood_group', 'neighbourhood', 'latitude', 'longitude',
+               'room_type', 'price', 'minimum_nights', 'number_of_reviews', 'last_review', 'reviews_per_month',
+               'calculated_host_listings_count', 'availability_365']
+# columns added by pandas/task1.py
+CLEANED_DTYPES = {
+    **RAW_DTYPES,
+    'price_category': 'category',
+    'length_of_stay_category': 'category',
+}
+CLEANED_COLUMNS = RAW_COLUMNS + ['price_category', 'length_of_stay_category']
+
+
+def read_kwargs(usecols: list = None, cleaned: bool = False) -> dict:
+    """
+    Keyword arguments of pd.read_csv for the raw or the cleaned dataset, restricted to usecols.
+    Date columns are read as text, see read_listings
+    """
+    columns = usecols or (CLEANED_COLUMNS if cleaned else RAW_COLUMNS)
+    dtypes = {**(CLEANED_DTYPES if cleaned else RAW_DTYPES), **{column: 'object' for column in DATE_COLUMNS}}
+    return {'usecols': columns, 'dtype': {column: dtype for column, dtype in dtypes.items() if column in columns}}
+
+
+def read_listings(path: str, usecols: list = None, cleaned: bool = False, parse_dates: bool = True,
+                  cache: bool = True, engine: str = None) -> pd.DataFrame:
+    """
+    Read the dataset with the compact dtypes. Dates are converted right after parsing with a fixed ISO format:
+    read_csv(dtype=..., parse_dates=...) takes a slow object path in pandas 2.2, more than doubling the read time.
+    The 'NaT' placeholder of the cleaned file becomes a missing date.
+    With cache, all columns are parsed once into a sidecar of the file (see csv_cache.py) and later reads take
+    usecols from it; engine is 'c' or the multithreaded 'pyarrow'
+    """
+    from csv_cache import parse_csv, read_csv_cached
+    if cache:
+        df = read_csv_cached(path, columns=usecols, engine=engine, **read_kwargs(None, cleaned))
+    else:
+        df = parse_csv(path, engine, **read_kwargs(usecols, cleaned))
+    return _parse_dates(df) if parse_dates else df
+
+
+def iter_listings(path: str, chunk_rows: int, usecols: list = None, cleaned: bool = False, parse_dates: bool = True):
+    """
+    Read the dataset in chunks of chunk_rows rows with the compact dtypes, for datasets that do not fit in memory.
+    The row labels continue across chunks; categories are per chunk, so combine chunks by labels rather than codes
+    """
+    with pd.read_csv(path, chunksize=chunk_rows, **read_kwargs(usecols, cleaned)) as reader:
+        for df in reader:
+            yield _parse_dates(df) if parse_dates else df
+
+
+def _parse_dates(df: pd.DataFrame) -> pd.DataFrame:
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], format='%Y-%m-%d')
+    return df
+
+
+def arrow_schema(columns: list = RAW_COLUMNS):
+    """
+    Arrow schema of the same columns for the typed intermediate files of the ETL. Text columns stay plain
+    strings there: Arrow strings carry no per-value object overhead, and dictionary batches with different
+    dictionaries cannot be appended to one IPC file
+    """
+    import pyarrow as pa
+    fields = []
+    for column in columns:
+        if column in DATE_COLUMNS:
+            fields.append((column, pa.date32()))
+        elif CLEANED_DTYPES[column] in ('object', 'category'):
+            fields.append((column, pa.string()))
+        else:
+            fields.append((column, pa.from_numpy_dtype(CLEANED_DTYPES[column])))
+    return pa.schema(fields)
+
+
+def memory_report(path: str, usecols: list = None, cleaned: bool = False) -> pd.DataFrame:
+    """
+    Memory (deep) of the frame read with inferred dtypes versus the schema, per column and in total.
+    Parse times are kept in report.attrs['parse_seconds']
+    """
+    start = time.perf_counter()
+    inferred = pd.read_csv(path, usecols=usecols)
+    inferred_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    compact = read_listings(path, usecols, cleaned, cache=False)
+    compact_seconds = time.perf_counter() - start
+
+    report = pd.DataFrame({
+        'inferred_dtype': inferred.dtypes.astype(str),
+        'schema_dtype': compact.dtypes.astype(str),
+        'inferred_bytes': inferred.memory_usage(index=False, deep=True),
+        'schema_bytes': compact.memory_usage(index=False, deep=True),
+    })
+    report.loc['total'] = ['', '', report['inferred_bytes'].sum(), report['schema_bytes'].sum()]
+    report['saving'] = (1 - report['schema_bytes'] / report['inferred_bytes']).round(3)
+    report.attrs['parse_seconds'] = {'inferred': inferred_seconds, 'schema': compact_seconds}
+    return report
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    dataset_path = sys.argv[1]
+    is_cleaned = len(sys.argv) > 2 and sys.argv[2] == 'cleaned'
+    print(f"Dataset - {dataset_path} ({os.path.getsize(dataset_path) / 2**20:.1f} MiB)")
+    with pd.option_context('display.width', 200, 'display.max_columns', 10):
+        memory_report_df = memory_report(dataset_path, cleaned=is_cleaned)
+        print(memory_report_df)
+    parse_seconds = memory_report_df.attrs['parse_seconds']
+    print(f"Parse time - inferred {parse_seconds['inferred']:.3f}s, schema {parse_seconds['schema']:.3f}s")
+    assert memory_report_df.loc['total', 'schema_bytes'] < memory_report_df.loc['total', 'inferred_bytes'], 'Schema frame is not smaller'
@@ -0,0 +1,161 @@
+"""
+Parse cache for the csv files read by the scripts. The first read of a file parses it with pd.read_csv and
+writes a binary sidecar next to it (.<file name>.<key of the options>.arrow): an uncompressed Arrow IPC file with the
+typed columns (categories as dictionaries, narrow integers kept) and the fingerprint of the source (size,
+modification time and a BLAKE2 hash of its bytes) in its metadata. Later reads memory-map the sidecar and
+convert only the requested columns instead of parsing the text again. A source with another size is parsed
+again, one with the same size but another modification time is hashed and only parsed again if its bytes
+changed; an unreadable sidecar is parsed again as well, and a sidecar that cannot be written is skipped.
+The frames are the ones pd.read_csv returns (dtypes, categories, missing values and column order); the optional
+multithreaded 'pyarrow' engine rounds long decimals like pd.read_csv(float_precision='round_trip').
+"""
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pandas._libs.parsers import STR_NA_VALUES
+
+
+CACHE_VERSION = 1
+FINGERPRINT_KEY = b'csv_cache.fingerprint'
+OPTIONS_KEY = b'csv_cache.options'
+HASH_BLOCK_SIZE = 1 << 20
+# engine used when none is given: 'c' (pd.read_csv) parses in one thread, 'pyarrow' (pyarrow.csv) in several
+ENGINE = 'c'
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path: str, content_hash: bool = True) -> dict:
+    """
+    Size, modification time and (with content_hash) hash of a file
+    """
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': file_hash(path) if content_hash else None}
+
+
+def is_current(stored: dict, path: str) -> bool:
+    """
+    Whether a stored fingerprint still describes the file; the bytes are only hashed when the size matches
+    but the modification time does not
+    """
+    current = fingerprint(path, content_hash=False)
+    if stored is None or stored['size'] != current['size']:
+        return False
+    return stored['mtime_ns'] == current['mtime_ns'] or stored['hash'] == file_hash(path)
+
+
+def options_key(read_kwargs: dict, engine: str) -> str:
+    # the engine is part of the key: pyarrow rounds long decimals correctly, the c engine may differ in the last bit
+    options = json.dumps({'version': CACHE_VERSION, 'engine': engine, **read_kwargs}, sort_keys=True, default=str)
+    return hashlib.sha256(options.encode()).hexdigest()[:12]
+
+
+def cache_path(path: str, read_kwargs: dict, engine: str = None) -> str:
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, f".{name}.{options_key(read_kwargs, engine or ENGINE)}.arrow")
+
+
+def parse_csv(path: str, engine: str = None, **read_kwargs) -> pd.DataFrame:
+    """
+    pd.read_csv(path, **read_kwargs) with the c engine or pyarrow.csv, without the cache
+    """
+    engine = engine or ENGINE
+    if engine != 'pyarrow':
+        return pd.read_csv(path, engine=engine, **read_kwargs)
+    # pd.read_csv(engine='pyarrow') cannot read quoted line breaks (in the listing names), pyarrow.csv can
+    import pyarrow.csv as pacsv
+    unsupported = set(read_kwargs) - {'usecols', 'dtype'}
+    if unsupported:
+        raise ValueError(f"The pyarrow engine only supports usecols and dtype, got {sorted(unsupported)}")
+    dtype = read_kwargs.get('dtype', {})
+    convert_options = pacsv.ConvertOptions(
+        include_columns=read_kwargs.get('usecols'),
+        # text stays text, as in pd.read_csv with the default missing value markers
+        column_types={column: pa.string() for column, column_dtype in dtype.items() if column_dtype in ('object', 'category')},
+        null_values=sorted(STR_NA_VALUES),
+        strings_can_be_null=True,
+    )
+    table = pacsv.read_csv(path, parse_options=pacsv.ParseOptions(newlines_in_values=True), convert_options=convert_options)
+    df = table.to_pandas()
+    for column, column_dtype in dtype.items():
+        if column in df.columns and column_dtype != 'object':
+            df[column] = df[column].astype(column_dtype)
+    return df
+
+
+def _write(df: pd.DataFrame, sidecar: str, source_fingerprint: dict, read_kwargs: dict):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), FINGERPRINT_KEY: json.dumps(source_fingerprint).encode(),
+                OPTIONS_KEY: json.dumps(read_kwargs, sort_keys=True, default=str).encode()}
+    table = table.replace_schema_metadata(metadata)
+    tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, sidecar)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _check_columns(columns: list, available: list):
+    missing = [column for column in columns if column not in set(available)]
+    if missing:
+        raise ValueError(f"Usecols do not match columns, columns expected but not found: {missing}")
+
+
+def _read(sidecar: str, path: str, columns: list):
+    """
+    The cached frame restricted to columns, None when the sidecar is missing, stale or unreadable
+    """
+    try:
+        table = pa.ipc.open_file(pa.memory_map(sidecar, 'r')).read_all()
+        if not is_current(json.loads(table.schema.metadata[FINGERPRINT_KEY]), path):
+            return None
+        if columns is not None:
+            _check_columns(columns, table.column_names)
+            # pd.read_csv(usecols=...) keeps the order of the file
+            table = table.select([column for column in table.column_names if column in set(columns)])
+        df = table.to_pandas()
+    except (OSError, KeyError, json.JSONDecodeError, pa.ArrowException):
+        return None
+    for column in df.columns:
+        if df[column].dtype == object:
+            # missing text is NaN in pd.read_csv, None in Arrow
+            missing = df[column].isna()
+            if missing.any():
+                df.loc[missing, column] = np.nan
+    return df
+
+
+def read_csv_cached(path: str, columns: list = None, engine: str = None, **read_kwargs) -> pd.DataFrame:
+    """
+    pd.read_csv(path, **read_kwargs) restricted to columns, from the sidecar cache when it is current.
+    A sidecar is kept per read_kwargs, so read every column once with the dtypes and select columns here
+    """
+    engine = engine or ENGINE
+    sidecar = cache_path(path, read_kwargs, engine)
+    df = _read(sidecar, path, columns) if os.path.exists(sidecar) else None
+    if df is not None:
+        return df
+    # fingerprinted before parsing: a file changed meanwhile is seen as stale by the next read
+    source_fingerprint = fingerprint(path)
+    df = parse_csv(path, engine, **read_kwargs)
+    try:
+        _write(df, sidecar, source_fingerprint, read_kwargs)
+    except OSError:
+        # read-only data directory: the parse still works, just uncached
+        pass
+    if columns is None:
+        return df
+    _check_columns(columns, df.columns)
+    return df[[column for column in df.columns if column in set(columns)]]
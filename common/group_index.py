@@ -0,0 +1,214 @@
+"""
+Shared grouping layer for the NYC Airbnb analyses: the group keys of a frame are factorized once and the
+group codes are cached, so every later aggregate on the same keys (mean, sum, count, size, min, max, std,
+median) is a vectorized pass over the codes. Statistics already computed for a column (sums, counts,
+per-group sorted values) are reused by later requests, e.g. a mean after a sum or a max after a median.
+Results match DataFrame.groupby(keys, observed=True).aggregate, rows with a missing key are dropped.
+"""
+import hashlib
+import weakref
+import numpy as np
+import pandas as pd
+
+
+# key spaces up to this size (or the number of rows) are factorized by counting
+DENSE_COMBINATIONS = 1 << 20
+AGGREGATES = ('size', 'count', 'sum', 'mean', 'std', 'min', 'max', 'median')
+# (id of the frame, keys) -> GroupIndex, an entry is dropped when its frame is garbage collected
+_group_indexes = {}
+
+
+def _column_values(column: pd.Series) -> np.ndarray:
+    if not isinstance(column.dtype, np.dtype):
+        # nullable extension dtypes (Int64, Float32, ...)
+        return column.to_numpy(dtype='float64', na_value=np.nan)
+    return column.to_numpy()
+
+
+def _content_token(column: pd.Series) -> bytes:
+    """
+    Digest of the values of a column, which changes with any in-place edit or reassignment
+    """
+    digest = hashlib.blake2b(str(column.dtype).encode(), digest_size=16)
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        digest.update(pd.util.hash_array(column.cat.categories.to_numpy()).tobytes())
+        values = column.cat.codes.to_numpy()
+    elif isinstance(column.dtype, np.dtype) and column.dtype.kind != 'O':
+        values = column.to_numpy()
+    else:
+        values = pd.util.hash_array(column.to_numpy(dtype=object))
+    digest.update(np.ascontiguousarray(values).view(np.uint8).data)
+    return digest.digest()
+
+
+class GroupIndex:
+    """
+    Group codes of a frame on keys. The frame is referenced weakly; the key and value columns are compared
+    by content on every query, an edited key column rebuilds the codes and an edited value column drops its
+    statistics
+    """
+    def __init__(self, df: pd.DataFrame, keys: list):
+        self.keys = list(keys)
+        self._df = weakref.ref(df)
+        self._build(df)
+
+    def _build(self, df: pd.DataFrame):
+        self.n_rows = len(df)
+        self._key_tokens = [_content_token(df[key]) for key in self.keys]
+        key_codes, key_levels = [], []
+        for key in self.keys:
+            column = df[key]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                codes = column.cat.codes.to_numpy()
+                levels = pd.Categorical.from_codes(np.arange(len(column.cat.categories)), dtype=column.dtype)
+            else:
+                codes, levels = pd.factorize(column, sort=True)
+            key_codes.append(codes)
+            key_levels.append(levels)
+        valid = np.logical_and.reduce([codes >= 0 for codes in key_codes])
+        self._rows = None if valid.all() else np.flatnonzero(valid)
+        shape = [max(len(levels), 1) for levels in key_levels]
+        combined = np.ravel_multi_index([codes if self._rows is None else codes[self._rows] for codes in key_codes], shape)
+        # observed key combinations in sorted key order, as groupby(sort=True, observed=True)
+        n_combinations = int(np.prod(shape, dtype=np.float64))
+        if n_combinations <= max(len(combined), DENSE_COMBINATIONS):
+            # counting instead of sorting when the key space is small
+            observed = np.flatnonzero(np.bincount(combined, minlength=n_combinations))
+            group_of_combination = np.zeros(n_combinations, dtype=np.int64)
+            group_of_combination[observed] = np.arange(len(observed))
+            self.codes = group_of_combination[combined]
+        else:
+            observed, self.codes = np.unique(combined, return_inverse=True)
+        self.n_groups = len(observed)
+        group_levels = np.unravel_index(observed, shape)
+        arrays = [pd.Index(levels).take(level_codes) for levels, level_codes in zip(key_levels, group_levels)]
+        if len(arrays) == 1:
+            self.index = arrays[0].rename(self.keys[0])
+        else:
+            self.index = pd.MultiIndex.from_arrays(arrays, names=self.keys)
+        self.sizes = np.bincount(self.codes, minlength=self.n_groups)
+        self._starts = np.concatenate([[0], np.cumsum(self.sizes)[:-1]])
+        self._stats = {}
+        self._column_tokens = {}
+
+    @property
+    def df(self) -> pd.DataFrame:
+        df = self._df()
+        if df is None:
+            raise ReferenceError('The frame of this group index no longer exists')
+        return df
+
+    def _values(self, column: str) -> np.ndarray:
+        values = _column_values(self.df[column])
+        if self._rows is not None:
+            values = values[self._rows]
+        return values
+
+    def _refresh(self, columns):
+        """
+        Rebuild the codes if a key column changed and drop the statistics of the value columns that changed
+        """
+        df = self.df
+        if len(df) != self.n_rows or [_content_token(df[key]) for key in self.keys] != self._key_tokens:
+            self._build(df)
+        for column in set(columns):
+            token = _content_token(df[column])
+            if self._column_tokens.get(column) != token:
+                self._column_tokens[column] = token
+                self._stats = {key: value for key, value in self._stats.items() if key[0] != column}
+
+    def _cached(self, column: str, stat: str):
+        key = (column, stat)
+        if key not in self._stats:
+            self._stats[key] = self._compute(column, stat)
+        return self._stats[key]
+
+    def stat(self, column: str, stat: str):
+        """
+        One aggregate (or the 'values' of the grouped rows) of column per group, cached
+        """
+        self._refresh([column])
+        return self._cached(column, stat)
+
+    def _compute(self, column: str, stat: str):
+        if stat == 'values':
+            return self._values(column)
+        values = self._cached(column, 'values')
+        is_float = values.dtype.kind == 'f'
+        if stat == 'notna':
+            return ~np.isnan(values) if is_float else None
+        notna = self._cached(column, 'notna')
+        if stat == 'count':
+            return self.sizes if notna is None else np.bincount(self.codes[notna], minlength=self.n_groups)
+        if stat == 'sum':
+            sums = np.bincount(self.codes, weights=values if notna is None else np.where(notna, values, 0), minlength=self.n_groups)
+            # exact for integer columns while the group sums stay below 2**53
+            return sums.astype(np.int64) if values.dtype.kind in 'iub' else sums
+        if stat == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return self._cached(column, 'sum') / self._cached(column, 'count')
+        if stat == 'std':
+            # two passes (squared deviations from the cached group means) to avoid cancellation
+            deviations = values - self._cached(column, 'mean')[self.codes]
+            squares = np.bincount(self.codes, weights=np.where(notna, deviations ** 2, 0) if notna is not None else deviations ** 2,
+                                  minlength=self.n_groups)
+            counts = self._cached(column, 'count')
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(counts > 1, np.sqrt(squares / (counts - 1)), np.nan)
+        if stat == 'sorted':
+            # values ordered by group and value, missing values last within their group
+            return values[np.lexsort((values, self.codes))]
+        if stat in ('min', 'max', 'median'):
+            ordered = self._cached(column, 'sorted')
+            counts = self._cached(column, 'count')
+            has_values = counts > 0
+            first = self._starts
+            last = self._starts + np.maximum(counts - 1, 0)
+            if stat == 'min':
+                result = ordered[np.minimum(first, len(ordered) - 1)] if len(ordered) else ordered
+            elif stat == 'max':
+                result = ordered[np.minimum(last, len(ordered) - 1)] if len(ordered) else ordered
+            else:
+                low = first + np.maximum(counts - 1, 0) // 2
+                high = first + counts // 2 - (counts == 0)
+                result = (ordered[low].astype(np.float64) + ordered[high]) / 2 if len(ordered) else ordered.astype(np.float64)
+            if has_values.all():
+                return result
+            return np.where(has_values, result, np.nan)
+        raise ValueError(f"Unknown aggregate {stat}, expected one of {AGGREGATES}")
+
+    def size(self) -> pd.Series:
+        self._refresh([])
+        return pd.Series(self.sizes, index=self.index, name='size')
+
+    def aggregate(self, **named) -> pd.DataFrame:
+        """
+        Named aggregation, as groupby(...).aggregate(new_column=(column, aggregate), ...)
+        """
+        self._refresh([column for column, _ in named.values()])
+        columns = {}
+        for name, (column, stat) in named.items():
+            columns[name] = self.sizes if stat == 'size' else self._cached(column, stat)
+        return pd.DataFrame(columns, index=self.index)
+
+    def aggregate_table(self, columns: list, stats: list) -> pd.DataFrame:
+        """
+        Every aggregate of every column with (column, aggregate) column labels, as groupby(...)[columns].aggregate(stats)
+        """
+        self._refresh(columns)
+        return pd.DataFrame({(column, stat): self.sizes if stat == 'size' else self._cached(column, stat)
+                             for column in columns for stat in stats}, index=self.index)
+
+
+def group_index(df: pd.DataFrame, keys: list) -> GroupIndex:
+    """
+    Cached GroupIndex of df on keys: repeated groupings of the same frame reuse its codes and statistics, which
+    are checked against the content of the frame on every query
+    """
+    cache_key = (id(df), tuple(keys))
+    index = _group_indexes.get(cache_key)
+    if index is None or index._df() is not df or index.n_rows != len(df):
+        index = GroupIndex(df, keys)
+        _group_indexes[cache_key] = index
+        weakref.finalize(df, _group_indexes.pop, cache_key, None)
+    return index
@@ -0,0 +1,232 @@
+"""
+Persistent monthly rollup of the NYC Airbnb listings keyed by (month of last_review, neighbourhood_group).
+Every cell holds mergeable partial aggregates (listing count, price count/sum/sum of squares, number_of_reviews
+sum), so a new daily extract is folded in by adding its partials, without rescanning the history, and monthly
+trends, month-of-year cycles and rolling windows are answered from the rollup alone.
+Listings without last_review have no month and are not rolled up, as in resample('M').
+A whole dataset that is regenerated rather than appended to (e.g. the cleaned csv of task3.py) is kept as a
+source under a stable key instead, and its partials are replaced when its content changes.
+
+Usage: python common/monthly_rollup.py path/to/rollup_dir [extract.csv ...]
+"""
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+from airbnb_schema import read_listings
+from csv_cache import file_hash
+
+
+ROLLUP_KEYS = ['month', 'neighbourhood_group']
+# additive partial aggregates, every column of a merged rollup is the sum of the merged ones
+PARTIALS = ['listings', 'price_count', 'price_sum', 'price_sumsq', 'number_of_reviews_sum']
+USECOLS = ['neighbourhood_group', 'price', 'number_of_reviews', 'last_review']
+# names the current rollup file, the folded extracts and the sources, replaced atomically on save
+MANIFEST_FILE = 'manifest.json'
+# source column of the rollup file, empty for the cells of the folded extracts
+SOURCE_COLUMN = 'source'
+
+
+def monthly_partials(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Partial aggregates of the listings of df per (month, neighbourhood_group), in one pass over group codes
+    """
+    months = df['last_review'].to_numpy().astype('datetime64[M]')
+    groups = pd.Categorical(df['neighbourhood_group'])
+    valid = ~np.isnat(months) & (groups.codes >= 0)
+    month_numbers = months[valid].astype(np.int64)
+    first_month = month_numbers.min() if len(month_numbers) else 0
+    n_groups = max(len(groups.categories), 1)
+    codes = (month_numbers - first_month) * n_groups + groups.codes[valid]
+    observed, codes = np.unique(codes, return_inverse=True)
+
+    prices = df['price'].to_numpy()[valid].astype(np.float64)
+    has_price = ~np.isnan(prices)
+    prices = np.where(has_price, prices, 0)
+    reviews = df['number_of_reviews'].to_numpy()[valid]
+    partials = pd.DataFrame({
+        'listings': np.bincount(codes, minlength=len(observed)),
+        'price_count': np.bincount(codes, weights=has_price, minlength=len(observed)),
+        # exact while the sums stay below 2**53
+        'price_sum': np.bincount(codes, weights=prices, minlength=len(observed)),
+        'price_sumsq': np.bincount(codes, weights=prices ** 2, minlength=len(observed)),
+        'number_of_reviews_sum': np.bincount(codes, weights=reviews, minlength=len(observed)),
+    }).astype({'listings': 'int64', 'price_count': 'int64', 'number_of_reviews_sum': 'int64'})
+    month_index = pd.PeriodIndex(((observed // n_groups) + first_month).astype('datetime64[M]'), freq='M')
+    partials.index = pd.MultiIndex.from_arrays([month_index, groups.categories.take(observed % n_groups).astype(str)],
+                                               names=ROLLUP_KEYS)
+    return partials
+
+
+def merge_partials(*partials: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cell-wise sum of partial aggregates
+    """
+    partials = [partial for partial in partials if len(partial)]
+    if not partials:
+        return _empty_partials()
+    return pd.concat(partials).groupby(level=ROLLUP_KEYS).sum().sort_index()
+
+
+def _empty_partials() -> pd.DataFrame:
+    index = pd.MultiIndex.from_arrays([pd.PeriodIndex([], freq='M'), pd.Index([], dtype=object)], names=ROLLUP_KEYS)
+    return pd.DataFrame({column: pd.Series(dtype='float64' if column in ('price_sum', 'price_sumsq') else 'int64')
+                         for column in PARTIALS}, index=index)
+
+
+def _statistics(partials: pd.DataFrame) -> pd.DataFrame:
+    counts = partials['price_count']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_price = partials['price_sum'] / counts
+        variance = (partials['price_sumsq'] - partials['price_sum'] * avg_price) / (counts - 1)
+    return pd.DataFrame({
+        'avg_price': avg_price,
+        'number_of_reviews': partials['number_of_reviews_sum'],
+        'listings': partials['listings'],
+        'price_std': np.sqrt(variance.clip(lower=0)).where(counts > 1),
+    }, index=partials.index)
+
+
+class MonthlyRollup:
+    """
+    Monthly rollup, optionally persisted in a directory: a versioned rollup-<n>.csv and a manifest with its
+    name, the ids of the folded extracts and the content id of every source
+    """
+    def __init__(self, path: str = None):
+        self.path = path
+        self.folded = _empty_partials()
+        self.extracts = {}
+        self.sources = {}
+        self.source_ids = {}
+        self.version = 0
+        if path and os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            self._load()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, extract_id: str = None) -> 'MonthlyRollup':
+        rollup = cls()
+        rollup.fold(df, extract_id)
+        return rollup
+
+    def _load(self):
+        with open(os.path.join(self.path, MANIFEST_FILE)) as file:
+            manifest = json.load(file)
+        self.version, self.extracts = manifest['version'], manifest['extracts']
+        self.source_ids = manifest.get('sources', {})
+        partials = pd.read_csv(os.path.join(self.path, manifest['rollup']),
+                               dtype={'neighbourhood_group': object, SOURCE_COLUMN: object}, keep_default_na=False)
+        partials['month'] = pd.PeriodIndex(partials['month'], freq='M')
+        partials = partials.set_index(ROLLUP_KEYS)
+        sources = partials.pop(SOURCE_COLUMN) if SOURCE_COLUMN in partials else pd.Series('', index=partials.index)
+        self.folded = merge_partials(partials.loc[sources.to_numpy() == '', PARTIALS])
+        self.sources = {key: partials.loc[sources.to_numpy() == key, PARTIALS] for key in self.source_ids}
+
+    @property
+    def partials(self) -> pd.DataFrame:
+        """
+        Partials of the folded extracts and of all sources
+        """
+        return merge_partials(self.folded, *self.sources.values())
+
+    def save(self, path: str = None):
+        """
+        Write a new rollup version to path (the loaded directory by default), then switch the manifest to it:
+        a crash leaves the previous rollup and its extract ids in place, so no extract is ever counted twice or lost
+        """
+        self.path = path or self.path
+        os.makedirs(self.path, exist_ok=True)
+        manifest_path = os.path.join(self.path, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            # the versions keep increasing when a rollup is saved to a new directory over an older one
+            with open(manifest_path) as file:
+                self.version = max(self.version, json.load(file)['version'])
+        previous_rollup = f"rollup-{self.version}.csv"
+        self.version += 1
+        rollup_file = f"rollup-{self.version}.csv"
+        cells = [partials.assign(**{SOURCE_COLUMN: key}) for key, partials in [('', self.folded), *self.sources.items()]]
+        pd.concat(cells).to_csv(os.path.join(self.path, rollup_file))
+        with open(manifest_path + '.tmp', 'w') as file:
+            json.dump({'version': self.version, 'rollup': rollup_file, 'extracts': self.extracts, 'sources': self.source_ids},
+                      file, indent=2, sort_keys=True)
+        os.replace(manifest_path + '.tmp', manifest_path)
+        if os.path.exists(os.path.join(self.path, previous_rollup)):
+            os.remove(os.path.join(self.path, previous_rollup))
+
+    def fold(self, df: pd.DataFrame, extract_id: str = None) -> bool:
+        """
+        Add the listings of an extract; an extract id that was already folded is skipped. Returns whether df was folded
+        """
+        if extract_id is not None and extract_id in self.extracts:
+            return False
+        self.folded = merge_partials(self.folded, monthly_partials(df))
+        if extract_id is not None:
+            self.extracts[extract_id] = len(df)
+        return True
+
+    def set_source(self, key: str, partials: pd.DataFrame, source_id: str) -> bool:
+        """
+        Replace the partials of the source key (e.g. the path of a dataset) by the ones of its content source_id;
+        skipped when that content is already stored. Returns whether the partials were replaced
+        """
+        if self.source_ids.get(key) == source_id:
+            return False
+        self.sources[key] = partials
+        self.source_ids[key] = source_id
+        return True
+
+    def _by_month(self, groups: list = None) -> pd.DataFrame:
+        partials = self.partials
+        if groups is not None:
+            partials = partials[partials.index.get_level_values('neighbourhood_group').isin(groups)]
+        return partials.groupby(level='month').sum()
+
+    def trends(self, groups: list = None) -> pd.DataFrame:
+        """
+        Average price and total number_of_reviews per calendar month over the given neighbourhood groups (all by
+        default), months without listings included, as df.set_index('last_review').resample('M')
+        """
+        by_month = self._by_month(groups)
+        if len(by_month):
+            by_month = by_month.reindex(pd.period_range(by_month.index.min(), by_month.index.max(), freq='M'), fill_value=0)
+        trends = _statistics(by_month)
+        trends.index = trends.index.to_timestamp(how='end').normalize().rename('last_review')
+        return trends
+
+    def trends_by_group(self) -> pd.DataFrame:
+        """
+        Statistics per (month, neighbourhood_group) with listings, months without listings of a group left out
+        """
+        return _statistics(self.partials)
+
+    def seasonal(self, groups: list = None) -> pd.DataFrame:
+        """
+        Average price and total number_of_reviews per month of the year (1-12), across years
+        """
+        by_month = self._by_month(groups)
+        return _statistics(by_month.groupby(by_month.index.month.rename('month')).sum())
+
+    def rolling(self, column: str, window: int, min_periods: int = 1) -> pd.Series:
+        """
+        Rolling mean of a statistic over the consecutive months with listings of each neighbourhood_group
+        """
+        values = self.trends_by_group()[column]
+        return values.groupby(level='neighbourhood_group').transform(lambda x: x.rolling(window=window, min_periods=min_periods).mean())
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    rollup = MonthlyRollup(sys.argv[1])
+    for extract_path in sys.argv[2:]:
+        # extracts are identified by content, files of the same name from different days are distinct
+        extract_id = file_hash(extract_path)
+        if extract_id in rollup.extracts:
+            print(f"{extract_path} - already folded")
+            continue
+        rollup.fold(read_listings(extract_path, usecols=USECOLS), extract_id)
+        print(f"{extract_path} - folded")
+    rollup.save()
+    print(f"{len(rollup.extracts)} extracts, {len(rollup.sources)} sources, {len(rollup.partials)} (month, neighbourhood_group) cells")
+    print(rollup.trends().tail(12))
@@ -0,0 +1,244 @@
+"""
+Mergeable partial aggregates for running the NYC Airbnb analyses over datasets that do not fit in memory:
+every chunk is reduced to per-group partials (count, sum, min, max and the sum of squared deviations from the
+group mean) and the partials of all chunks are merged at the end, giving exact sizes, counts, sums, means,
+standard deviations, minima and maxima. Medians and quantiles come from a bounded-memory quantile sketch with
+logarithmic buckets: every estimate is within a configurable relative error of a true quantile and the number
+of buckets depends on the range of the values, not on the number of rows.
+The query methods follow GroupIndex (size, aggregate, aggregate_table) so chunked and in-memory code read alike.
+"""
+import numpy as np
+import pandas as pd
+
+from group_index import GroupIndex
+
+
+# relative error of the quantile estimates
+RELATIVE_ACCURACY = 0.01
+QUANTILES = {'25%': 0.25, '50%': 0.5, '75%': 0.75}
+# bucket keys are sign * (bucket + KEY_OFFSET), which orders them as the values; magnitudes below
+# MIN_MAGNITUDE share the zero bucket
+KEY_OFFSET = 1 << 20
+MIN_MAGNITUDE = 1e-9
+
+
+def _plain(level: pd.Index) -> pd.Index:
+    # ordered categories (e.g. from categorize) are fixed and give the group order, the categories read from
+    # a csv chunk are just its sorted distinct values and differ between chunks
+    if isinstance(level.dtype, pd.CategoricalDtype) and level.dtype.ordered:
+        return level
+    return level.astype(object)
+
+
+def _labels(index: pd.Index) -> pd.Index:
+    """
+    Group labels that can be merged across chunks
+    """
+    if isinstance(index, pd.MultiIndex):
+        return pd.MultiIndex.from_arrays([_plain(index.get_level_values(level)) for level in range(index.nlevels)],
+                                         names=index.names)
+    return _plain(index).rename(index.name)
+
+
+class QuantileSketch:
+    """
+    Per-group counts of values in logarithmic buckets: bucket i holds magnitudes in (gamma**(i-1), gamma**i] with
+    gamma = (1 + accuracy) / (1 - accuracy), so its representative 2 * gamma**i / (gamma + 1) is within the
+    relative accuracy of every value in it
+    """
+    def __init__(self, counts: pd.Series, accuracy: float = RELATIVE_ACCURACY):
+        self.counts = counts
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+
+    @classmethod
+    def from_values(cls, labels: pd.Index, codes: np.ndarray, values: np.ndarray, accuracy: float = RELATIVE_ACCURACY) -> 'QuantileSketch':
+        sketch = cls(None, accuracy)
+        present = ~np.isnan(values) if values.dtype.kind == 'f' else np.ones(len(values), dtype=bool)
+        values = values[present].astype(np.float64)
+        magnitudes = np.abs(values)
+        nonzero = magnitudes >= MIN_MAGNITUDE
+        buckets = np.zeros(len(values), dtype=np.int64)
+        buckets[nonzero] = np.ceil(np.log(magnitudes[nonzero]) / np.log(sketch.gamma)).astype(np.int64) + KEY_OFFSET
+        keys = np.sign(values).astype(np.int64) * buckets
+        # one count per (group, bucket) of the chunk
+        cells, counts = np.unique(np.stack([codes[present], keys]), axis=1, return_counts=True)
+        group_labels = labels.take(cells[0])
+        arrays = [group_labels.get_level_values(level) for level in range(labels.nlevels)] + [cells[1]]
+        sketch.counts = pd.Series(counts, index=pd.MultiIndex.from_arrays(arrays, names=list(labels.names) + ['bucket']))
+        return sketch
+
+    def merge(self, *others: 'QuantileSketch') -> 'QuantileSketch':
+        if any(other.accuracy != self.accuracy for other in others):
+            raise ValueError(f"Cannot merge sketches with accuracies {sorted({self.accuracy, *(other.accuracy for other in others)})}")
+        levels = list(range(self.counts.index.nlevels))
+        return QuantileSketch(pd.concat([self.counts] + [other.counts for other in others]).groupby(level=levels, observed=True).sum(), self.accuracy)
+
+    def _values(self, keys: np.ndarray) -> np.ndarray:
+        signs = np.sign(keys)
+        buckets = np.abs(keys) - KEY_OFFSET
+        return np.where(signs == 0, 0.0, signs * 2 * self.gamma ** buckets.astype(np.float64) / (self.gamma + 1))
+
+    def quantile(self, q: float, groups: pd.Index) -> np.ndarray:
+        """
+        q-quantile of every group of groups, interpolated between the two nearest ranks as pandas does;
+        NaN for groups without values
+        """
+        result = np.full(len(groups), np.nan)
+        if not len(self.counts):
+            return result
+        counts = self.counts.sort_index()
+        group_labels = counts.index.droplevel('bucket')
+        keys = counts.index.get_level_values('bucket').to_numpy()
+        # rows of every group are contiguous after sorting, its buckets in value order
+        cumulative = np.cumsum(counts.to_numpy())
+        first_rows = ~group_labels.duplicated()
+        starts = np.flatnonzero(first_rows)
+        offsets = np.concatenate([[0], cumulative[starts[1:] - 1]])
+        totals = np.append(offsets[1:], cumulative[-1]) - offsets
+        position = group_labels[first_rows].get_indexer(groups)
+        found = position >= 0
+        position = position[found]
+        ranks = q * (totals[position] - 1)
+        lower = np.floor(ranks)
+        lower_values = self._values(keys[np.searchsorted(cumulative, offsets[position] + lower, side='right')])
+        upper_values = self._values(keys[np.searchsorted(cumulative, offsets[position] + np.ceil(ranks), side='right')])
+        result[found] = lower_values + (upper_values - lower_values) * (ranks - lower)
+        return result
+
+
+class GroupPartials:
+    """
+    Mergeable partial aggregates of value columns per group of keys (a single group without keys)
+    """
+    def __init__(self, keys: list, sizes: pd.Series, moments: pd.DataFrame, sketches: dict, dtypes: dict):
+        self.keys = list(keys)
+        self.dtypes = dtypes
+        self.sizes = sizes
+        self.moments = moments
+        self.sketches = sketches
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, keys: list, columns: list, quantiles: bool = False,
+                   accuracy: float = RELATIVE_ACCURACY) -> 'GroupPartials':
+        """
+        Partials of a chunk; quantiles adds a quantile sketch of every column
+        """
+        if keys:
+            index = GroupIndex(df, keys)
+            labels, codes, sizes = _labels(index.index), index.codes, index.sizes
+        else:
+            # the index references its frame weakly, keep the one-group frame alive
+            df = df.assign(_all=np.zeros(len(df), dtype=np.int8))
+            index = GroupIndex(df, ['_all'])
+            # an empty chunk has no group at all
+            labels, codes, sizes = pd.Index(['all'][:index.n_groups]), index.codes, index.sizes
+        moments = {}
+        for column in columns:
+            counts = index.stat(column, 'count')
+            std = index.stat(column, 'std')
+            moments[(column, 'count')] = counts
+            moments[(column, 'sum')] = index.stat(column, 'sum').astype(np.float64)
+            moments[(column, 'min')] = index.stat(column, 'min').astype(np.float64)
+            moments[(column, 'max')] = index.stat(column, 'max').astype(np.float64)
+            moments[(column, 'm2')] = np.where(counts > 1, std ** 2 * (counts - 1), 0.0)
+        sketches = {}
+        if quantiles:
+            sketches = {column: QuantileSketch.from_values(labels, codes, index.stat(column, 'values'), accuracy)
+                        for column in columns}
+        dtypes = {column: df[column].dtype for column in columns}
+        return cls(keys, pd.Series(sizes, index=labels), pd.DataFrame(moments, index=labels), sketches, dtypes)
+
+    def merge(self, *others: 'GroupPartials') -> 'GroupPartials':
+        levels = list(range(self.moments.index.nlevels))
+        sizes = pd.concat([self.sizes] + [other.sizes for other in others]).groupby(level=levels, observed=True).sum()
+        rows = pd.concat([self.moments] + [other.moments for other in others])
+        grouped = rows.groupby(level=levels, observed=True)
+        totals, minima, maxima = grouped.sum(), grouped.min(), grouped.max()
+        moments = {}
+        for column in self.moments.columns.get_level_values(0).unique():
+            counts, sums = totals[(column, 'count')], totals[(column, 'sum')]
+            means = (sums / counts.where(counts > 0)).reindex(rows.index).to_numpy()
+            # Chan et al.: m2 of the union adds the spread of the partial means around the merged mean
+            row_counts = rows[(column, 'count')].to_numpy()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                row_means = rows[(column, 'sum')].to_numpy() / row_counts
+                spread = np.where(row_counts > 0, row_counts * (row_means - means) ** 2, 0.0)
+            moments[(column, 'count')] = counts
+            moments[(column, 'sum')] = sums
+            moments[(column, 'min')] = minima[(column, 'min')]
+            moments[(column, 'max')] = maxima[(column, 'max')]
+            moments[(column, 'm2')] = totals[(column, 'm2')] + pd.Series(spread, index=rows.index).groupby(level=levels, observed=True).sum()
+        sketches = {column: sketch.merge(*(other.sketches[column] for other in others)) for column, sketch in self.sketches.items()}
+        return GroupPartials(self.keys, sizes, pd.DataFrame(moments), sketches, self.dtypes)
+
+    def stat(self, column: str, stat: str) -> np.ndarray:
+        counts = self.moments[(column, 'count')].to_numpy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if stat == 'count':
+                return counts
+            if stat in ('sum', 'min', 'max'):
+                # partials hold floats, integer columns get integer sums and extremes back as GroupIndex gives them
+                values = self.moments[(column, stat)].to_numpy()
+                dtype = self.dtypes[column]
+                if isinstance(dtype, np.dtype) and dtype.kind in 'iub' and not np.isnan(values).any():
+                    return values.astype(np.int64 if stat == 'sum' else dtype)
+                return values
+            if stat == 'mean':
+                return self.moments[(column, 'sum')].to_numpy() / counts
+            if stat == 'std':
+                return np.where(counts > 1, np.sqrt(self.moments[(column, 'm2')].to_numpy() / (counts - 1)), np.nan)
+        quantile = 0.5 if stat == 'median' else QUANTILES.get(stat)
+        if quantile is None:
+            raise ValueError(f"Unknown aggregate {stat}, expected one of size, count, sum, mean, std, min, max, median, 25%, 50%, 75%")
+        if column not in self.sketches:
+            raise ValueError(f"Quantiles of {column} need partials with quantiles=True")
+        return self.sketches[column].quantile(quantile, self.moments.index)
+
+    def size(self) -> pd.Series:
+        return self.sizes.rename('size')
+
+    def aggregate(self, **named) -> pd.DataFrame:
+        """
+        Named aggregation, as GroupIndex.aggregate
+        """
+        return pd.DataFrame({name: self.sizes.to_numpy() if stat == 'size' else self.stat(column, stat)
+                             for name, (column, stat) in named.items()}, index=self.moments.index)
+
+    def aggregate_table(self, columns: list, stats: list) -> pd.DataFrame:
+        """
+        Every aggregate of every column with (column, aggregate) column labels, as GroupIndex.aggregate_table
+        """
+        return pd.DataFrame({(column, stat): self.sizes.to_numpy() if stat == 'size' else self.stat(column, stat)
+                             for column in columns for stat in stats}, index=self.moments.index)
+
+    def describe(self) -> pd.DataFrame:
+        """
+        DataFrame.describe of the numeric columns of partials without keys
+        """
+        stats = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+        columns = list(self.moments.columns.get_level_values(0).unique())
+        if not len(self.sizes):
+            # as describe of an empty frame
+            return pd.DataFrame({column: [0.0] + [np.nan] * (len(stats) - 1) for column in columns}, index=stats)
+        return pd.DataFrame({column: [self.stat(column, stat)[0] for stat in stats] for column in columns}, index=stats)
+
+
+def append_head(heads: list, df: pd.DataFrame, n: int = 5):
+    """
+    Collect the first n rows over all chunks in heads, which is all that the scripts print of a chunked frame;
+    an empty chunk only keeps the columns until rows are found
+    """
+    collected = sum(len(head) for head in heads)
+    if collected < n and (len(df) or not heads):
+        if not collected:
+            heads.clear()
+        heads.append(df.head(n - collected))
+
+
+def merge_partials(partials):
+    """
+    Merge an iterable of GroupPartials (e.g. one per chunk) into one, in a single pass over all partials
+    """
+    partials = list(partials)
+    return partials[0].merge(*partials[1:]) if partials else None
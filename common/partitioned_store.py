@@ -0,0 +1,223 @@
+"""
+Partitioned columnar (Parquet) copy of the cleaned NYC Airbnb dataset for queries that only touch a few
+boroughs, neighbourhoods or columns. Every neighbourhood_group (and optionally room_type) gets its own
+hive-style directory (neighbourhood_group=Bronx/part-0.parquet), rows inside a file are sorted by
+neighbourhood so the min/max statistics of its row groups are selective, and a manifest keeps the row count
+and per-column min/max of every file. read_partitioned prunes files from the manifest and row groups from the
+Parquet statistics, and reads only the requested columns: a one-borough query reads only that borough's bytes.
+The original row numbers are stored too, so results come back in the order and with the labels of the csv.
+"""
+import datetime
+import json
+import os
+import shutil
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from airbnb_schema import CLEANED_DTYPES, DATE_COLUMNS, arrow_schema
+
+
+PARTITION_COLUMNS = ['neighbourhood_group']
+SORT_COLUMNS = ['neighbourhood']
+ROW_GROUP_ROWS = 1 << 14
+MANIFEST_FILE = '_manifest.json'
+# position of the row in the source file
+ROW_COLUMN = '_row'
+OPERATORS = ('==', '!=', '<', '<=', '>', '>=', 'in', 'not in')
+
+
+def _stat_value(value):
+    # min/max as json values, dates as ISO strings
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, (pd.Timestamp, datetime.date)):
+        return value.isoformat()[:10]
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _column_stats(column: pd.Series) -> dict:
+    present = column.dropna()
+    if isinstance(present.dtype, pd.CategoricalDtype):
+        present = present.astype(object)
+    return {
+        'min': _stat_value(present.min()) if len(present) else None,
+        'max': _stat_value(present.max()) if len(present) else None,
+        'nulls': int(column.isna().sum()),
+    }
+
+
+def write_partitioned(df: pd.DataFrame, root: str, partition_columns: list = PARTITION_COLUMNS,
+                      sort_columns: list = SORT_COLUMNS, row_group_rows: int = ROW_GROUP_ROWS) -> dict:
+    """
+    Write df (the cleaned dataset) under root, replacing an existing copy only after everything is written.
+    Returns the manifest
+    """
+    df = df.copy()
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            # the cleaned csv keeps the 'NaT' placeholder, which is a missing date here
+            df[column] = pd.to_datetime(df[column].replace('NaT', None), format='%Y-%m-%d')
+    df[ROW_COLUMN] = np.arange(len(df), dtype=np.int64)
+    stored_columns = [column for column in df.columns if column not in partition_columns]
+    schema = arrow_schema([column for column in stored_columns if column != ROW_COLUMN]).append(pa.field(ROW_COLUMN, pa.int64()))
+
+    tmp_root = f"{root}.tmp"
+    shutil.rmtree(tmp_root, ignore_errors=True)
+    files = []
+    for values, part in df.groupby(partition_columns, observed=True, sort=True):
+        values = values if isinstance(values, tuple) else (values,)
+        directory = os.path.join(*[f"{column}={quote(str(value), safe=' ')}" for column, value in zip(partition_columns, values)])
+        os.makedirs(os.path.join(tmp_root, directory))
+        path = os.path.join(directory, 'part-0.parquet')
+        part = part.sort_values(sort_columns + [ROW_COLUMN], kind='stable')[stored_columns]
+        pq.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False), os.path.join(tmp_root, path),
+                       row_group_size=row_group_rows, write_statistics=True)
+        files.append({
+            'path': path,
+            'partition': {column: _stat_value(value) for column, value in zip(partition_columns, values)},
+            'rows': len(part),
+            'bytes': os.path.getsize(os.path.join(tmp_root, path)),
+            'columns': {column: _column_stats(part[column]) for column in stored_columns if column != ROW_COLUMN},
+        })
+    manifest = {'columns': [column for column in df.columns if column != ROW_COLUMN],
+                'partition_columns': list(partition_columns), 'files': files}
+    with open(os.path.join(tmp_root, MANIFEST_FILE), 'w') as file:
+        json.dump(manifest, file, indent=1)
+
+    old_root = f"{root}.old"
+    if os.path.exists(root):
+        os.replace(root, old_root)
+    os.replace(tmp_root, root)
+    shutil.rmtree(old_root, ignore_errors=True)
+    return manifest
+
+
+def _comparable(stat, value):
+    # stats are json values (dates as ISO strings) or Parquet statistics (dates as datetime.date)
+    if isinstance(value, (pd.Timestamp, datetime.date)) or isinstance(stat, datetime.date):
+        return pd.Timestamp(stat), pd.Timestamp(value)
+    return stat, value
+
+
+def _may_match(low, high, nulls_only: bool, operator: str, value) -> bool:
+    """
+    Whether any value in [low, high] can satisfy column <operator> value; False only when certain
+    """
+    if nulls_only:
+        # missing values fail every comparison except the negated ones
+        return operator in ('!=', 'not in')
+    if low is None or high is None:
+        return True
+    if operator in ('in', 'not in'):
+        values = list(value)
+        if operator == 'in':
+            return any(_may_match(low, high, False, '==', item) for item in values)
+        # only a file holding a single listed value is ruled out
+        return not any(not _may_match(low, high, False, '!=', item) for item in values)
+    low, value = _comparable(low, value)
+    high, _ = _comparable(high, value)
+    if operator == '==':
+        return low <= value <= high
+    if operator == '!=':
+        return not (low == high == value)
+    if operator == '<':
+        return low < value
+    if operator == '<=':
+        return low <= value
+    if operator == '>':
+        return high > value
+    if operator == '>=':
+        return high >= value
+    raise ValueError(f"Unknown operator {operator}, expected one of {OPERATORS}")
+
+
+def _row_mask(df: pd.DataFrame, filters: list) -> np.ndarray:
+    mask = np.ones(len(df), dtype=bool)
+    for column, operator, value in filters:
+        values = df[column]
+        if column in DATE_COLUMNS:
+            value = [pd.Timestamp(item) for item in value] if operator in ('in', 'not in') else pd.Timestamp(value)
+        if operator == 'in':
+            mask &= values.isin(value).to_numpy()
+        elif operator == 'not in':
+            mask &= ~values.isin(value).to_numpy()
+        else:
+            comparisons = {'==': values.__eq__, '!=': values.__ne__, '<': values.__lt__, '<=': values.__le__,
+                           '>': values.__gt__, '>=': values.__ge__}
+            if operator not in comparisons:
+                raise ValueError(f"Unknown operator {operator}, expected one of {OPERATORS}")
+            mask &= comparisons[operator](value).to_numpy()
+    return mask
+
+
+def read_partitioned(root: str, columns: list = None, filters: list = None) -> pd.DataFrame:
+    """
+    Rows of the stored dataset that satisfy all filters, a list of (column, operator, value) with the operators
+    ==, !=, <, <=, >, >=, in and not in, restricted to columns. Files and row groups whose statistics rule out a
+    filter are skipped. Rows keep the csv order and index; df.attrs['scan'] reports what was read
+    """
+    filters = filters or []
+    with open(os.path.join(root, MANIFEST_FILE)) as file:
+        manifest = json.load(file)
+    columns = list(columns or manifest['columns'])
+    partition_columns = manifest['partition_columns']
+    filter_columns = [column for column, _, _ in filters]
+    read_columns = [column for column in dict.fromkeys(columns + filter_columns) if column not in partition_columns]
+    scan = {'files': 0, 'files_pruned': 0, 'row_groups': 0, 'row_groups_pruned': 0, 'bytes_read': 0, 'bytes_total': 0}
+
+    parts = []
+    for entry in manifest['files']:
+        scan['bytes_total'] += entry['bytes']
+        stats = {**{column: {'min': value, 'max': value, 'nulls': 0} for column, value in entry['partition'].items()},
+                 **entry['columns']}
+        if not all(_may_match(stats[column]['min'], stats[column]['max'], stats[column]['nulls'] == entry['rows'], operator, value)
+                   for column, operator, value in filters):
+            scan['files_pruned'] += 1
+            continue
+        scan['files'] += 1
+        parquet_file = pq.ParquetFile(os.path.join(root, entry['path']))
+        metadata = parquet_file.metadata
+        positions = {metadata.schema.column(i).name: i for i in range(metadata.num_columns)}
+        row_groups = []
+        for group in range(metadata.num_row_groups):
+            row_group = metadata.row_group(group)
+            matches = True
+            for column, operator, value in filters:
+                if column not in positions:
+                    continue
+                statistics = row_group.column(positions[column]).statistics
+                if statistics is None or not statistics.has_min_max:
+                    nulls_only = statistics is not None and statistics.null_count == row_group.num_rows
+                    matches &= _may_match(None, None, nulls_only, operator, value)
+                else:
+                    matches &= _may_match(statistics.min, statistics.max, False, operator, value)
+            if matches:
+                row_groups.append(group)
+                scan['bytes_read'] += sum(row_group.column(positions[column]).total_compressed_size
+                                          for column in read_columns + [ROW_COLUMN])
+        scan['row_groups'] += len(row_groups)
+        scan['row_groups_pruned'] += metadata.num_row_groups - len(row_groups)
+        if not row_groups:
+            continue
+        part = parquet_file.read_row_groups(row_groups, columns=read_columns + [ROW_COLUMN]).to_pandas(date_as_object=False)
+        for column, value in entry['partition'].items():
+            part[column] = value
+        parts.append(part[_row_mask(part, filters)])
+
+    schema_columns = read_columns + [column for column in columns if column in partition_columns]
+    if parts:
+        df = pd.concat(parts, ignore_index=True)
+    else:
+        df = pd.DataFrame({**{column: pd.Series(dtype=object) for column in schema_columns}, ROW_COLUMN: pd.Series(dtype=np.int64)})
+    df = df.sort_values(ROW_COLUMN).set_index(ROW_COLUMN).rename_axis(None)
+    df = df[columns]
+    for column in columns:
+        if column in DATE_COLUMNS:
+            df[column] = pd.to_datetime(df[column]).astype('datetime64[ns]')
+        elif column in CLEANED_DTYPES:
+            df[column] = df[column].astype(CLEANED_DTYPES[column])
+    df.attrs['scan'] = scan
+    return df
@@ -0,0 +1,172 @@
+"""
+Top-k rankings without sorting the whole frame: rows that can still reach the top k are selected with a
+linear-time partition on the first sort key (plus all rows tied with the k-th value), and only those
+candidates are sorted on all keys. Orderings follow DataFrame.sort_values: several keys with mixed
+directions, missing values last, ties kept in frame order, i.e. the result equals
+df.sort_values(by, ascending=ascending, kind='stable').head(k)
+"""
+import numpy as np
+import pandas as pd
+from group_index import group_index
+
+
+def _order_key(column: pd.Series, ascending: bool) -> tuple:
+    """
+    (values, missing) such that sorting values ascending gives the order of the column in the given direction
+    """
+    dtype = column.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        values = column.cat.codes.to_numpy().astype(np.int64)
+        missing = values < 0
+    elif dtype.kind in 'iub':
+        values, missing = column.to_numpy().astype(np.int64), None
+    elif dtype.kind == 'f':
+        values = column.to_numpy()
+        missing = np.isnan(values)
+    elif dtype.kind in 'mM':
+        values = column.to_numpy().view(np.int64)
+        missing = np.isnat(column.to_numpy())
+    else:
+        # strings and other objects: rank of the value among the sorted distinct values
+        values, _ = pd.factorize(column, sort=True)
+        values = values.astype(np.int64)
+        missing = values < 0
+    if not ascending:
+        values = -values
+    if missing is not None and not missing.any():
+        missing = None
+    return values, missing
+
+
+def _normalize(by, ascending) -> tuple:
+    by = [by] if isinstance(by, str) else list(by)
+    ascending = [ascending] * len(by) if isinstance(ascending, bool) else list(ascending)
+    if len(ascending) != len(by):
+        raise ValueError(f"Length of ascending ({len(ascending)}) != length of by ({len(by)})")
+    return by, ascending
+
+
+def _candidates(first_values: np.ndarray, first_missing, positions: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions whose first key is among the k smallest, including every row tied with the k-th value
+    """
+    values = first_values[positions]
+    if first_missing is not None:
+        present = ~first_missing[positions]
+        if present.sum() <= k:
+            # all present values qualify, missing values fill up the rest
+            return positions
+        values_present = values[present]
+        kth = np.partition(values_present, k - 1)[k - 1]
+        return positions[present & (values <= kth)]
+    if len(positions) <= k:
+        return positions
+    kth = np.partition(values, k - 1)[k - 1]
+    return positions[values <= kth]
+
+
+def _sorted_positions(keys: list, positions: np.ndarray) -> np.ndarray:
+    """
+    Stable sort of positions on all keys, missing values last per key
+    """
+    sort_keys = []
+    for values, missing in reversed(keys):
+        sort_keys.append(values[positions])
+        if missing is not None:
+            sort_keys.append(missing[positions])
+    # positions are increasing, so lexsort (stable) keeps ties in frame order
+    return positions[np.lexsort(sort_keys)] if sort_keys else positions
+
+
+def _tied_with_last(keys: list, ordered: np.ndarray, k: int) -> np.ndarray:
+    """
+    Length of the prefix of ordered that ends with every row tied with the k-th row on all keys
+    """
+    last = ordered[k - 1]
+    tied = np.ones(len(ordered) - k, dtype=bool)
+    for values, missing in keys:
+        rest = ordered[k:]
+        same = values[rest] == values[last]
+        if missing is not None:
+            same = np.where(missing[rest] | missing[last], missing[rest] & missing[last], same)
+        tied &= same
+    # ties are contiguous after a full sort of the candidates
+    return k + int(np.argmin(tied)) if not tied.all() else len(ordered)
+
+
+def _order_keys(df: pd.DataFrame, by, ascending, positions: np.ndarray = None) -> list:
+    """
+    Order keys of the by columns, indexed by row position; only the given positions of the secondary keys are
+    converted (the other rows can no longer reach the top)
+    """
+    by, ascending = _normalize(by, ascending)
+    keys = [_order_key(df[by[0]], ascending[0])]
+    for column, column_ascending in zip(by[1:], ascending[1:]):
+        if positions is None:
+            keys.append(_order_key(df[column], column_ascending))
+            continue
+        values, missing = _order_key(df[column].iloc[positions], column_ascending)
+        # scatter back to row positions, the other rows are never read
+        full_values = np.zeros(len(df), dtype=values.dtype)
+        full_values[positions] = values
+        full_missing = None
+        if missing is not None:
+            full_missing = np.zeros(len(df), dtype=bool)
+            full_missing[positions] = missing
+        keys.append((full_values, full_missing))
+    return keys
+
+
+def _top_positions(keys: list, positions: np.ndarray, k: int, keep: str) -> np.ndarray:
+    if k <= 0 or not len(positions):
+        return positions[:0]
+    ordered = _sorted_positions(keys, _candidates(*keys[0], positions, k))
+    if keep == 'all' and len(ordered) > k:
+        return ordered[:_tied_with_last(keys, ordered, k)]
+    return ordered[:k]
+
+
+def _top_candidates(df: pd.DataFrame, by, ascending, k: int) -> tuple:
+    """
+    Order keys and the candidate positions of the top k rows, secondary keys converted for the candidates only
+    """
+    by, ascending = _normalize(by, ascending)
+    first_key = _order_key(df[by[0]], ascending[0])
+    candidates = _candidates(*first_key, np.arange(len(df)), k) if k > 0 else np.arange(0)
+    keys = [first_key] + _order_keys(df, by[1:], ascending[1:], candidates) if len(by) > 1 else [first_key]
+    return keys, candidates
+
+
+def top_k_positions(df: pd.DataFrame, by, k: int, ascending=True, keep: str = 'first') -> np.ndarray:
+    """
+    Row positions of the top k rows of df in ranking order. keep='first' returns k rows, ties at the
+    boundary in frame order; keep='all' also returns every row tied with the k-th one on all keys
+    """
+    if keep not in ('first', 'all'):
+        raise ValueError(f"keep must be 'first' or 'all', got {keep}")
+    keys, candidates = _top_candidates(df, by, ascending, k)
+    return _top_positions(keys, candidates, k, keep)
+
+
+def top_k(df: pd.DataFrame, by, k: int, ascending=True, keep: str = 'first') -> pd.DataFrame:
+    """
+    First k rows of df ordered by the by columns, as df.sort_values(by, ascending=ascending, kind='stable').head(k)
+    """
+    return df.iloc[top_k_positions(df, by, k, ascending, keep)]
+
+
+def top_k_per_group(df: pd.DataFrame, keys: list, by, k: int, ascending=True) -> pd.DataFrame:
+    """
+    First k rows of every group of keys, in overall ranking order, as
+    df.sort_values(by, ascending=ascending, kind='stable').groupby(keys, observed=True).head(k)
+    """
+    index = group_index(df, keys)
+    order_keys = _order_keys(df, by, ascending)
+    rows = np.arange(len(df)) if index._rows is None else index._rows
+    # rows of every group, in frame order (narrow codes are sorted by a linear radix sort)
+    codes = index.codes.astype(np.int16) if index.n_groups <= np.iinfo(np.int16).max else index.codes
+    grouped_rows = rows[np.argsort(codes, kind='stable')]
+    bounds = np.concatenate([[0], np.cumsum(index.sizes)])
+    selected = [_top_positions(order_keys, grouped_rows[start:end], k, 'first') for start, end in zip(bounds[:-1], bounds[1:])]
+    selected = np.sort(np.concatenate(selected)) if selected else np.array([], dtype=np.int64)
+    return df.iloc[_sorted_positions(order_keys, selected)]
@@ -1,9 +1,17 @@
+import os
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from airbnb_schema import read_listings
+from group_index import group_index
+from monthly_rollup import MonthlyRollup
 
-df = pd.read_csv('data/NY_Airbnb/cleaned_airbnb_data.csv')
+
+USECOLS = ['neighbourhood_group', 'room_type', 'price', 'number_of_reviews', 'last_review', 'availability_365']
+df = read_listings('data/NY_Airbnb/cleaned_airbnb_data.csv', usecols=USECOLS, cleaned=True)
 
 
 def plot_bar_of_listing_by_neighbourhood_group(df):
@@ -79,7 +87,7 @@ def stacked_bar_reviews_to_room_type(df):
 
 if __name__ == '__main__':
     #1
-    listing_counts = df['neighbourhood_group'].value_counts().sort_values(ascending=True)
+    listing_counts = group_index(df, ['neighbourhood_group']).size().sort_values(ascending=True)
     plot_bar_of_listing_by_neighbourhood_group(listing_counts)
 
     #2
@@ -88,7 +96,8 @@ if __name__ == '__main__':
     box_plot_of_price_across_neighbourhood(prices_by_group, neighbourhood_groups)
 
     #3 
-    grouped = df.groupby(['neighbourhood_group', 'room_type']).agg(
+    # the same group codes are reused by #7
+    grouped = group_index(df, ['neighbourhood_group', 'room_type']).aggregate(
         mean_availability=('availability_365', 'mean'),
         std_availability=('availability_365', 'std')
     ).reset_index()
@@ -99,18 +108,19 @@ if __name__ == '__main__':
     scatter_price_to_number_reviews(df)
 
     #5
-    df['last_review'] = pd.to_datetime(df['last_review'])
-    df['year_month'] = df['last_review'].dt.to_period('M')
-    monthly_grouped = df.groupby(['year_month', 'neighbourhood_group']).agg({'number_of_reviews': 'sum'}).reset_index()
-    monthly_grouped['year_month'] = monthly_grouped['year_month'].dt.to_timestamp()
-    monthly_grouped['rolling_reviews'] = monthly_grouped.groupby('neighbourhood_group')['number_of_reviews'].transform(lambda x: x.rolling(window=2, min_periods=1).mean())
+    # monthly sums and the rolling window come from the (month, neighbourhood_group) rollup
+    rollup = MonthlyRollup.from_frame(df)
+    monthly_grouped = rollup.trends_by_group()[['number_of_reviews']].assign(
+        rolling_reviews=rollup.rolling('number_of_reviews', window=2, min_periods=1)).reset_index()
+    monthly_grouped['year_month'] = monthly_grouped['month'].dt.to_timestamp()
+    monthly_grouped['neighbourhood_group'] = monthly_grouped['neighbourhood_group'].astype(df['neighbourhood_group'].dtype)
     line_plot_review_over_time(monthly_grouped)
 
     #6
-    corr_df = df.groupby('neighbourhood_group').apply(lambda x: x[['price', 'availability_365']].corr().iloc[0, 1]).reset_index()
+    corr_df = df.groupby('neighbourhood_group', observed=True).apply(lambda x: x[['price', 'availability_365']].corr().iloc[0, 1]).reset_index()
     corr_df.columns = ['neighbourhood_group', 'correlation']
     #print(corr_df)
 
     #7
-    pivot_df = df.pivot_table(index='neighbourhood_group', columns='room_type', values='number_of_reviews', aggfunc='sum', fill_value=0)
+    pivot_df = group_index(df, ['neighbourhood_group', 'room_type']).aggregate(number_of_reviews=('number_of_reviews', 'sum'))['number_of_reviews'].unstack('room_type', fill_value=0)
     stacked_bar_reviews_to_room_type(pivot_df)
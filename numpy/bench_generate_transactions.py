@@ -0,0 +1,63 @@
+"""
+Benchmark of generate_transactions.py against the generation task2 used before (legacy np.random.randint and
+one timedelta, strftime and int per timestamp), in memory and into memory-mapped .npy files with 1 to
+max_workers processes. The files are checked to be equal whatever the number of workers.
+
+Usage: python numpy/bench_generate_transactions.py [n_rows] [max_workers]
+"""
+import datetime
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from transactions import FIELDS
+from generate_transactions import generate_transactions
+
+
+N_ROWS = 20_000_000
+LEGACY_ROWS = 1_000_000
+MAX_WORKERS = 4
+
+
+# task2 as it was
+def legacy_generation(n_rows):
+    np.random.seed(42)
+    start = datetime.datetime.strptime('20240101', "%Y%m%d")
+    timestamps = np.array([int((start + datetime.timedelta(days=i)).strftime("%Y%m%d")) for i in range(n_rows)])
+    return np.column_stack([np.arange(1, n_rows + 1), np.arange(101, 101 + n_rows),
+                            np.random.randint(100, 200, size=n_rows), np.random.randint(1, 10, size=n_rows),
+                            np.random.randint(10, 100, size=n_rows), timestamps])
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else MAX_WORKERS
+    # the timestamps of the old loop overflow the year 9999 after about 2.9 million days
+    _, seconds = timed(lambda: legacy_generation(LEGACY_ROWS))
+    print(f"legacy generation: {LEGACY_ROWS / seconds / 1e6:.2f}M rows/s")
+    generated, seconds = timed(lambda: generate_transactions(LEGACY_ROWS))
+    print(f"generate_transactions in memory: {LEGACY_ROWS / seconds / 1e6:.2f}M rows/s")
+
+    options = dict(n_users=10_000_000, n_days=3650)
+    with tempfile.TemporaryDirectory() as directory:
+        expected = None
+        for workers in range(1, max_workers + 1):
+            path = os.path.join(directory, f"workers_{workers}")
+            generated, seconds = timed(lambda: generate_transactions(n_rows, path, workers=workers, **options))
+            print(f"{n_rows:,} rows to .npy with {workers} workers: {seconds:.2f}s ({n_rows / seconds / 1e6:.1f}M rows/s)")
+            if expected is None:
+                expected = generated
+            else:
+                assert all(np.array_equal(expected[field], generated[field]) for field in FIELDS), f"{workers} workers differ"
+        in_memory = generate_transactions(n_rows, **options)
+        assert all(np.array_equal(in_memory[field], expected[field]) for field in FIELDS), 'in memory differs'
+        assert np.all(expected['timestamp'][1:] >= expected['timestamp'][:-1]), 'timestamps out of order'
+        # the memory maps are closed before the directory is removed
+        del expected, generated
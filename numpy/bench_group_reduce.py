@@ -0,0 +1,77 @@
+"""
+Benchmark of the per-key kernels of group_reduce.py against the loops task2 used before (a dict per product,
+a list of zipped tuples per user, a full argsort of the row revenues) and against np.unique with ufunc.at for
+the top products by total revenue, on n_rows synthetic transactions. Results are checked to be equal.
+
+Usage: python numpy/bench_group_reduce.py [n_rows]
+"""
+import sys
+import time
+import numpy as np
+from transactions import Transactions, as_date
+from task2 import most_purchased_product, row_revenues, top_products, top_products_by_revenue, user_transaction_count
+
+
+N_ROWS = 10_000_000
+N_USERS = 1_000_000
+TOP_N = 10
+
+
+# task2 as it was
+def loop_most_purchased_product(transactions):
+    product_quantities = {}
+    for product, quantity in zip(transactions['product_id'], transactions['quantity'].astype(int)):
+        if product in product_quantities:
+            product_quantities[product] += quantity
+        else:
+            product_quantities[product] = quantity
+    return max(product_quantities, key=product_quantities.get)
+
+def zip_user_transaction_count(transactions):
+    users, counts = np.unique(transactions['user_id'], return_counts=True)
+    return np.array(list(zip(users, counts)))
+
+def argsort_top_products(transactions, top_n):
+    return transactions[np.argsort(row_revenues(transactions), kind='stable')[-top_n:]]
+
+def unique_top_products_by_revenue(transactions, top_n):
+    products, inverse = np.unique(transactions['product_id'], return_inverse=True)
+    revenues = np.zeros(len(products))
+    np.add.at(revenues, inverse, row_revenues(transactions))
+    top = np.argsort(revenues, kind='stable')[::-1][:top_n]
+    return products[top], revenues[top]
+
+
+def compare(name, before, after, equal):
+    start = time.perf_counter()
+    expected = before()
+    before_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    result = after()
+    after_seconds = time.perf_counter() - start
+    print(f"{name}: before {before_seconds:.3f}s, kernel {after_seconds:.3f}s ({before_seconds / after_seconds:.0f}x)")
+    assert equal(expected, result), f"{name} differs"
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS
+    rng = np.random.default_rng(42)
+    transactions = Transactions.from_fields(
+        transaction_id=np.arange(1, n_rows + 1),
+        user_id=rng.integers(1, N_USERS + 1, n_rows),
+        # a sparse product id space, reduced by sorting
+        product_id=rng.integers(0, 100_000, n_rows) * 1_000,
+        quantity=rng.integers(1, 10, n_rows),
+        price=rng.integers(10, 100, n_rows),
+        timestamp=as_date(20240101) + rng.integers(0, 3650, n_rows),
+    )
+    print(f"{n_rows:,} transactions")
+    compare('most_purchased_product', lambda: loop_most_purchased_product(transactions),
+            lambda: most_purchased_product(transactions), lambda a, b: a == b)
+    compare('user_transaction_count', lambda: zip_user_transaction_count(transactions),
+            lambda: user_transaction_count(transactions), np.array_equal)
+    compare('top_products', lambda: argsort_top_products(transactions, TOP_N)['transaction_id'],
+            lambda: top_products(transactions, TOP_N)['transaction_id'], np.array_equal)
+    compare('top products by total revenue', lambda: unique_top_products_by_revenue(transactions, TOP_N),
+            lambda: top_products_by_revenue(transactions, TOP_N),
+            lambda a, b: np.array_equal(a[0], b['product_id']) and np.array_equal(a[1], b['revenue']))
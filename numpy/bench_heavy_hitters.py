@@ -0,0 +1,95 @@
+"""
+Checks and timings of the streaming aggregators of heavy_hitters.py on n_rows synthetic transactions fed in
+chunks to n_workers aggregators that are then merged. ExactCounter and TopRows must equal the batch task2
+functions, SpaceSaving and CountMinSketch (on skewed user ids) must stay within their error bounds.
+
+Usage: python numpy/bench_heavy_hitters.py [n_rows] [chunk_rows]
+"""
+import sys
+import time
+import numpy as np
+from generate_transactions import generate_transactions
+from heavy_hitters import CountMinSketch, ExactCounter, SpaceSaving, TopRows
+from task2 import most_purchased_product, row_revenues, top_products, top_products_by_revenue
+
+
+N_ROWS = 20_000_000
+CHUNK_ROWS = 1_000_000
+N_WORKERS = 4
+TOP_N = 10
+CAPACITY = 1_000
+EPSILON, DELTA = 1e-4, 1e-3
+HEAVY_FRACTION = 1e-3
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def streamed(transactions, chunk_rows, make, feed):
+    """
+    One aggregator per worker over consecutive parts of the stream, fed chunk by chunk and merged in order
+    """
+    bounds = np.linspace(0, len(transactions), N_WORKERS + 1).astype(int)
+    workers = []
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        aggregator = make()
+        for start in range(first, last, chunk_rows):
+            feed(aggregator, transactions[start:min(start + chunk_rows, last)])
+        workers.append(aggregator)
+    for aggregator in workers[1:]:
+        workers[0].merge(aggregator)
+    return workers[0]
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS
+    chunk_rows = int(sys.argv[2]) if len(sys.argv) > 2 else CHUNK_ROWS
+    transactions = generate_transactions(n_rows, n_users=10_000_000, n_days=3650)
+    # a few users make most of the transactions
+    transactions.columns['user_id'] = np.minimum(np.random.default_rng(42).zipf(1.3, n_rows), 2**31 - 1).astype(np.int32)
+    print(f"{n_rows:,} transactions in chunks of {chunk_rows:,} rows over {N_WORKERS} workers")
+
+    expected, batch_seconds = timed(lambda: most_purchased_product(transactions))
+    products, seconds = timed(lambda: streamed(transactions, chunk_rows, ExactCounter,
+                                               lambda counter, chunk: counter.update(chunk['product_id'], chunk['quantity'])))
+    print(f"most purchased product: batch {batch_seconds:.2f}s, streamed {seconds:.2f}s")
+    assert products.most_frequent() == expected, 'most purchased product differs'
+
+    expected, batch_seconds = timed(lambda: top_products_by_revenue(transactions, TOP_N))
+    revenues, seconds = timed(lambda: streamed(transactions, chunk_rows, ExactCounter,
+                                               lambda counter, chunk: counter.update(chunk['product_id'], row_revenues(chunk))))
+    print(f"top products by revenue: batch {batch_seconds:.2f}s, streamed {seconds:.2f}s")
+    keys, totals = revenues.top(TOP_N)
+    assert np.array_equal(keys, expected['product_id']) and np.array_equal(totals, expected['revenue']), 'top products by revenue differ'
+
+    expected, batch_seconds = timed(lambda: top_products(transactions, TOP_N))
+    top_rows, seconds = timed(lambda: streamed(transactions, chunk_rows, lambda: TopRows(TOP_N),
+                                               lambda rows, chunk: rows.update(chunk, row_revenues(chunk))))
+    print(f"top products: batch {batch_seconds:.2f}s, streamed {seconds:.2f}s")
+    assert np.array_equal(top_rows.top()['transaction_id'], expected['transaction_id']), 'top products differ'
+
+    # the exact user counts are only computed to check the bounds
+    users, true_counts = np.unique(transactions['user_id'], return_counts=True)
+    print(f"{len(users):,} distinct users, the largest has {true_counts.max():,} transactions")
+
+    space_saving, seconds = timed(lambda: streamed(transactions, chunk_rows, lambda: SpaceSaving(CAPACITY),
+                                                   lambda summary, chunk: summary.update(chunk['user_id'])))
+    lower, upper = space_saving.bounds(users)
+    print(f"space-saving ({CAPACITY:,} counters): {seconds:.2f}s, error {space_saving.error:,} <= N / (capacity + 1) = {n_rows // (CAPACITY + 1):,}")
+    assert space_saving.error <= n_rows / (CAPACITY + 1) and np.all(lower <= true_counts) and np.all(true_counts <= upper), 'space-saving bounds'
+    heavy = users[true_counts > HEAVY_FRACTION * n_rows]
+    assert np.isin(heavy, space_saving.heavy_hitters(HEAVY_FRACTION)).all(), 'a heavy hitter is missing'
+    top_users = users[np.argsort(true_counts, kind='stable')[::-1][:TOP_N]]
+    print(f"top {TOP_N} users found by space-saving: {np.isin(top_users, space_saving.top(TOP_N)[0]).sum()}")
+
+    sketch, seconds = timed(lambda: streamed(transactions, chunk_rows, lambda: CountMinSketch.from_error(EPSILON, DELTA),
+                                             lambda counter, chunk: counter.update(chunk['user_id'])))
+    overestimates = sketch.estimate(users) - true_counts
+    print(f"count-min ({sketch.depth} x {sketch.width:,}): {seconds:.2f}s, "
+          f"{np.mean(overestimates > sketch.epsilon * n_rows):.2e} of the users above epsilon * N (delta = {sketch.delta:.1e})")
+    assert np.all(overestimates >= 0) and np.mean(overestimates > sketch.epsilon * n_rows) <= sketch.delta, 'count-min bounds'
+    keys, _ = sketch.top(space_saving.keys, TOP_N)
+    print(f"top {TOP_N} users found by count-min over the space-saving keys: {np.isin(top_users, keys).sum()}")
@@ -0,0 +1,78 @@
+"""
+Benchmark of TransactionIndex against the scanning task2 functions for date window and per-user queries on
+n_rows synthetic transactions (timestamps in random order). The scans answer n_queries queries of every kind,
+the index the same queries (checked to give equal results) and then many more, one by one and batched.
+
+Usage: python numpy/bench_transaction_index.py [n_rows] [n_queries]
+"""
+import sys
+import time
+import numpy as np
+from transactions import FIELDS, Transactions, as_date
+from transaction_index import TransactionIndex
+from task2 import date_range_slicing, revenue_comparison, user_transactions
+
+
+N_ROWS = 10_000_000
+N_QUERIES = 50
+INDEX_QUERIES = 100_000
+N_USERS = 1_000_000
+N_DAYS = 3650
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def per_query(seconds: float, n_queries: int) -> str:
+    return f"{seconds / n_queries * 1e6:.1f}us/query"
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else N_QUERIES
+    rng = np.random.default_rng(42)
+    transactions = Transactions.from_fields(
+        transaction_id=np.arange(1, n_rows + 1),
+        user_id=rng.integers(1, N_USERS + 1, n_rows, dtype=np.int32),
+        product_id=rng.integers(100, 200, n_rows, dtype=np.int32),
+        quantity=rng.integers(1, 10, n_rows, dtype=np.int16),
+        price=rng.integers(10, 100, n_rows, dtype=np.int32),
+        timestamp=as_date(20240101) + rng.integers(0, N_DAYS, n_rows),
+    )
+    starts = as_date(20240101) + rng.integers(0, N_DAYS, INDEX_QUERIES)
+    ends = starts + rng.integers(0, 90, INDEX_QUERIES)
+    users = rng.integers(1, N_USERS + 1, INDEX_QUERIES)
+    print(f"{n_rows:,} transactions")
+
+    index, seconds = timed(lambda: TransactionIndex(transactions))
+    print(f"index build {seconds:.2f}s")
+
+    windows = list(zip(starts[:n_queries], ends[:n_queries]))
+    scanned, scan_seconds = timed(lambda: [date_range_slicing(transactions, start, end) for start, end in windows])
+    indexed, index_seconds = timed(lambda: [index.date_range_slicing(start, end) for start, end in windows])
+    print(f"date_range_slicing: scan {per_query(scan_seconds, n_queries)}, index {per_query(index_seconds, n_queries)}")
+    for expected, result in zip(scanned, indexed):
+        assert all(np.array_equal(expected[field], result[field]) for field in FIELDS), 'date_range_slicing differs'
+
+    comparisons = [(*windows[i], *windows[-1 - i]) for i in range(n_queries)]
+    scanned, scan_seconds = timed(lambda: [revenue_comparison(transactions, *periods) for periods in comparisons])
+    indexed, index_seconds = timed(lambda: [index.revenue_comparison(*periods) for periods in comparisons])
+    print(f"revenue_comparison: scan {per_query(scan_seconds, n_queries)}, index {per_query(index_seconds, n_queries)}")
+    assert scanned == indexed, 'revenue_comparison differs'
+
+    scanned, scan_seconds = timed(lambda: [user_transactions(transactions, user) for user in users[:n_queries]])
+    indexed, index_seconds = timed(lambda: [index.user_transactions(user) for user in users[:n_queries]])
+    print(f"user_transactions: scan {per_query(scan_seconds, n_queries)}, index {per_query(index_seconds, n_queries)}")
+    for expected, result in zip(scanned, indexed):
+        assert all(np.array_equal(expected[field], result[field]) for field in FIELDS), 'user_transactions differs'
+
+    _, seconds = timed(lambda: [index.window_revenue(start, end) for start, end in zip(starts, ends)])
+    print(f"{INDEX_QUERIES:,} window revenues one by one: {per_query(seconds, INDEX_QUERIES)}")
+    revenues, seconds = timed(lambda: index.window_revenues(starts, ends))
+    print(f"{INDEX_QUERIES:,} window revenues batched: {per_query(seconds, INDEX_QUERIES)}")
+    _, seconds = timed(lambda: [index.user_transactions(user) for user in users])
+    print(f"{INDEX_QUERIES:,} user_transactions: {per_query(seconds, INDEX_QUERIES)}")
+    assert revenues[0] == index.window_revenue(starts[0], ends[0])
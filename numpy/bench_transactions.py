@@ -0,0 +1,121 @@
+"""
+Benchmark of the columnar Transactions container against the int64 column_stack matrix task2 used before,
+for the analytics of task2 on n_rows synthetic transactions (ten years of days, 10M users, 100 products).
+The two layouts are never in memory together: every field is generated from its own seeded stream, first
+into the container and then, once it is freed, column by column into the matrix. Results are checked to be equal.
+
+Usage: python numpy/bench_transactions.py [n_rows]
+"""
+import sys
+import time
+import numpy as np
+from transactions import FIELDS, Transactions, as_date
+from task2 import date_range_slicing, filter_transactions, revenue_comparison, top_products, total_revenue, user_transactions
+
+
+N_ROWS = 100_000_000
+SEED = 42
+N_USERS = 10_000_000
+TOP_N = 5
+PERIODS = (20240101, 20240331, 20250101, 20250331)
+
+
+def generate_field(name: str, n_rows: int, seed: int = SEED) -> np.ndarray:
+    rng = np.random.default_rng([seed, list(FIELDS).index(name)])
+    if name == 'transaction_id':
+        return np.arange(1, n_rows + 1, dtype=np.int64)
+    if name == 'user_id':
+        return rng.integers(1, N_USERS + 1, n_rows, dtype=np.int32)
+    if name == 'product_id':
+        return rng.integers(100, 200, n_rows, dtype=np.int32)
+    if name == 'quantity':
+        return rng.integers(1, 10, n_rows, dtype=np.int16)
+    if name == 'price':
+        return rng.integers(10, 100, n_rows, dtype=np.int32)
+    return as_date(20240101) + rng.integers(0, 3650, n_rows, dtype=np.int16)
+
+
+def yyyymmdd(dates: np.ndarray) -> np.ndarray:
+    years = dates.astype('datetime64[Y]')
+    months = dates.astype('datetime64[M]')
+    return ((years.astype(np.int64) + 1970) * 10000 + (months - years).astype(np.int64) * 100
+            + 100 + (dates - months).astype(np.int64) + 1)
+
+
+# the functions of task2 on the matrix, as they were
+def legacy_total_revenue(transactions):
+    quantities = transactions[:, 3].astype(float)
+    prices = transactions[:, 4].astype(float)
+    return np.sum(quantities * prices)
+
+def legacy_filter_transactions(transactions):
+    return transactions[transactions[:, 3].astype(int) > 1]
+
+def legacy_date_range_slicing(transactions, start_date, end_date):
+    return transactions[(transactions[:, 5].astype(int) >= start_date) & (transactions[:, 5].astype(int) <= end_date)]
+
+def legacy_revenue_comparison(transactions, start_date1, end_date1, start_date2, end_date2):
+    return {"period1": legacy_total_revenue(legacy_date_range_slicing(transactions, start_date1, end_date1)),
+            "period2": legacy_total_revenue(legacy_date_range_slicing(transactions, start_date2, end_date2))}
+
+def legacy_user_transactions(transactions, user_id):
+    return transactions[transactions[:, 1].astype(int) == user_id]
+
+def legacy_top_products(transactions, top_n):
+    quantities = transactions[:, 3].astype(float)
+    prices = transactions[:, 4].astype(float)
+    # stable, like the tie order of task2.top_products
+    return transactions[np.argsort(quantities * prices, kind='stable')[-top_n:]]
+
+
+def run(functions: dict, transactions) -> dict:
+    results = {}
+    for name, function in functions.items():
+        start = time.perf_counter()
+        result = function(transactions)
+        seconds = time.perf_counter() - start
+        # rows are compared by their transaction ids
+        if isinstance(result, Transactions):
+            result = result['transaction_id']
+        elif isinstance(result, np.ndarray):
+            result = result[:, 0]
+        results[name] = (seconds, result)
+    return results
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS
+    user_id = int(generate_field('user_id', 1)[0])
+    transactions = Transactions.from_fields(**{name: generate_field(name, n_rows) for name in FIELDS})
+    print(f"{n_rows:,} transactions, columnar {transactions.nbytes / 2**20:.0f} MiB, matrix {n_rows * len(FIELDS) * 8 / 2**20:.0f} MiB")
+    columnar = run({
+        'total_revenue': total_revenue,
+        'filter_transactions': filter_transactions,
+        'date_range_slicing': lambda t: date_range_slicing(t, *PERIODS[:2]),
+        'revenue_comparison': lambda t: revenue_comparison(t, *PERIODS),
+        'user_transactions': lambda t: user_transactions(t, user_id),
+        'top_products': lambda t: top_products(t, TOP_N),
+    }, transactions)
+    del transactions
+
+    matrix = np.empty((n_rows, len(FIELDS)), dtype=np.int64)
+    for position, name in enumerate(FIELDS):
+        values = generate_field(name, n_rows)
+        matrix[:, position] = yyyymmdd(values) if name == 'timestamp' else values
+    del values
+    legacy = run({
+        'total_revenue': legacy_total_revenue,
+        'filter_transactions': legacy_filter_transactions,
+        'date_range_slicing': lambda t: legacy_date_range_slicing(t, *PERIODS[:2]),
+        'revenue_comparison': lambda t: legacy_revenue_comparison(t, *PERIODS),
+        'user_transactions': lambda t: legacy_user_transactions(t, user_id),
+        'top_products': lambda t: legacy_top_products(t, TOP_N),
+    }, matrix)
+
+    for name, (seconds, result) in columnar.items():
+        legacy_seconds, legacy_result = legacy[name]
+        print(f"{name}: matrix {legacy_seconds:.3f}s, columnar {seconds:.3f}s ({legacy_seconds / seconds:.1f}x)")
+        if isinstance(result, np.ndarray):
+            assert np.array_equal(result, legacy_result), f"{name} differs"
+        else:
+            assert result == legacy_result, f"{name} differs"
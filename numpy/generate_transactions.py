@@ -0,0 +1,92 @@
+"""
+Synthetic transaction generator for load tests. Rows are produced in chunks of chunk_rows rows, every chunk
+from its own np.random.Generator seeded by SeedSequence(seed).spawn, so the output only depends on the seed and
+the chunk size, never on the number of workers. Timestamps are datetime64[D] arithmetic on the row numbers.
+With a path, the fields are preallocated as memory-mapped .npy files (one per field, see Transactions.load) and
+the chunks are filled in place by a process pool, so outputs larger than memory can be generated.
+
+Usage: python numpy/generate_transactions.py n_rows output_dir [workers]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from transactions import FIELDS, Transactions, as_date
+
+
+CHUNK_ROWS = 1 << 20
+SEED = 42
+START_DATE = 20240101
+FIRST_USER_ID = 101
+PRODUCT_IDS = (100, 200)
+QUANTITIES = (1, 10)
+PRICES = (10, 100)
+
+
+def fill_chunk(columns: dict, start: int, stop: int, seed: np.random.SeedSequence, n_rows: int,
+               n_users: int = None, n_days: int = None, start_date=START_DATE):
+    """
+    Rows start to stop of every field, written into the arrays (or memory maps) of columns.
+    Without n_users every transaction has its own user, without n_days its own day, as in task2
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.arange(start, stop, dtype=np.int64)
+    columns['transaction_id'][start:stop] = rows + 1
+    if n_users is None:
+        columns['user_id'][start:stop] = rows + FIRST_USER_ID
+    else:
+        columns['user_id'][start:stop] = rng.integers(FIRST_USER_ID, FIRST_USER_ID + n_users, stop - start, dtype=np.int32)
+    columns['product_id'][start:stop] = rng.integers(*PRODUCT_IDS, stop - start, dtype=np.int32)
+    columns['quantity'][start:stop] = rng.integers(*QUANTITIES, stop - start, dtype=np.int16)
+    columns['price'][start:stop] = rng.integers(*PRICES, stop - start, dtype=np.int32)
+    # n_days spreads the rows evenly (and in order) over that many days
+    days = rows if n_days is None else rows * n_days // n_rows
+    columns['timestamp'][start:stop] = as_date(start_date) + days
+
+
+def _fill_file_chunk(path: str, start: int, stop: int, seed: np.random.SeedSequence, n_rows: int, options: dict):
+    columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r+') for name in FIELDS}
+    fill_chunk(columns, start, stop, seed, n_rows, **options)
+    for values in columns.values():
+        values.flush()
+
+
+def generate_transactions(n_rows: int, path: str = None, seed: int = SEED, workers: int = 1,
+                          chunk_rows: int = CHUNK_ROWS, **options) -> Transactions:
+    """
+    n_rows transactions, in memory or (with path) in memory-mapped .npy files filled by workers processes.
+    options are the n_users, n_days and start_date of fill_chunk
+    """
+    starts = range(0, n_rows, chunk_rows)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    chunks = [(start, min(start + chunk_rows, n_rows), chunk_seed) for start, chunk_seed in zip(starts, seeds)]
+    if path is None:
+        transactions = Transactions.empty(n_rows)
+        for start, stop, chunk_seed in chunks:
+            fill_chunk(transactions.columns, start, stop, chunk_seed, n_rows, **options)
+        return transactions
+
+    os.makedirs(path, exist_ok=True)
+    for name, dtype in FIELDS.items():
+        # preallocated once, the workers write their rows in place
+        np.lib.format.open_memmap(os.path.join(path, f"{name}.npy"), mode='w+', dtype=dtype, shape=(n_rows,)).flush()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_fill_file_chunk, path, start, stop, chunk_seed, n_rows, options)
+                       for start, stop, chunk_seed in chunks]
+            for future in futures:
+                future.result()
+    else:
+        for start, stop, chunk_seed in chunks:
+            _fill_file_chunk(path, start, stop, chunk_seed, n_rows, options)
+    return Transactions.load(path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.exit(__doc__)
+    started = time.perf_counter()
+    generated = generate_transactions(int(sys.argv[1]), sys.argv[2], workers=int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count(),
+                                      n_users=10_000_000, n_days=3650)
+    print(f"{len(generated):,} transactions ({generated.nbytes / 2**20:.0f} MiB) in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,107 @@
+"""
+Vectorized per-key aggregation of transaction fields (sum, count, max and first row per product or user)
+and partial top-n selection. Keys are grouped once: small key ranges (product ids, dense user ids) are used as
+offsets into bincount/ufunc.at tables, other keys are stable-sorted and reduced per run with ufunc.reduceat.
+Results are in increasing key order.
+"""
+import numpy as np
+
+
+# keys are used as offsets when their range is at most this many times the number of rows
+DENSE_KEY_RANGE = 4
+
+
+def stable_key_order(keys: np.ndarray) -> np.ndarray:
+    """
+    np.argsort(keys, kind='stable') for integer keys; keys with a range below 2**31 are packed with their row
+    number into one int64 and sorted by value, which is several times faster than a stable argsort
+    """
+    if keys.dtype.kind in 'iu' and len(keys) and len(keys) < 1 << 32 and int(keys.max()) - int(keys.min()) < 1 << 31:
+        packed = (keys.astype(np.int64) - int(keys.min())) << 32
+        packed |= np.arange(len(keys), dtype=np.int64)
+        packed.sort()
+        return (packed & 0xFFFFFFFF).astype(np.intp)
+    return np.argsort(keys, kind='stable')
+
+
+class KeyGroups:
+    def __init__(self, keys: np.ndarray):
+        keys = np.asarray(keys)
+        self.n_rows = len(keys)
+        self.dense = bool(self.n_rows) and keys.dtype.kind in 'iu' and int(keys.max()) - int(keys.min()) < DENSE_KEY_RANGE * self.n_rows
+        if self.dense:
+            offset = keys.min()
+            self.codes = (keys - offset).astype(np.intp)
+            counts = np.bincount(self.codes)
+            self.present = np.flatnonzero(counts)
+            self.keys = (self.present + offset).astype(keys.dtype)
+            self.counts = counts[self.present]
+        else:
+            self.order = stable_key_order(keys)
+            sorted_keys = keys[self.order]
+            self.starts = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]])) if self.n_rows else np.zeros(0, dtype=np.intp)
+            self.keys = sorted_keys[self.starts]
+            self.counts = np.diff(np.append(self.starts, self.n_rows))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def count(self) -> np.ndarray:
+        return self.counts
+
+    def sum(self, values: np.ndarray) -> np.ndarray:
+        """
+        Sum per key, int64 for integer values (exact while the sums stay below 2**53), float64 otherwise
+        """
+        dtype = np.int64 if values.dtype.kind in 'iub' else np.float64
+        if not len(self):
+            return np.zeros(0, dtype=dtype)
+        if self.dense:
+            return np.bincount(self.codes, weights=values)[self.present].astype(dtype)
+        return np.add.reduceat(values[self.order], self.starts, dtype=dtype)
+
+    def max(self, values: np.ndarray) -> np.ndarray:
+        if not len(self):
+            return np.zeros(0, dtype=values.dtype)
+        if self.dense:
+            lowest = np.iinfo(values.dtype).min if values.dtype.kind in 'iu' else -np.inf
+            maxima = np.full(self.present[-1] + 1, lowest, dtype=values.dtype)
+            np.maximum.at(maxima, self.codes, values)
+            return maxima[self.present]
+        return np.maximum.reduceat(values[self.order], self.starts)
+
+    def min(self, values: np.ndarray) -> np.ndarray:
+        if not len(self):
+            return np.zeros(0, dtype=values.dtype)
+        if self.dense:
+            highest = np.iinfo(values.dtype).max if values.dtype.kind in 'iu' else np.inf
+            minima = np.full(self.present[-1] + 1, highest, dtype=values.dtype)
+            np.minimum.at(minima, self.codes, values)
+            return minima[self.present]
+        return np.minimum.reduceat(values[self.order], self.starts)
+
+    def first_rows(self) -> np.ndarray:
+        """
+        Position of the first row of every key
+        """
+        if self.dense:
+            first = np.full(self.present[-1] + 1, self.n_rows, dtype=np.intp)
+            np.minimum.at(first, self.codes, np.arange(self.n_rows))
+            return first[self.present]
+        return self.order[self.starts]
+
+
+def top_n_positions(scores: np.ndarray, top_n: int) -> np.ndarray:
+    """
+    np.argsort(scores, kind='stable')[-top_n:] (ascending, ties in position order) with a partial selection:
+    only the scores at or above the top_n-th largest are sorted
+    """
+    top_n = min(top_n, len(scores))
+    if top_n <= 0:
+        return np.zeros(0, dtype=np.intp)
+    threshold = scores[np.argpartition(scores, len(scores) - top_n)[len(scores) - top_n]]
+    above = np.flatnonzero(scores > threshold)
+    # of the rows tied at the threshold, the stable ascending order ranks the last ones highest
+    tied = np.flatnonzero(scores == threshold)[len(above) + np.count_nonzero(scores == threshold) - top_n:]
+    candidates = np.concatenate([tied, above])
+    return candidates[np.argsort(scores[candidates], kind='stable')] if len(above) else tied
@@ -0,0 +1,235 @@
+"""
+Streaming aggregators over chunks of transactions that are never held together. Each one consumes chunks with
+update(keys, weights) (or update(chunk, scores) for TopRows), keeps a bounded state and combines with the
+aggregator of another worker with merge, the other stream being taken as following this one:
+- ExactCounter: exact weight per key while the keys fit in max_keys, top-k like the batch task2 functions
+- CountMinSketch: overestimated point queries in depth x width counters, error at most epsilon * N with
+  probability 1 - delta (N the total weight)
+- SpaceSaving: at most capacity counters, every key heavier than N / (capacity + 1) is kept
+- TopRows: the top_n rows by score, like task2.top_products
+Weights must not be negative. Integer weights are summed exactly (the sketch counters are float64, exact below 2**53).
+"""
+import math
+import numpy as np
+from transactions import Transactions
+from group_reduce import KeyGroups, top_n_positions
+
+
+def chunk_totals(keys: np.ndarray, weights: np.ndarray = None) -> tuple:
+    """
+    Distinct keys of a chunk (increasing), their total weight (the count without weights) and the position of
+    their first row
+    """
+    groups = KeyGroups(keys)
+    if weights is not None and len(weights) and weights.min() < 0:
+        raise ValueError("Weights must not be negative")
+    totals = groups.count().astype(np.int64) if weights is None else groups.sum(weights)
+    return groups.keys, totals, groups.first_rows().astype(np.int64)
+
+
+def ranked(keys: np.ndarray, totals: np.ndarray, top_n: int) -> tuple:
+    # keys in increasing order, as the batch functions rank them: decreasing totals, ties from the largest key
+    top = top_n_positions(totals, top_n)[::-1]
+    return keys[top], totals[top]
+
+
+class ExactCounter:
+    def __init__(self, max_keys: int = 1_000_000):
+        self.max_keys = max_keys
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.totals = np.zeros(0, dtype=np.int64)
+        self.first_seen = np.zeros(0, dtype=np.int64)
+        self.n_rows = 0
+
+    def _combine(self, keys, totals, first_seen, n_rows):
+        groups = KeyGroups(np.concatenate([self.keys, keys]))
+        if len(groups) > self.max_keys:
+            raise ValueError(f"{len(groups)} distinct keys do not fit in max_keys={self.max_keys}, use SpaceSaving or CountMinSketch")
+        self.totals = groups.sum(np.concatenate([self.totals, totals]))
+        self.first_seen = groups.min(np.concatenate([self.first_seen, first_seen + self.n_rows]))
+        self.keys = groups.keys
+        self.n_rows += n_rows
+
+    def update(self, keys: np.ndarray, weights: np.ndarray = None) -> 'ExactCounter':
+        self._combine(*chunk_totals(keys, weights), len(keys))
+        return self
+
+    def merge(self, other: 'ExactCounter') -> 'ExactCounter':
+        self._combine(other.keys, other.totals, other.first_seen, other.n_rows)
+        return self
+
+    def top(self, top_n: int) -> tuple:
+        """
+        The top_n keys and their totals, in decreasing order (see task2.top_products_by_revenue)
+        """
+        return ranked(self.keys, self.totals, top_n)
+
+    def most_frequent(self):
+        """
+        The key with the largest total, the first seen of equal ones (see task2.most_purchased_product)
+        """
+        heaviest = np.flatnonzero(self.totals == self.totals.max())
+        return self.keys[heaviest[np.argmin(self.first_seen[heaviest])]]
+
+
+class CountMinSketch:
+    """
+    Row r hashes a key with a multiply-shift hash into 2**bits counters. Two keys collide with probability
+    at most 2 / width, so a row overestimates by more than epsilon * N with probability at most 1 / e when
+    width >= 2e / epsilon, and the minimum over depth = ln(1 / delta) rows with probability at most delta.
+    """
+    def __init__(self, width: int, depth: int, seed: int = 0):
+        self.bits = max(1, math.ceil(math.log2(width)))
+        self.depth = depth
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.multipliers = rng.integers(0, 2**64, depth, dtype=np.uint64, endpoint=False) | np.uint64(1)
+        self.increments = rng.integers(0, 2**64, depth, dtype=np.uint64, endpoint=False)
+        self.table = np.zeros((depth, 1 << self.bits))
+        self.total = 0
+
+    @classmethod
+    def from_error(cls, epsilon: float, delta: float, seed: int = 0) -> 'CountMinSketch':
+        return cls(math.ceil(2 * math.e / epsilon), math.ceil(math.log(1 / delta)), seed)
+
+    @property
+    def width(self) -> int:
+        return 1 << self.bits
+
+    @property
+    def epsilon(self) -> float:
+        return 2 * math.e / self.width
+
+    @property
+    def delta(self) -> float:
+        return math.exp(-self.depth)
+
+    def _buckets(self, keys: np.ndarray, row: int) -> np.ndarray:
+        # uint64 products wrap around, the top bits are the bucket
+        hashed = keys.astype(np.uint64) * self.multipliers[row] + self.increments[row]
+        return (hashed >> np.uint64(64 - self.bits)).astype(np.intp)
+
+    def update(self, keys: np.ndarray, weights: np.ndarray = None) -> 'CountMinSketch':
+        # each distinct key of the chunk is hashed once
+        keys, totals, _ = chunk_totals(keys, weights)
+        for row in range(self.depth):
+            self.table[row] += np.bincount(self._buckets(keys, row), weights=totals, minlength=self.width)
+        self.total += totals.sum()
+        return self
+
+    def merge(self, other: 'CountMinSketch') -> 'CountMinSketch':
+        if (other.bits, other.depth, other.seed) != (self.bits, self.depth, self.seed):
+            raise ValueError("Only sketches with the same width, depth and seed can be merged")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+    def estimate(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Upper bounds of the totals of keys, at most epsilon * total above them with probability 1 - delta
+        """
+        keys = np.asarray(keys)
+        return np.min([self.table[row, self._buckets(keys, row)] for row in range(self.depth)], axis=0)
+
+    def top(self, candidates: np.ndarray, top_n: int) -> tuple:
+        """
+        The top_n of candidate keys (e.g. the keys of a SpaceSaving) by estimated total
+        """
+        candidates = np.unique(candidates)
+        return ranked(candidates, self.estimate(candidates), top_n)
+
+
+class SpaceSaving:
+    """
+    Kept in the mergeable Misra-Gries form: when more than capacity keys are counted, the (capacity + 1)-th
+    largest count is subtracted from all of them and the ones left at zero are dropped. A kept count is at most
+    error below the true total (the space-saving count is count + error) and error <= N / (capacity + 1),
+    so every key heavier than that is kept.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.error = 0
+        self.total = 0
+
+    def _combine(self, keys, counts, error, total):
+        groups = KeyGroups(np.concatenate([self.keys, keys]))
+        counts = groups.sum(np.concatenate([self.counts, counts]))
+        keys = groups.keys
+        self.error += error
+        if len(keys) > self.capacity:
+            subtracted = np.partition(counts, len(counts) - self.capacity - 1)[len(counts) - self.capacity - 1]
+            kept = counts > subtracted
+            keys, counts = keys[kept], counts[kept] - subtracted
+            self.error += subtracted
+        self.keys, self.counts = keys, counts
+        self.total += total
+
+    def update(self, keys: np.ndarray, weights: np.ndarray = None) -> 'SpaceSaving':
+        keys, totals, _ = chunk_totals(keys, weights)
+        self._combine(keys, totals, 0, totals.sum())
+        return self
+
+    def merge(self, other: 'SpaceSaving') -> 'SpaceSaving':
+        self._combine(other.keys, other.counts, other.error, other.total)
+        return self
+
+    def bounds(self, keys: np.ndarray) -> tuple:
+        """
+        Lower and upper bounds of the totals of keys (a key that is not kept has a lower bound of 0)
+        """
+        positions = np.clip(np.searchsorted(self.keys, keys), 0, max(len(self.keys) - 1, 0))
+        found = (self.keys[positions] == keys) if len(self.keys) else np.zeros(len(keys), dtype=bool)
+        lower = np.where(found, self.counts[positions] if len(self.keys) else 0, 0)
+        return lower, lower + self.error
+
+    def top(self, top_n: int) -> tuple:
+        """
+        The top_n kept keys by count, exact when no count was ever subtracted (error == 0)
+        """
+        return ranked(self.keys, self.counts, top_n)
+
+    def heavy_hitters(self, fraction: float) -> np.ndarray:
+        """
+        Keys that may be heavier than fraction of the total: all those that are, and none below fraction * N - error
+        """
+        return self.keys[self.counts + self.error > fraction * self.total]
+
+
+class TopRows:
+    def __init__(self, top_n: int):
+        self.top_n = top_n
+        self.rows = None
+        self.scores = np.zeros(0)
+        self.positions = np.zeros(0, dtype=np.int64)
+        self.n_rows = 0
+
+    def _combine(self, rows, scores, positions, n_rows):
+        if self.rows is not None:
+            rows = Transactions({name: np.concatenate([self.rows[name], rows[name]]) for name in self.rows.fields})
+            scores = np.concatenate([self.scores, scores])
+            positions = np.concatenate([self.positions, positions + self.n_rows])
+        else:
+            positions = positions + self.n_rows
+        # candidates are in stream order, so ties are broken like in one stable sort of the whole stream
+        top = np.sort(top_n_positions(scores, self.top_n))
+        self.rows, self.scores, self.positions = rows[top], scores[top], positions[top]
+        self.n_rows += n_rows
+
+    def update(self, chunk: Transactions, scores: np.ndarray) -> 'TopRows':
+        self._combine(chunk, scores, np.arange(len(chunk), dtype=np.int64), len(chunk))
+        return self
+
+    def merge(self, other: 'TopRows') -> 'TopRows':
+        if other.rows is not None:
+            self._combine(other.rows, other.scores, other.positions, other.n_rows)
+        else:
+            self.n_rows += other.n_rows
+        return self
+
+    def top(self) -> Transactions:
+        """
+        The rows in increasing score order, as task2.top_products returns them
+        """
+        return self.rows[np.argsort(self.scores, kind='stable')]
@@ -2,98 +2,96 @@
 Practical Task 2: Analyzing and Visualizing E-Commerce Transactions with NumPy
 """
 import numpy as np
-import random
-from datetime import datetime, timedelta
-np.random.seed(42)
+from transactions import Transactions, as_date
+from transaction_index import TransactionIndex
+from group_reduce import KeyGroups, top_n_positions
+from generate_transactions import generate_transactions
+from heavy_hitters import ExactCounter, TopRows
 
 
 ARRAY_SIZE = 10
-COLUMNS = ["transaction_id", "user_id", "product_id", "quantity", "price", "timestamp"]
 
 
-def generate_timestamps(start_date: str, length: int) -> np.ndarray:
-    start = datetime.strptime(start_date, "%Y%m%d")
-    timestamps = [int((start + timedelta(days=i)).strftime("%Y%m%d")) for i in range(length)]
-    return np.array(timestamps)
-
 # Create a sample array
 def array_creation(array_size):
-    transaction_ids = np.arange(1, array_size + 1)
-    user_ids = np.arange(101, 101+array_size)
-    product_ids = np.random.randint(100, 200, size=array_size)
-    quantities = np.random.randint(1, 10, size=array_size)
-    prices = np.random.randint(10, 100, size=array_size)
-    timestamps = np.array(generate_timestamps(start_date='20240101', length=array_size))
-    transactions = np.column_stack((transaction_ids, user_ids, product_ids, quantities, prices, timestamps))
-    return transactions
-
-def total_revenue(transactions: np.ndarray) -> float:
-    quantities = transactions[:, 3].astype(float)
-    prices = transactions[:, 4].astype(float)
-    revenue = np.sum(quantities * prices)
-    return revenue
-
-def unique_users(transactions: np.ndarray) -> int:
-    users = transactions[:, 1]
+    # one user and one day per transaction, from the seeded generator of generate_transactions.py
+    return generate_transactions(array_size, seed=42, start_date=20240101)
+
+def row_revenues(transactions: Transactions) -> np.ndarray:
+    # the product is computed in float64 directly, without converted copies of both fields
+    return np.multiply(transactions['quantity'], transactions['price'], dtype=np.float64)
+
+def total_revenue(transactions: Transactions) -> float:
+    return np.sum(row_revenues(transactions))
+
+def unique_users(transactions: Transactions) -> int:
+    users = transactions['user_id']
     unique_users = np.unique(users)
     return len(unique_users)
 
-def most_purchased_product(transactions: np.ndarray) -> int:
-    products = transactions[:, 2]
-    quantities = transactions[:, 3].astype(int)
-    product_quantities = {}
-    for product, quantity in zip(products, quantities):
-        if product in product_quantities:
-            product_quantities[product] += quantity
-        else:
-            product_quantities[product] = quantity
-    most_purchased = max(product_quantities, key=product_quantities.get)
-    return most_purchased
-
-def convert_price_to_int(transactions: np.ndarray) -> np.ndarray:
-    return transactions[:, 4].astype(int)
-
-def check_data_types(transactions: np.ndarray) -> dict:
-    data_types = {COLUMNS[i]: transactions[:, i].dtype for i in range(transactions.shape[1])}
-    return data_types
-
-def product_quantity_array(transactions: np.ndarray) -> np.ndarray:
-    return transactions[:, [2, 3]]
-
-def user_transaction_count(transactions: np.ndarray) -> np.ndarray:
-    users, counts = np.unique(transactions[:, 1], return_counts=True)
-    return np.array(list(zip(users, counts)))
-
-def masked_array(transactions: np.ndarray) -> np.ndarray:
-    mask = transactions[:, 3] != 0
+def most_purchased_product(transactions: Transactions) -> int:
+    products = KeyGroups(transactions['product_id'])
+    product_quantities = products.sum(transactions['quantity'])
+    # of the products with the largest quantity, the one seen first
+    most_purchased = np.flatnonzero(product_quantities == product_quantities.max())
+    return products.keys[most_purchased[np.argmin(products.first_rows()[most_purchased])]]
+
+def convert_price_to_int(transactions: Transactions) -> np.ndarray:
+    # prices are stored as integers
+    return transactions['price']
+
+def check_data_types(transactions: Transactions) -> dict:
+    return transactions.dtypes
+
+def product_quantity_array(transactions: Transactions) -> Transactions:
+    return transactions.select(['product_id', 'quantity'])
+
+def user_transaction_count(transactions: Transactions) -> np.ndarray:
+    users = KeyGroups(transactions['user_id'])
+    return np.column_stack((users.keys.astype(np.int64), users.count()))
+
+def masked_array(transactions: Transactions) -> Transactions:
+    mask = transactions['quantity'] != 0
     return transactions[mask]
 
-def price_increase(transactions: np.ndarray, percentage: float) -> np.ndarray:
-    return transactions[:, 4].astype(float) * (1 + percentage / 100)
+def price_increase(transactions: Transactions, percentage: float) -> np.ndarray:
+    return transactions['price'] * (1 + percentage / 100)
 
-def filter_transactions(transactions: np.ndarray) -> np.ndarray:
-    return transactions[transactions[:, 3].astype(int) > 1]
+def filter_transactions(transactions: Transactions) -> Transactions:
+    return transactions[transactions['quantity'] > 1]
 
-def revenue_comparison(transactions: np.ndarray, start_date1: int, end_date1: int, start_date2: int, end_date2: int) -> dict:
-    period1 = transactions[(transactions[:, 5].astype(int) >= start_date1) & (transactions[:, 5].astype(int) <= end_date1)]
-    period2 = transactions[(transactions[:, 5].astype(int) >= start_date2) & (transactions[:, 5].astype(int) <= end_date2)]
+def revenue_comparison(transactions: Transactions, start_date1, end_date1, start_date2, end_date2) -> dict:
+    # dates are days: YYYYMMDD integers, ISO strings or datetime64; only the revenue fields of the periods are gathered
+    revenue_fields = transactions.select(['quantity', 'price'])
+    period1 = revenue_fields[date_mask(transactions, start_date1, end_date1)]
+    period2 = revenue_fields[date_mask(transactions, start_date2, end_date2)]
     revenue1 = total_revenue(period1)
     revenue2 = total_revenue(period2)
     return {"period1": revenue1, "period2": revenue2}
 
-def user_transactions(transactions: np.ndarray, user_id: int) -> np.ndarray:
-    return transactions[transactions[:, 1].astype(int) == user_id]
+def user_transactions(transactions: Transactions, user_id: int) -> Transactions:
+    return transactions[transactions['user_id'] == user_id]
 
-def date_range_slicing(transactions: np.ndarray, start_date: int, end_date: int) -> np.ndarray:
-    return transactions[(transactions[:, 5].astype(int) >= start_date) & (transactions[:, 5].astype(int) <= end_date)]
+def date_mask(transactions: Transactions, start_date, end_date) -> np.ndarray:
+    timestamps = transactions['timestamp']
+    return (timestamps >= as_date(start_date)) & (timestamps <= as_date(end_date))
 
-def top_products(transactions: np.ndarray, top_n: int) -> np.ndarray:
-    quantities = transactions[:, 3].astype(float)
-    prices = transactions[:, 4].astype(float)
-    revenues = quantities * prices
-    sorted_indices = np.argsort(revenues)[-top_n:]
+def date_range_slicing(transactions: Transactions, start_date, end_date) -> Transactions:
+    return transactions[date_mask(transactions, start_date, end_date)]
+
+def top_products(transactions: Transactions, top_n: int) -> Transactions:
+    # the top_n rows by revenue in increasing order, without sorting all rows
+    revenues = row_revenues(transactions)
+    sorted_indices = top_n_positions(revenues, top_n)
     return transactions[sorted_indices]
 
+def top_products_by_revenue(transactions: Transactions, top_n: int) -> np.ndarray:
+    # products with the largest total revenue, in decreasing order
+    products = KeyGroups(transactions['product_id'])
+    product_revenues = products.sum(row_revenues(transactions))
+    top = top_n_positions(product_revenues, top_n)[::-1]
+    return np.rec.fromarrays([products.keys[top], product_revenues[top]], names=['product_id', 'revenue'])
+
 def print_array(array, message=None):
     if message:
         print(message)
@@ -146,6 +144,24 @@ if __name__ == '__main__':
     top_prod_trans = top_products(transactions, 5)
     print_array(top_prod_trans, "Top 5 Products by Revenue:")
 
+    top_prod_revenue = top_products_by_revenue(transactions, 5)
+    print_array(top_prod_revenue, "Top 5 Products by Total Revenue:")
+
     assert transactions.shape == (ARRAY_SIZE, 6), f"Shape of the transactions array should be ({ARRAY_SIZE}, 6)"
     assert unique_users(transactions) == ARRAY_SIZE, "There should be 5 unique users"
-    assert check_data_types(transactions)['price'] == int, "Price column should be of type int"
+    assert np.issubdtype(check_data_types(transactions)['price'], np.integer), "Price column should be of type int"
+    # the index answers the same queries without scanning every row
+    index = TransactionIndex(transactions)
+    assert index.revenue_comparison(20240101, 20240103, 20240108, 20240110) == revenue_comp, "Indexed revenue comparison differs"
+    assert np.array_equal(index.user_transactions(101)['transaction_id'], user_trans['transaction_id']), "Indexed user transactions differ"
+    assert np.array_equal(index.date_range_slicing(20240101, 20240105)['transaction_id'], date_range_trans['transaction_id']), "Indexed date range differs"
+    # the streaming aggregators see the transactions in chunks and give the same answers
+    products, revenues, top_rows = ExactCounter(), ExactCounter(), TopRows(5)
+    for start in range(0, len(transactions), 3):
+        chunk = transactions[start:start + 3]
+        products.update(chunk['product_id'], chunk['quantity'])
+        revenues.update(chunk['product_id'], row_revenues(chunk))
+        top_rows.update(chunk, row_revenues(chunk))
+    assert products.most_frequent() == most_purchased, "Streamed most purchased product differs"
+    assert np.array_equal(revenues.top(5)[0], top_prod_revenue['product_id']), "Streamed top products by revenue differ"
+    assert np.array_equal(top_rows.top()['transaction_id'], top_prod_trans['transaction_id']), "Streamed top products differ"
@@ -0,0 +1,117 @@
+"""
+Query index over a snapshot of Transactions, built once and shared by many date window and per-user queries
+instead of a boolean mask over every row per query:
+- the rows in timestamp order, so a date window is a range found with searchsorted; the snapshot itself when
+  it is already in timestamp order, so a window is a slice;
+- prefix sums of the row revenues in that order, so the revenue of a window is a difference of two prefix sums;
+- a CSR grouping of the rows by user_id: the rows of user k are rows[indptr[k]:indptr[k + 1]], in row order,
+  with k the user_id minus the smallest one when the ids are dense, its position among the distinct ids otherwise.
+Results are those of the task2 functions: rows in their original order, revenues as float64.
+"""
+import numpy as np
+from transactions import Transactions, as_date
+
+
+# user ids are indexed directly when their range is at most this many times the number of rows
+DENSE_KEY_RANGE = 4
+
+
+def _stable_order(timestamps: np.ndarray) -> np.ndarray:
+    days = timestamps.astype(np.int64)
+    first = days.min()
+    if days.max() - first < 1 << 16:
+        # a stable argsort of 16-bit keys is a radix sort
+        return np.argsort((days - first).astype(np.uint16), kind='stable')
+    return np.argsort(days, kind='stable')
+
+
+class TransactionIndex:
+    def __init__(self, transactions: Transactions):
+        self.transactions = transactions
+        timestamps = transactions['timestamp']
+        self.time_sorted = bool(np.all(timestamps[1:] >= timestamps[:-1]))
+        self.time_order = None if self.time_sorted else _stable_order(timestamps)
+        self.sorted_timestamps = timestamps if self.time_sorted else timestamps[self.time_order]
+        # revenues are integers, int64 prefix sums are exact where float64 sums would round
+        revenues = np.multiply(transactions['quantity'], transactions['price'], dtype=np.int64)
+        self.revenue_prefix = np.concatenate([[0], np.cumsum(revenues if self.time_sorted else revenues[self.time_order])])
+
+        users = transactions['user_id']
+        self.user_rows = np.argsort(users, kind='stable')
+        sorted_users = users[self.user_rows]
+        if len(users) and int(sorted_users[-1]) - int(sorted_users[0]) < DENSE_KEY_RANGE * len(users):
+            self.user_offset = int(sorted_users[0])
+            self.user_keys = None
+            counts = np.bincount(sorted_users - self.user_offset)
+        else:
+            self.user_offset = 0
+            self.user_keys, counts = np.unique(sorted_users, return_counts=True)
+        self.user_indptr = np.concatenate([[0], np.cumsum(counts)])
+
+    def window(self, start_date, end_date) -> tuple:
+        """
+        Range of the rows from start_date to end_date (inclusive) in timestamp order
+        """
+        return (int(np.searchsorted(self.sorted_timestamps, as_date(start_date), side='left')),
+                int(np.searchsorted(self.sorted_timestamps, as_date(end_date), side='right')))
+
+    def window_rows(self, start_date, end_date):
+        """
+        Positions of the rows in the window in their original order (a slice for a time-sorted snapshot)
+        """
+        low, high = self.window(start_date, end_date)
+        if self.time_sorted:
+            return slice(low, high)
+        return np.sort(self.time_order[low:max(low, high)])
+
+    def date_range_slicing(self, start_date, end_date) -> Transactions:
+        return self.transactions[self.window_rows(start_date, end_date)]
+
+    def window_revenue(self, start_date, end_date) -> float:
+        low, high = self.window(start_date, end_date)
+        return np.float64(self.revenue_prefix[max(low, high)] - self.revenue_prefix[low])
+
+    def window_revenues(self, start_dates: np.ndarray, end_dates: np.ndarray) -> np.ndarray:
+        """
+        Revenue of many windows at once, start_dates and end_dates as datetime64[D] arrays
+        """
+        low = np.searchsorted(self.sorted_timestamps, start_dates, side='left')
+        high = np.maximum(low, np.searchsorted(self.sorted_timestamps, end_dates, side='right'))
+        return (self.revenue_prefix[high] - self.revenue_prefix[low]).astype(np.float64)
+
+    def revenue_comparison(self, start_date1, end_date1, start_date2, end_date2) -> dict:
+        return {"period1": self.window_revenue(start_date1, end_date1), "period2": self.window_revenue(start_date2, end_date2)}
+
+    def _user_range(self, user_id: int) -> tuple:
+        if self.user_keys is None:
+            key = int(user_id) - self.user_offset
+            if 0 <= key < len(self.user_indptr) - 1:
+                return self.user_indptr[key], self.user_indptr[key + 1]
+            return 0, 0
+        position = np.searchsorted(self.user_keys, user_id)
+        if position < len(self.user_keys) and self.user_keys[position] == user_id:
+            return self.user_indptr[position], self.user_indptr[position + 1]
+        return 0, 0
+
+    def user_row_positions(self, user_id: int) -> np.ndarray:
+        start, stop = self._user_range(user_id)
+        return self.user_rows[start:stop]
+
+    def user_transactions(self, user_id: int) -> Transactions:
+        return self.transactions[self.user_row_positions(user_id)]
+
+    def user_transaction_counts(self, user_ids: np.ndarray) -> np.ndarray:
+        """
+        Number of rows of every user of user_ids, 0 for unknown users
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        if self.user_keys is None:
+            keys = user_ids - self.user_offset
+            known = (keys >= 0) & (keys < len(self.user_indptr) - 1)
+            keys = np.where(known, keys, 0)
+        elif len(self.user_keys):
+            keys = np.minimum(np.searchsorted(self.user_keys, user_ids), len(self.user_keys) - 1)
+            known = self.user_keys[keys] == user_ids
+        else:
+            return np.zeros(len(user_ids), dtype=np.int64)
+        return np.where(known, self.user_indptr[keys + 1] - self.user_indptr[keys], 0)
@@ -0,0 +1,109 @@
+"""
+Columnar container of e-commerce transactions: one contiguous array per field with its own dtype (narrow
+integers, datetime64[D] timestamps) instead of one int64 matrix, so a field is read without a strided copy or
+a type conversion. Rows are selected like in a 2-D array (a mask, indices or a slice) and fields by name.
+"""
+import datetime
+import os
+import numpy as np
+
+
+FIELDS = {
+    'transaction_id': np.dtype(np.int64),
+    'user_id': np.dtype(np.int32),
+    'product_id': np.dtype(np.int32),
+    'quantity': np.dtype(np.int16),
+    'price': np.dtype(np.int32),
+    'timestamp': np.dtype('datetime64[D]'),
+}
+
+
+def as_date(value) -> np.datetime64:
+    """
+    A day as datetime64[D], from an integer YYYYMMDD (e.g. 20240101), an ISO string, a date or a datetime64
+    """
+    if isinstance(value, (int, np.integer)):
+        return np.datetime64(f"{value // 10000:04d}-{value // 100 % 100:02d}-{value % 100:02d}", 'D')
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return np.datetime64(value, 'D')
+
+
+class Transactions:
+    def __init__(self, columns: dict):
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Fields have different lengths: { {name: len(values) for name, values in columns.items()} }")
+        self.columns = columns
+
+    @classmethod
+    def from_fields(cls, **fields) -> 'Transactions':
+        """
+        Transactions from one array per field, converted once to the dtypes of FIELDS
+        """
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)}, expected {list(FIELDS)}")
+        return cls({name: np.ascontiguousarray(fields[name], dtype=dtype) for name, dtype in FIELDS.items() if name in fields})
+
+    @classmethod
+    def empty(cls, n_rows: int) -> 'Transactions':
+        return cls({name: np.empty(n_rows, dtype=dtype) for name, dtype in FIELDS.items()})
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str = 'r') -> 'Transactions':
+        """
+        Transactions saved in a directory with one .npy file per field, memory-mapped by default
+        """
+        return cls({name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+                    for name in FIELDS if os.path.exists(os.path.join(path, f"{name}.npy"))})
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        for name, values in self.columns.items():
+            np.save(os.path.join(path, f"{name}.npy"), values)
+
+    @property
+    def fields(self) -> list:
+        return list(self.columns)
+
+    @property
+    def shape(self) -> tuple:
+        return len(self), len(self.columns)
+
+    @property
+    def dtypes(self) -> dict:
+        return {name: values.dtype for name, values in self.columns.items()}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in self.columns.values())
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, key):
+        """
+        transactions['price'] is a field, transactions[rows] the rows (mask, indices or slice) of every field
+        """
+        if isinstance(key, str):
+            return self.columns[key]
+        return Transactions({name: values[key] for name, values in self.columns.items()})
+
+    def select(self, fields: list) -> 'Transactions':
+        return Transactions({name: self.columns[name] for name in fields})
+
+    def to_records(self) -> np.ndarray:
+        """
+        The rows as a structured array (a copy), for printing and for code that needs one array
+        """
+        records = np.empty(len(self), dtype=list(self.dtypes.items()))
+        for name, values in self.columns.items():
+            records[name] = values
+        return records
+
+    def __str__(self) -> str:
+        return str(self.to_records())
+
+    def __repr__(self) -> str:
+        return f"Transactions({len(self)} rows, {', '.join(f'{name}: {dtype}' for name, dtype in self.dtypes.items())})"
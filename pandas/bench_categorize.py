@@ -0,0 +1,52 @@
+"""
+Benchmark of the vectorized categorizer against Series.apply of the row-wise functions of task1 and task3
+on synthetic columns with every boundary value. Both results are checked to be identical.
+
+Usage: python pandas/bench_categorize.py [n_rows]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+from categorizer import apply_rules, categorize
+from task1 import CATEGORY_RULES, categorize_minimum_nights, categorize_price
+from task3 import AVAILABILITY_EDGES, AVAILABILITY_LABELS, set_availiability_status
+
+
+N_ROWS = 10_000_000
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        'price': rng.integers(-10, 1_000, n_rows).astype(np.int32),
+        'minimum_nights': rng.integers(1, 40, n_rows).astype(np.int16),
+        'availability_365': rng.integers(0, 366, n_rows).astype(np.int16),
+    })
+    cases = [
+        ('price_category', 'price', categorize_price,
+         lambda: apply_rules(df, {'price_category': CATEGORY_RULES['price_category']})['price_category']),
+        ('length_of_stay_category', 'minimum_nights', categorize_minimum_nights,
+         lambda: apply_rules(df, {'length_of_stay_category': CATEGORY_RULES['length_of_stay_category']})['length_of_stay_category']),
+        ('availability_status', 'availability_365', set_availiability_status,
+         lambda: pd.Series(categorize(df['availability_365'], AVAILABILITY_EDGES, AVAILABILITY_LABELS, closed='left'))),
+    ]
+    print(f"{n_rows:,} rows")
+    for name, column, function, vectorized in cases:
+        start = time.perf_counter()
+        expected = df[column].apply(function)
+        apply_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        result = vectorized()
+        vectorized_seconds = time.perf_counter() - start
+        print(f"{name}: apply {apply_seconds:.2f}s, vectorized {vectorized_seconds:.3f}s, x{apply_seconds / vectorized_seconds:.0f}")
+        assert (result.astype(str).to_numpy() == expected.to_numpy()).all(), f"{name} differs from {function.__name__}"
+
+    # all rules of task1 at once, on the boundaries and on missing values
+    boundaries = pd.DataFrame({'price': [np.nan, 0, 99, 99.5, 100, 299, 300, 10_000],
+                               'minimum_nights': [np.nan, 1, 3, 4, 14, 15, 30, 1_250]})
+    categorized = apply_rules(boundaries.copy(), CATEGORY_RULES)
+    assert categorized['price_category'].tolist() == boundaries['price'].apply(categorize_price).tolist(), 'Price boundaries differ'
+    assert categorized['length_of_stay_category'].tolist() == boundaries['minimum_nights'].apply(categorize_minimum_nights).tolist(), \
+        'Minimum nights boundaries differ'
@@ -0,0 +1,68 @@
+"""
+Benchmark of the fused cleaning kernel (cleaning.py) against the step-by-step pandas cleaning task1 did before
+(isna().sum() twice, fillna, two categorizations, value_counts twice and two boolean filters), on the raw dataset
+repeated to n_rows rows, with one and with all worker threads. All results are checked to be identical.
+
+Usage: python pandas/bench_cleaning.py [n_rows]
+"""
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from airbnb_schema import read_listings
+from categorizer import apply_rules
+from cleaning import WORKERS, clean
+from task1 import CATEGORY_RULES, DATASET_PATH, FILL_VALUES
+
+
+N_ROWS = 5_000_000
+
+
+def stepwise(df):
+    nulls_before = df.isna().sum(axis=0)
+    df = df.fillna(FILL_VALUES)
+    apply_rules(df, CATEGORY_RULES)
+    nulls_after = df.isna().sum(axis=0)
+    category_counts = {column: df[column].value_counts() for column in CATEGORY_RULES}
+    dropped = df[df['price'] <= 0]
+    return df[df['price'] > 0], dropped, nulls_before, nulls_after, category_counts
+
+
+def fused(df, workers):
+    cleaned = clean(df, FILL_VALUES, CATEGORY_RULES, [('price', '>', 0)], workers=workers)
+    return cleaned.kept(), cleaned.dropped(), cleaned.nulls_before, cleaned.nulls_after, cleaned.category_counts
+
+
+def measured(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = function()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS
+    raw_df = read_listings(DATASET_PATH, parse_dates=False, cache=False)
+    df = raw_df.iloc[np.arange(n_rows) % len(raw_df)].reset_index(drop=True)
+    print(f"{n_rows:,} rows, {WORKERS} worker threads")
+
+    expected, seconds, peak = measured(lambda: stepwise(df))
+    print(f"step by step: {seconds:.2f}s, allocated {peak:.0f} MiB")
+    for workers in sorted({1, WORKERS}):
+        result, seconds, peak = measured(lambda: fused(df, workers))
+        print(f"fused, {workers} thread(s): {seconds:.2f}s, allocated {peak:.0f} MiB")
+        pd.testing.assert_frame_equal(result[0], expected[0], check_exact=True)
+        pd.testing.assert_frame_equal(result[1], expected[1], check_exact=True)
+        pd.testing.assert_series_equal(result[2], expected[2])
+        pd.testing.assert_series_equal(result[3], expected[3])
+        for column in CATEGORY_RULES:
+            pd.testing.assert_series_equal(result[4][column], expected[4][column])
@@ -0,0 +1,66 @@
+"""
+Cold and warm load times of the csv parse cache (common/csv_cache.py) against parsing with pd.read_csv, on the
+cleaned dataset repeated to n_rows rows: all columns and the columns of task2, with the c and the multithreaded
+pyarrow engine, after a touch of the source (same bytes, hashed) and after a change (parsed again). Every cached
+frame is checked to be identical to the parsed one.
+
+Usage: python pandas/bench_csv_cache.py [n_rows]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from airbnb_schema import read_kwargs, read_listings
+from csv_cache import cache_path
+
+
+N_ROWS = 1_000_000
+CLEANED_DATASET_PATH = 'pandas/cleaned_airbnb_data.csv'
+TASK2_COLUMNS = ['name', 'neighbourhood_group', 'neighbourhood', 'price', 'minimum_nights', 'number_of_reviews',
+                 'availability_365', 'price_category']
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS
+    cleaned_df = read_listings(CLEANED_DATASET_PATH, cleaned=True, parse_dates=False, cache=False)
+    df = cleaned_df.iloc[np.arange(n_rows) % len(cleaned_df)].reset_index(drop=True)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'cleaned.csv')
+        df.to_csv(path, index=False)
+        print(f"{n_rows:,} rows, csv {os.path.getsize(path) / 2**20:.1f} MiB")
+
+        for engine in ['c', 'pyarrow']:
+            parsed, parse_seconds = timed(lambda: read_listings(path, cleaned=True, cache=False, engine=engine))
+            subset, subset_seconds = timed(lambda: read_listings(path, usecols=TASK2_COLUMNS, cleaned=True, cache=False, engine=engine))
+            cold, cold_seconds = timed(lambda: read_listings(path, cleaned=True, engine=engine))
+            warm, warm_seconds = timed(lambda: read_listings(path, cleaned=True, engine=engine))
+            warm_subset, warm_subset_seconds = timed(lambda: read_listings(path, usecols=TASK2_COLUMNS, cleaned=True, engine=engine))
+            sidecar_mib = os.path.getsize(cache_path(path, read_kwargs(None, True), engine)) / 2**20
+            print(f"engine={engine}: parse {parse_seconds:.2f}s (task2 columns {subset_seconds:.2f}s), "
+                  f"cold {cold_seconds:.2f}s, warm {warm_seconds:.2f}s (task2 columns {warm_subset_seconds:.2f}s), "
+                  f"sidecar {sidecar_mib:.0f} MiB")
+            for cached in [cold, warm]:
+                pd.testing.assert_frame_equal(cached, parsed, check_exact=True)
+            pd.testing.assert_frame_equal(warm_subset, subset, check_exact=True)
+            assert warm_seconds < parse_seconds, 'Warm load is not faster than parsing'
+
+        # same bytes, new modification time: the source is hashed and the sidecar still used
+        os.utime(path)
+        touched, touched_seconds = timed(lambda: read_listings(path, cleaned=True))
+        pd.testing.assert_frame_equal(touched, parsed, check_exact=True)
+        # a changed source is parsed again
+        df.iloc[:1].to_csv(path, mode='a', header=False, index=False)
+        changed, changed_seconds = timed(lambda: read_listings(path, cleaned=True))
+        pd.testing.assert_frame_equal(changed, read_listings(path, cleaned=True, cache=False), check_exact=True)
+        assert len(changed) == n_rows + 1
+        print(f"touched source (hashed) {touched_seconds:.2f}s, changed source (parsed again) {changed_seconds:.2f}s")
@@ -0,0 +1,76 @@
+"""
+Memory and time of the compact long format against pd.melt for the melt of task3 (free-text names as id,
+price and minimum_nights as values) on a synthetic listing table. The long rows are checked to be identical.
+
+Usage: python pandas/bench_long_format.py [n_rows]
+"""
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from long_format import melt
+
+
+N_ROWS = 2_000_000
+CHUNK_ROWS = 1 << 18
+
+
+def measured(function):
+    """
+    (result, seconds, peak traced MiB) of function()
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = function()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def deep_mib(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def stream_sums(long_format) -> pd.Series:
+    # a streaming consumer: sum of the values per metric, one chunk in memory at a time
+    sums = None
+    for chunk in long_format.chunks(CHUNK_ROWS):
+        # int32 group sums of a chunk wrap around, they are accumulated as int64
+        chunk_sums = chunk['value'].astype(np.int64).groupby(chunk['metric'], observed=True).sum()
+        sums = chunk_sums if sums is None else sums.add(chunk_sums, fill_value=0)
+    return sums
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS
+    rng = np.random.default_rng(42)
+    words = np.array(['Cozy', 'Sunny', 'Spacious', 'Room', 'Loft', 'Studio', 'near', 'Park', 'Subway', 'Brooklyn', 'Manhattan'])
+    df = pd.DataFrame({
+        'name': [' '.join(parts) + f" {i}" for i, parts in enumerate(words[rng.integers(0, len(words), (n_rows, 4))])],
+        'price': rng.integers(10, 10_000, n_rows).astype(np.int32),
+        'minimum_nights': rng.integers(1, 365, n_rows).astype(np.int16),
+    })
+    arguments = dict(id_vars=['name'], value_vars=['price', 'minimum_nights'], var_name='metric', value_name='value')
+    print(f"{n_rows:,} wide rows, wide frame {deep_mib(df):.0f} MiB")
+
+    expected, melt_seconds, melt_peak = measured(lambda: pd.melt(df, **arguments))
+    print(f"pd.melt: {melt_seconds:.2f}s, allocated {melt_peak:.0f} MiB, frame {deep_mib(expected):.0f} MiB")
+    long_format, view_seconds, view_peak = measured(lambda: melt(df, **arguments))
+    print(f"LongFormat view: {view_seconds * 1000:.2f}ms, allocated {view_peak:.2f} MiB")
+    categories, category_seconds, category_peak = measured(lambda: long_format.to_frame('category'))
+    print(f"to_frame(ids='category'): {category_seconds:.2f}s, allocated {category_peak:.0f} MiB, frame {deep_mib(categories):.0f} MiB")
+    references, reference_seconds, reference_peak = measured(lambda: long_format.to_frame('reference'))
+    print(f"to_frame(ids='reference'): {reference_seconds:.2f}s, allocated {reference_peak:.0f} MiB, frame {deep_mib(references):.0f} MiB")
+    sums, stream_seconds, stream_peak = measured(lambda: stream_sums(long_format))
+    print(f"chunks({CHUNK_ROWS}) consumer: {stream_seconds:.2f}s, allocated {stream_peak:.0f} MiB")
+
+    assert (categories['name'].astype(object).to_numpy() == expected['name'].to_numpy()).all(), 'ids differ from pd.melt'
+    assert (categories['metric'].astype(object).to_numpy() == expected['metric'].to_numpy()).all(), 'metrics differ from pd.melt'
+    assert (categories['value'].to_numpy() == expected['value'].to_numpy()).all(), 'values differ from pd.melt'
+    assert (df['name'].to_numpy()[references['row']] == expected['name'].to_numpy()).all(), 'row references differ from pd.melt'
+    assert sums.to_dict() == expected.groupby('metric')['value'].sum().to_dict(), 'streamed sums differ from pd.melt'
+    assert deep_mib(categories) < deep_mib(expected) and deep_mib(references) < deep_mib(expected)
@@ -0,0 +1,72 @@
+"""
+Benchmark of the partitioned Parquet store against reading the cleaned csv and filtering it, for the filters
+of task2 and a one-borough query, on the cleaned dataset repeated to n_rows rows. Both results are checked
+to be identical.
+
+Usage: python pandas/bench_partitioned.py [n_rows]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from airbnb_schema import read_listings
+from partitioned_store import read_partitioned, write_partitioned
+
+
+N_ROWS = 1_000_000
+CLEANED_DATASET_PATH = 'pandas/cleaned_airbnb_data.csv'
+TASK2_COLUMNS = ['neighbourhood_group', 'price', 'minimum_nights', 'number_of_reviews', 'price_category', 'availability_365']
+QUERIES = [
+    ('neighbourhood in (Kensington, Harlem)', ['name', 'neighbourhood_group', 'neighbourhood', 'price'],
+     [('neighbourhood', 'in', ['Kensington', 'Harlem'])]),
+    ('price > 100 and number_of_reviews > 10', TASK2_COLUMNS,
+     [('price', '>', 100), ('number_of_reviews', '>', 10)]),
+    ('one borough (Bronx)', TASK2_COLUMNS,
+     [('neighbourhood_group', '==', 'Bronx')]),
+]
+
+
+def csv_query(path, columns, filters):
+    # what the scripts do today: read the needed columns and filter in memory
+    # a full parse every time, not the Arrow sidecar of csv_cache.py
+    df = read_listings(path, usecols=list(dict.fromkeys(columns + [column for column, _, _ in filters])), cleaned=True, cache=False)
+    mask = np.ones(len(df), dtype=bool)
+    for column, operator, value in filters:
+        if operator == 'in':
+            mask &= df[column].isin(value).to_numpy()
+        elif operator == '==':
+            mask &= (df[column] == value).to_numpy()
+        else:
+            mask &= (df[column] > value).to_numpy()
+    return df.loc[mask, columns]
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else N_ROWS
+    cleaned_df = read_listings(CLEANED_DATASET_PATH, cleaned=True, parse_dates=False, cache=False)
+    df = cleaned_df.iloc[np.arange(n_rows) % len(cleaned_df)].reset_index(drop=True)
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'cleaned.csv')
+        store_path = os.path.join(directory, 'cleaned')
+        df.to_csv(csv_path, index=False)
+        write_partitioned(df, store_path)
+        print(f"{n_rows:,} rows, csv {os.path.getsize(csv_path) / 2**20:.1f} MiB")
+        # a neighbourhood of this dataset, its rows are in a few row groups of its borough's file
+        neighbourhood = df['neighbourhood'].value_counts().index[0]
+        queries = QUERIES + [(f"neighbourhood == {neighbourhood}", TASK2_COLUMNS, [('neighbourhood', '==', neighbourhood)])]
+        for name, columns, filters in queries:
+            start = time.perf_counter()
+            expected = csv_query(csv_path, columns, filters)
+            csv_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            result = read_partitioned(store_path, columns, filters)
+            store_seconds = time.perf_counter() - start
+            scan = result.attrs['scan']
+            print(f"{name}: csv {csv_seconds:.2f}s, store {store_seconds:.3f}s, x{csv_seconds / store_seconds:.0f}; "
+                  f"{len(result):,} rows, {scan['files_pruned']} files and {scan['row_groups_pruned']} row groups pruned, "
+                  f"{scan['bytes_read'] / scan['bytes_total']:.1%} of the stored bytes read")
+            pd.testing.assert_frame_equal(result, expected, check_categorical=False)
@@ -0,0 +1,119 @@
+"""
+Fused cleaning kernel for task1: null counting, filling, categorization and row filtering in one pass per chunk
+of every column, instead of a full-frame pass (and copy) per step. Every column is cut into chunks of chunk_rows
+rows and the chunks run on a thread pool, which overlaps on the numeric columns, where NumPy releases the GIL.
+Chunks write into output arrays allocated once per column, columns that are not filled are passed through
+without a copy, and the null counts after filling and the category counts come out of the same pass.
+The results are the ones of the pandas steps they replace (isna().sum(), fillna, categorize, value_counts, filter).
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+from categorizer import category_codes
+
+
+CHUNK_ROWS = 1 << 16
+WORKERS = os.cpu_count() or 1
+COMPARISONS = {'==': np.equal, '!=': np.not_equal, '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal}
+
+
+class CleanedListings:
+    """
+    Output of clean: the filled and categorized frame, the mask of the rows kept by the filters, the null counts
+    before and after filling and the value counts of every new category column
+    """
+    def __init__(self, frame: pd.DataFrame, keep: np.ndarray, nulls_before: pd.Series, nulls_after: pd.Series,
+                 category_counts: dict):
+        self.frame = frame
+        self.keep = keep
+        self.nulls_before = nulls_before
+        self.nulls_after = nulls_after
+        self.category_counts = category_counts
+
+    def kept(self) -> pd.DataFrame:
+        return self.frame.take(np.flatnonzero(self.keep))
+
+    def dropped(self) -> pd.DataFrame:
+        return self.frame.take(np.flatnonzero(~self.keep))
+
+
+def _null_mask(values: np.ndarray) -> np.ndarray:
+    if values.dtype.kind == 'f':
+        return np.isnan(values)
+    if values.dtype.kind == 'O':
+        return pd.isna(values)
+    return None
+
+
+def clean(df: pd.DataFrame, fill_values: dict, rules: dict, filters: list, chunk_rows: int = CHUNK_ROWS,
+          workers: int = WORKERS) -> CleanedListings:
+    """
+    Fill the missing values of the columns of fill_values, add one ordered categorical column per rule (see
+    categorizer.apply_rules) and keep the rows that satisfy all filters, a list of (column, operator, value) with
+    the operators ==, !=, <, <=, >, >=. df is not modified, the frame shares the columns that are not filled with it
+    """
+    for column, operator, _ in filters:
+        if operator not in COMPARISONS:
+            raise ValueError(f"Unknown operator {operator}, expected one of {tuple(COMPARISONS)}")
+    used = list(fill_values) + [rule['column'] for rule in rules.values()] + [column for column, _, _ in filters]
+    for column in used:
+        if not isinstance(df[column].dtype, np.dtype):
+            raise ValueError(f"Column {column} has the extension dtype {df[column].dtype}, only NumPy columns are supported")
+    n_rows = len(df)
+    columns = {column: df[column] for column in df.columns}
+    sources = {column: df[column].to_numpy() for column in df.columns if isinstance(df[column].dtype, np.dtype)}
+    filled = {column: np.empty(n_rows, dtype=np.result_type(sources[column].dtype, np.asarray(value).dtype)
+                               if sources[column].dtype.kind != 'O' else object)
+              for column, value in fill_values.items()}
+    codes = {new_column: np.empty(n_rows, dtype=np.int8 if len(rule['edges']) < 127 else np.int32)
+             for new_column, rule in rules.items()}
+    matches = [np.empty(n_rows, dtype=bool) for _ in filters]
+    starts = range(0, n_rows, chunk_rows)
+
+    def column_chunk(column: str, start: int) -> int:
+        # every task writes its own rows of its own output arrays
+        stop = min(start + chunk_rows, n_rows)
+        if column not in sources:
+            # extension dtypes (categories read from the csv): counted by pandas
+            return int(columns[column].iloc[start:stop].isna().sum())
+        values = sources[column][start:stop]
+        missing = _null_mask(values)
+        if column in filled:
+            output = filled[column][start:stop]
+            output[:] = values
+            if missing is not None:
+                output[missing] = fill_values[column]
+        for new_column, rule in rules.items():
+            if rule['column'] == column:
+                codes[new_column][start:stop] = category_codes(values, rule['edges'], rule.get('closed', 'left'))
+        for position, (filter_column, operator, value) in enumerate(filters):
+            if filter_column == column:
+                matches[position][start:stop] = COMPARISONS[operator](values, value)
+        return 0 if missing is None else int(missing.sum())
+
+    tasks = [(column, start) for column in df.columns for start in starts]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        counts = list(executor.map(lambda task: column_chunk(*task), tasks))
+    nulls_before = pd.Series(0, index=df.columns, dtype=np.int64)
+    for (column, _), count in zip(tasks, counts):
+        nulls_before[column] += count
+
+    frame_columns = {column: filled[column] if column in filled else columns[column] for column in df.columns}
+    category_counts = {}
+    for new_column, rule in rules.items():
+        dtype = pd.CategoricalDtype(rule['labels'], ordered=True)
+        frame_columns[new_column] = pd.Categorical.from_codes(codes[new_column], dtype=dtype, validate=False)
+        # Series.value_counts of a categorical: counts in category order, sorted by count
+        counted = pd.Series(np.bincount(codes[new_column], minlength=len(rule['labels'])),
+                            index=pd.CategoricalIndex(rule['labels'], dtype=dtype, name=new_column), name='count')
+        category_counts[new_column] = counted.sort_values(ascending=False)
+    frame = pd.DataFrame(frame_columns, index=df.index, copy=False)
+
+    missing_fills = [column for column, value in fill_values.items() if pd.isna(value)]
+    nulls_after = nulls_before.copy()
+    nulls_after[[column for column in fill_values if column not in missing_fills]] = 0
+    nulls_after = pd.concat([nulls_after, pd.Series(0, index=list(rules), dtype=np.int64)])
+    keep = np.logical_and.reduce(matches) if filters else np.ones(n_rows, dtype=bool)
+    return CleanedListings(frame, keep, nulls_before, nulls_after, category_counts)
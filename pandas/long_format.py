@@ -0,0 +1,101 @@
+"""
+Compact long (melted) format of a wide frame. pd.melt repeats every id column once per value column as object
+values and stores the variable column as strings, more than doubling the memory of the source frame.
+LongFormat keeps a reference to the wide frame instead: row r of the long view is row r % n of the value
+column r // n, so nothing is copied until rows are asked for. Rows are produced in chunks for consumers that
+stream, or materialized compactly with the ids as categories (or as row numbers into the wide frame) and the
+variable as a category. The long rows are in the order of pd.melt.
+"""
+import numpy as np
+import pandas as pd
+
+
+class LongFormat:
+    def __init__(self, df: pd.DataFrame, id_vars: list, value_vars: list, var_name: str = 'variable', value_name: str = 'value'):
+        self.df = df
+        self.id_vars = list(id_vars)
+        self.value_vars = list(value_vars)
+        self.var_name = var_name
+        self.value_name = value_name
+        self.n_wide = len(df)
+        self._id_codes = {}
+
+    def __len__(self) -> int:
+        return self.n_wide * len(self.value_vars)
+
+    @property
+    def shape(self) -> tuple:
+        return len(self), len(self.id_vars) + 2
+
+    def _codes(self, column: str) -> tuple:
+        # (codes, categories) of an id column, computed once
+        if column not in self._id_codes:
+            values = self.df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                self._id_codes[column] = values.cat.codes.to_numpy(), values.cat.categories
+            else:
+                self._id_codes[column] = pd.factorize(values)
+        return self._id_codes[column]
+
+    def _variables(self, variable_codes: np.ndarray) -> pd.Categorical:
+        return pd.Categorical.from_codes(variable_codes, categories=self.value_vars)
+
+    def _values(self, rows: np.ndarray, variable_codes: np.ndarray):
+        columns = [self.df[column] for column in self.value_vars]
+        if not all(isinstance(column.dtype, np.dtype) for column in columns):
+            # extension dtypes: let pandas find the common type
+            return pd.concat([column.iloc[rows[variable_codes == code]] for code, column in enumerate(columns)]).array
+        values = np.empty(len(rows), dtype=np.result_type(*[column.dtype for column in columns]))
+        for code, column in enumerate(columns):
+            selected = variable_codes == code
+            values[selected] = column.to_numpy()[rows[selected]]
+        return values
+
+    def take(self, positions: np.ndarray) -> pd.DataFrame:
+        """
+        Rows of the long view at positions (increasing), with the ids as values of the wide frame
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        variable_codes, rows = np.divmod(positions, self.n_wide) if self.n_wide else (positions, positions)
+        columns = {column: self.df[column].array.take(rows) for column in self.id_vars}
+        columns[self.var_name] = self._variables(variable_codes)
+        columns[self.value_name] = self._values(rows, variable_codes)
+        return pd.DataFrame(columns, index=positions)
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        return self.take(np.arange(min(n, len(self))))
+
+    def chunks(self, chunk_rows: int):
+        """
+        The long view in frames of chunk_rows rows, only one chunk is materialized at a time
+        """
+        for start in range(0, len(self), chunk_rows):
+            yield self.take(np.arange(start, min(start + chunk_rows, len(self))))
+
+    def to_frame(self, ids: str = 'category') -> pd.DataFrame:
+        """
+        The whole long view with the ids as categories (ids='category') or as the row numbers of the wide
+        frame in a column named row (ids='reference'), and the variable as a category
+        """
+        k = len(self.value_vars)
+        variable_codes = np.repeat(np.arange(k, dtype=np.int8), self.n_wide)
+        rows = np.tile(np.arange(self.n_wide, dtype=np.int32 if self.n_wide < 2**31 else np.int64), k)
+        if ids == 'category':
+            columns = {}
+            for column in self.id_vars:
+                codes, categories = self._codes(column)
+                columns[column] = pd.Categorical.from_codes(np.tile(codes, k), categories=categories)
+        elif ids == 'reference':
+            columns = {'row': rows}
+        else:
+            raise ValueError(f"ids must be 'category' or 'reference', got {ids}")
+        columns[self.var_name] = self._variables(variable_codes)
+        columns[self.value_name] = self._values(rows, variable_codes)
+        return pd.DataFrame(columns)
+
+
+def melt(df: pd.DataFrame, id_vars: list, value_vars: list, var_name: str = 'variable', value_name: str = 'value') -> LongFormat:
+    """
+    Lazy equivalent of pd.melt(df, id_vars, value_vars, var_name, value_name)
+    """
+    return LongFormat(df, id_vars, value_vars, var_name, value_name)
@@ -0,0 +1,225 @@
+"""
+Memoized, instrumented runner for the steps of the pandas analyses. Every step is a named function of the outputs
+of other steps (or of source files) and of its parameters; its output is pickled to a cache directory under a key
+that hashes its code, the code it calls (see code_dependencies), its parameters and the keys of its inputs, with
+source files keyed by path, size and modification time. A changed source, parameter, step or helper module
+therefore only recomputes the steps downstream of it, and a cached step does not even load its inputs. Wall
+time, peak traced memory and output size of every step are recorded in report().
+Steps must not modify their inputs in place: outputs are shared between the steps of a run.
+"""
+import ast
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import pickle
+import sys
+import sysconfig
+import time
+import tracemalloc
+import types
+import pandas as pd
+
+
+# installed packages and the standard library change with their versions, only the other modules are hashed
+LIBRARY_PATHS = tuple(sorted({os.path.realpath(sysconfig.get_paths()[name]) for name in ('stdlib', 'platstdlib', 'purelib', 'platlib')}))
+CONSTANT_TYPES = (bool, int, float, str, bytes, tuple, list, dict, set, frozenset, type(None))
+
+
+def _local_module(value) -> types.ModuleType:
+    module = value if isinstance(value, types.ModuleType) else inspect.getmodule(value)
+    path = getattr(module, '__file__', None)
+    if path is None or os.path.realpath(path).startswith(LIBRARY_PATHS):
+        return None
+    return module
+
+
+def _local_path(name: str) -> str:
+    """
+    File of a local module by name, without importing it
+    """
+    module = sys.modules.get(name)
+    path = getattr(module, '__file__', None)
+    if module is None:
+        try:
+            spec = importlib.util.find_spec(name.split('.')[0])
+        except (ImportError, ValueError):
+            return None
+        if spec is None or not spec.origin or os.path.realpath(spec.origin).startswith(LIBRARY_PATHS) or '.' in name:
+            return None
+        path = spec.origin
+    if path is None or not path.endswith('.py') or os.path.realpath(path).startswith(LIBRARY_PATHS):
+        return None
+    return path
+
+
+def _source(value) -> str:
+    try:
+        return inspect.getsource(value)
+    except (OSError, TypeError):
+        return value.__code__.co_code.hex() if hasattr(value, '__code__') else repr(value)
+
+
+def _global_names(code: types.CodeType) -> set:
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            names |= _global_names(constant)
+    return names
+
+
+def code_dependencies(function) -> dict:
+    """
+    Digests of the code the output of function depends on: its source, the source of the functions and classes
+    of its own module that it uses (recursively), the values of the constants it uses and the files of the other
+    local modules it uses, with the local modules imported by those
+    """
+    dependencies, modules, functions = {}, [], [function]
+    seen = {id(function)}
+    while functions:
+        current = functions.pop()
+        prefix = f"{current.__module__}.{current.__qualname__}"
+        dependencies[prefix] = _source(current)
+        used = {name: current.__globals__[name] for name in _global_names(current.__code__) if name in current.__globals__}
+        used.update(zip(current.__code__.co_freevars, [cell.cell_contents for cell in current.__closure__ or ()]))
+        for name, value in sorted(used.items()):
+            if isinstance(value, CONSTANT_TYPES):
+                dependencies[f"{prefix}:{name}"] = repr(value)
+                continue
+            if not isinstance(value, (types.FunctionType, type, types.ModuleType)) or id(value) in seen:
+                continue
+            seen.add(id(value))
+            module = _local_module(value)
+            if module is None:
+                continue
+            if isinstance(value, types.ModuleType) or module.__name__ != current.__module__:
+                modules.append(module)
+            elif isinstance(value, types.FunctionType):
+                functions.append(value)
+            else:
+                dependencies[f"{module.__name__}.{value.__qualname__}"] = _source(value)
+    # imported modules are read from the import statements, which also finds the imports inside functions
+    pending, hashed = [module.__name__ for module in modules], set()
+    while pending:
+        name = pending.pop()
+        if name in hashed:
+            continue
+        hashed.add(name)
+        path = _local_path(name)
+        if path is None:
+            continue
+        with open(path) as file:
+            dependencies[name] = file.read()
+        for node in ast.walk(ast.parse(dependencies[name])):
+            if isinstance(node, ast.Import):
+                pending += [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                pending.append(node.module)
+    return {name: hashlib.sha256(code.encode()).hexdigest()[:16] for name, code in sorted(dependencies.items())}
+
+
+class StepRunner:
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.sources = {}
+        self.steps = {}
+        self.records = []
+        self._keys = {}
+        self._outputs = {}
+
+    def source(self, name: str, path: str):
+        """
+        Register a source file, passed to the steps that use it by path
+        """
+        self.sources[name] = path
+
+    def step(self, name: str = None, inputs: list = (), params: dict = None):
+        """
+        Decorator registering a step: the function gets the outputs of inputs as positional arguments and
+        params as keyword arguments
+        """
+        def register(function):
+            self.steps[name or function.__name__] = (function, list(inputs), dict(params or {}))
+            return function
+        return register
+
+    def key(self, name: str) -> str:
+        if name in self._keys:
+            return self._keys[name]
+        if name in self.sources:
+            path = self.sources[name]
+            stat = os.stat(path)
+            identity = ['source', os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+        elif name in self.steps:
+            function, inputs, params = self.steps[name]
+            identity = ['step', name, code_dependencies(function), json.dumps(params, sort_keys=True, default=str),
+                        [self.key(item) for item in inputs]]
+        else:
+            raise KeyError(f"Unknown step or source {name}")
+        self._keys[name] = hashlib.sha256(json.dumps(identity).encode()).hexdigest()[:16]
+        return self._keys[name]
+
+    def _cache_path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}-{self.key(name)}.pkl")
+
+    def _record(self, name: str, status: str, seconds: float, peak_bytes: int = 0):
+        path = self._cache_path(name)
+        self.records.append({
+            'step': name,
+            'status': status,
+            'seconds': seconds,
+            'peak_mib': peak_bytes / 2**20,
+            'output_mib': os.path.getsize(path) / 2**20 if os.path.exists(path) else 0.0,
+        })
+
+    def get(self, name: str):
+        """
+        Output of a step (or the path of a source), from this run, from the cache or computed
+        """
+        if name in self._outputs:
+            return self._outputs[name]
+        if name in self.sources:
+            return self.sources[name]
+        path = self._cache_path(name)
+        start = time.perf_counter()
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                output = pickle.load(file)
+            self._record(name, 'cached', time.perf_counter() - start)
+        else:
+            function, inputs, params = self.steps[name]
+            # inputs are resolved first, so the timing and memory belong to this step only
+            arguments = [self.get(item) for item in inputs]
+            start = time.perf_counter()
+            tracemalloc.start()
+            try:
+                output = function(*arguments, **params)
+                _, peak_bytes = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            seconds = time.perf_counter() - start
+            self._save(name, output)
+            self._record(name, 'computed', seconds, peak_bytes)
+        self._outputs[name] = output
+        return output
+
+    def _save(self, name: str, output):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(name)
+        with open(f"{path}.tmp", 'wb') as file:
+            pickle.dump(output, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+        # outputs of earlier versions of the step are never read again
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.startswith(f"{name}-") and file_name.endswith('.pkl') and file_name != os.path.basename(path):
+                os.remove(os.path.join(self.cache_dir, file_name))
+
+    def run(self, targets: list = None) -> dict:
+        """
+        Outputs of targets (all steps by default), computing only the steps that are not cached
+        """
+        return {name: self.get(name) for name in (targets or self.steps)}
+
+    def report(self) -> pd.DataFrame:
+        return pd.DataFrame(self.records, columns=['step', 'status', 'seconds', 'peak_mib', 'output_mib']).set_index('step')
@@ -1,8 +1,27 @@
+import os
+import sys
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from airbnb_schema import read_listings
+from cleaning import clean
+from partitioned_store import write_partitioned
+from step_runner import StepRunner
+
 
 DATASET_PATH = "pandas/AB_NYC_2019.csv"
 CLEANED_DATASET_PATH = 'pandas/cleaned_airbnb_data.csv'
+# the same rows partitioned by neighbourhood_group, for queries on a few boroughs or columns
+CLEANED_STORE_PATH = 'pandas/cleaned_airbnb_data'
+# vectorized equivalents of categorize_price and categorize_minimum_nights (minimum_nights is an integer column)
+CATEGORY_RULES = {
+    'price_category': {'column': 'price', 'edges': [100, 300], 'labels': ['Low', 'Medium', 'High'], 'closed': 'left'},
+    'length_of_stay_category': {'column': 'minimum_nights', 'edges': [3, 14], 'labels': ['short-term', 'medium-term', 'long-term'], 'closed': 'right'},
+}
+FILL_VALUES = {'name': 'Unknown', 'host_name': 'Unknown', 'last_review': 'NaT'}
+KEEP_FILTERS = [('price', '>', 0)]
+# outputs of the steps of build_steps(), shared with task3, see step_runner.py
+STEP_CACHE_DIR = 'pandas/.step_cache'
 
 
 def categorize_price(price):
@@ -21,6 +40,26 @@ def categorize_minimum_nights(n_days):
     else:
         return 'long-term'
     
+def build_steps(path=DATASET_PATH) -> StepRunner:
+    """
+    Loading and cleaning as memoized steps: they are only recomputed when the dataset, the rules or their code change
+    """
+    steps = StepRunner(STEP_CACHE_DIR)
+    steps.source('raw_csv', path)
+
+    # last_review stays text here: missing dates are written to the cleaned file as the 'NaT' placeholder
+    @steps.step(inputs=['raw_csv'])
+    def load_raw(csv_path):
+        return read_listings(csv_path, parse_dates=False)
+
+    # null counts, filling, categories and the price filter of steps 2-4 in one pass, see cleaning.py
+    @steps.step(name='clean', inputs=['load_raw'], params={'fill_values': FILL_VALUES, 'rules': CATEGORY_RULES, 'filters': KEEP_FILTERS})
+    def clean_listings(df, fill_values, rules, filters):
+        return clean(df, fill_values, rules, filters)
+
+    return steps
+
+
 def print_dataframe_info(df, message=None, shape=False, info=False):
     if message:
         print(f"----------------{message}---------------")
@@ -34,40 +73,39 @@ def print_dataframe_info(df, message=None, shape=False, info=False):
 
 
 if __name__ == '__main__':
-    df = pd.read_csv(DATASET_PATH)
+    steps = build_steps()
+    df = steps.get('load_raw')
     assert type(df) == pd.DataFrame 
     assert df.shape == (48895, 16), 'Unexpected shape of dataframe'
     print_dataframe_info(df, message='Raw dataset', shape=True, info=True)
 
+    cleaned = steps.get('clean')
+
     # 2
-    n_nan_values = df.isna().sum(axis=0)
+    n_nan_values = cleaned.nulls_before
     print_dataframe_info(n_nan_values, message='Number of empty values')
-    df.fillna({
-        'name': 'Unknown',
-        'host_name': 'Unknown',
-        'last_review': 'NaT'
-    }, inplace=True)
 
     # 3
-    df['price_category'] = df['price'].apply(categorize_price)
-    df['length_of_stay_category'] = df['minimum_nights'].apply(categorize_price)
-    print_dataframe_info(df, message='Dataset with new price_category and length_of_stay_category', info=True)
+    print_dataframe_info(cleaned.frame, message='Dataset with new price_category and length_of_stay_category', info=True)
 
     #4 
-    number_of_empty_values = df.isna().sum(axis=0)
+    number_of_empty_values = cleaned.nulls_after
     print(f"-------------Check result of data cleaning (amount of NaN values)--------------:\n{number_of_empty_values}", end='\n\n')
-    price_category_values = df['price_category'].value_counts()
+    price_category_values = cleaned.category_counts['price_category']
     print(f"-------------New price_category column--------------\n{price_category_values}", end='\n\n')
-    length_of_stay_category_values = df['length_of_stay_category'].value_counts()
+    length_of_stay_category_values = cleaned.category_counts['length_of_stay_category']
     print(f"-------------New length_of_stay_category column---------------\n{length_of_stay_category_values}", end='\n\n')
 
-    rows_price_zero_or_less = df[df['price'] <= 0]
+    rows_price_zero_or_less = cleaned.dropped()
     print_dataframe_info(rows_price_zero_or_less, message='Subset of rows with non-positive price', shape=True)
 
-    df = df[df['price'] > 0]
+    df = cleaned.kept()
     print_dataframe_info(df, message='Dataset with filtered price', shape=True)
 
     df.to_csv(CLEANED_DATASET_PATH, index=False)
+    write_partitioned(df, CLEANED_STORE_PATH)
+    print("----------------Steps---------------")
+    print(steps.report().round(3), end="\n\n")
 
     # 6
     assert all(column in df.columns for column in ['price_category', 'length_of_stay_category']), "Missing columns"
@@ -79,4 +117,4 @@ if __name__ == '__main__':
     assert categorize_minimum_nights(30) == 'long-term'
     assert (df['price'] < 0).sum() == 0, "Negative values in 'price' column"
     assert all(df[['name', 'host_name', 'last_review']].isna().sum(axis=0) == 0), "Important columns ('name', 'host_name', 'last_review') have missing values"
-    assert pd.read_csv(CLEANED_DATASET_PATH).shape == (48884, 18), 'Cleaned dataset has unexpected shape'
+    assert read_listings(CLEANED_DATASET_PATH, cleaned=True).shape == (48884, 18), 'Cleaned dataset has unexpected shape'
@@ -1,8 +1,20 @@
+import os
+import sys
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from airbnb_schema import iter_listings, read_listings
+from group_index import group_index
+from partial_aggregates import GroupPartials, append_head, merge_partials
+from ranking import top_k
 
+
+CLEANED_DATASET_PATH = 'pandas/cleaned_airbnb_data.csv'
 OUTPUT_PATH = 'pandas/aggregated_airbnb_data.csv'
-cleaned_df = pd.read_csv('pandas/cleaned_airbnb_data.csv')
+# rankings are only printed with head(), so only the top rows are selected instead of sorting everything
+TOP_K = 5
+GROUP_KEYS = ['neighbourhood_group', 'price_category']
+GROUP_COLUMNS = ['price', 'minimum_nights', 'number_of_reviews', 'availability_365']
 
 
 def print_grouped_data(df, message=None, shape=False, info=False):
@@ -16,7 +28,8 @@ def print_grouped_data(df, message=None, shape=False, info=False):
     print(df.head(), end="\n\n")
 
 
-if __name__ == '__main__':
+def run(path=CLEANED_DATASET_PATH):
+    cleaned_df = read_listings(path, cleaned=True)
     print("1.Data Selection and Filtering")
     # Use .iloc and .loc to select specific rows and columns based on both position and labels.
     print_grouped_data(cleaned_df.loc[0:3, ['name', 'neighbourhood_group']], message='.loc usage')
@@ -31,7 +44,8 @@ if __name__ == '__main__':
     print_grouped_data(cleaned_df_subset, message='Selected columns')
     
     print("2.Aggregation and Grouping")
-    grouped_cleaned_df = cleaned_df.groupby(['neighbourhood_group', 'price_category'])
+    # group codes are computed once, the means are reused by full_grouped below
+    grouped_cleaned_df = group_index(cleaned_df, ['neighbourhood_group', 'price_category'])
     #Calculate the average price and minimum_nights for each group.
     avg_price_and_min_nights = grouped_cleaned_df.aggregate(
         mean_price=('price', 'mean'), 
@@ -47,16 +61,16 @@ if __name__ == '__main__':
     
     print("3.Data Sorting and Ranking")
     #Sort the data by price in descending order and by number_of_reviews in ascending order.
-    price_desc_reviews_asc = cleaned_df.sort_values(by=['price', 'number_of_reviews'], axis=0, ascending=[False, True])
+    price_desc_reviews_asc = top_k(cleaned_df, ['price', 'number_of_reviews'], TOP_K, ascending=[False, True])
     print_grouped_data(price_desc_reviews_asc, message='Price desc reviews asc')
     #Create a ranking of neighborhoods based on the total number of listings and the average price.
-    neighborhood_stats = cleaned_df.groupby('neighbourhood').aggregate(
+    neighborhood_stats = group_index(cleaned_df, ['neighbourhood']).aggregate(
         total_listings=('price', 'size'),
         avg_price=('price', 'mean')
     ).reset_index()
-    rank_total_listing = neighborhood_stats.sort_values(by=['total_listings'], ascending=[False])
+    rank_total_listing = top_k(neighborhood_stats, ['total_listings'], TOP_K, ascending=[False])
     print_grouped_data(rank_total_listing, message='Rank by total_listing')
-    rank_avg_price = neighborhood_stats.sort_values(by=['avg_price'], ascending=[False])
+    rank_avg_price = top_k(neighborhood_stats, ['avg_price'], TOP_K, ascending=[False])
     print_grouped_data(rank_avg_price, message='Rank by avg price')
 
     full_grouped = grouped_cleaned_df.aggregate(
@@ -66,3 +80,71 @@ if __name__ == '__main__':
         average_availability_365=('availability_365', 'mean')
     )
     full_grouped.to_csv(OUTPUT_PATH)
+
+
+def run_chunked(path, chunk_rows):
+    """
+    The same analysis for datasets that do not fit in memory: every chunk of chunk_rows rows is reduced to the
+    printed head rows, group partials and its top rows, which are merged at the end
+    """
+    heads = {'loc': [], 'iloc': [], 'neighbourhoods': [], 'selected': []}
+    group_partials, neighbourhood_partials, top_rows = [], [], []
+    for chunk in iter_listings(path, chunk_rows, cleaned=True):
+        append_head(heads['loc'], chunk.loc[0:3, ['name', 'neighbourhood_group']])
+        append_head(heads['iloc'], chunk.iloc[:, 4:6], n=3)
+        append_head(heads['neighbourhoods'], chunk[chunk['neighbourhood'].isin(['Kensington', 'Harlem'])])
+        chunk_filtered = chunk[(chunk['price'] > 100) & (chunk['number_of_reviews'] > 10)]
+        append_head(heads['selected'], chunk_filtered[['neighbourhood_group', 'price', 'minimum_nights', 'number_of_reviews', 'price_category', 'availability_365']])
+        group_partials.append(GroupPartials.from_frame(chunk, GROUP_KEYS, GROUP_COLUMNS))
+        neighbourhood_partials.append(GroupPartials.from_frame(chunk, ['neighbourhood'], ['price']))
+        # the top rows overall are among the top rows of their chunk
+        top_rows.append(top_k(chunk, ['price', 'number_of_reviews'], TOP_K, ascending=[False, True]))
+    # chunks have different categories, the concatenated head rows are compared by label
+    heads = {name: pd.concat(frames) for name, frames in heads.items()}
+
+    print("1.Data Selection and Filtering")
+    print_grouped_data(heads['loc'], message='.loc usage')
+    print_grouped_data(heads['iloc'], message='.iloc usage')
+    print_grouped_data(heads['neighbourhoods'], message='price greater than $100 and a number_of_reviews greater than 10')
+    print_grouped_data(heads['selected'], message='Selected columns')
+
+    print("2.Aggregation and Grouping")
+    grouped_partials = merge_partials(group_partials)
+    avg_price_and_min_nights = grouped_partials.aggregate(
+        mean_price=('price', 'mean'),
+        mean_minimum_nights=('minimum_nights', 'mean')
+    ).sort_values(['neighbourhood_group', 'mean_price'], ascending=[True, False])
+    print_grouped_data(avg_price_and_min_nights, message='Avg price and minimum_nights')
+    avg_number_of_reviews_and_availability_365 = grouped_partials.aggregate(
+        average_number_of_reviews=('number_of_reviews', 'mean'),
+        average_availability_365=('availability_365', 'mean')
+    ).sort_values(['neighbourhood_group'], ascending=[True])
+    print_grouped_data(avg_number_of_reviews_and_availability_365, message='Avg number_of_reviews and availability_365')
+
+    print("3.Data Sorting and Ranking")
+    price_desc_reviews_asc = top_k(pd.concat(top_rows), ['price', 'number_of_reviews'], TOP_K, ascending=[False, True])
+    print_grouped_data(price_desc_reviews_asc, message='Price desc reviews asc')
+    neighborhood_stats = merge_partials(neighbourhood_partials).aggregate(
+        total_listings=('price', 'size'),
+        avg_price=('price', 'mean')
+    ).reset_index()
+    rank_total_listing = top_k(neighborhood_stats, ['total_listings'], TOP_K, ascending=[False])
+    print_grouped_data(rank_total_listing, message='Rank by total_listing')
+    rank_avg_price = top_k(neighborhood_stats, ['avg_price'], TOP_K, ascending=[False])
+    print_grouped_data(rank_avg_price, message='Rank by avg price')
+
+    full_grouped = grouped_partials.aggregate(
+        mean_price=('price', 'mean'),
+        mean_minimum_nights=('minimum_nights', 'mean'),
+        average_number_of_reviews=('number_of_reviews', 'mean'),
+        average_availability_365=('availability_365', 'mean')
+    )
+    full_grouped.to_csv(OUTPUT_PATH)
+
+
+if __name__ == '__main__':
+    # python pandas/task2.py [chunk_rows]: with chunk_rows the dataset is processed in chunks of that many rows
+    if len(sys.argv) > 1:
+        run_chunked(CLEANED_DATASET_PATH, int(sys.argv[1]))
+    else:
+        run()
@@ -1,8 +1,28 @@
+import os
+import sys
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from airbnb_schema import iter_listings, read_listings
+from categorizer import categorize
+from csv_cache import file_hash
+from group_index import group_index
+from long_format import melt as compact_melt
+from monthly_rollup import MonthlyRollup
+from partial_aggregates import GroupPartials, append_head, merge_partials
+from step_runner import StepRunner
 
+
+CLEANED_DATASET_PATH = 'pandas/cleaned_airbnb_data.csv'
 OUTPUT_PATH = 'pandas/time_series_airbnb_data.csv'
-df = pd.read_csv('pandas/cleaned_airbnb_data.csv')
+ROLLUP_PATH = 'pandas/monthly_rollup'
+# outputs of the steps of run(), see step_runner.py
+STEP_CACHE_DIR = 'pandas/.step_cache'
+# vectorized equivalent of set_availiability_status
+AVAILABILITY_EDGES = [50, 200]
+AVAILABILITY_LABELS = ['Rarely Available', 'Occasionally Available', 'Highly Available']
+# relative error of the medians and quartiles of the chunked mode
+QUANTILE_ACCURACY = 0.005
 
 
 def set_availiability_status(n_days):
@@ -24,36 +44,133 @@ def print_analysis_results(df, message=None, shape=False, info=False):
     print(df.head(), end="\n\n")
 
 
-if __name__ == '__main__':
+def in_label_order(table: pd.DataFrame) -> pd.DataFrame:
+    # availability_status is categorical, its groups are ordered like the former object column: alphabetically
+    return table.sort_index(key=lambda level: level.astype(str))
+
+
+def update_rollup(path: str, dataset_rollup: MonthlyRollup) -> MonthlyRollup:
+    """
+    The rollup store with the partials of the dataset as its source, keyed by path: a regenerated dataset replaces
+    its previous partials, the extracts folded into the store are kept
+    """
+    rollup = MonthlyRollup(ROLLUP_PATH)
+    if rollup.set_source(os.path.abspath(path), dataset_rollup.partials, file_hash(path)):
+        rollup.save()
+    return rollup
+
+
+def build_steps(path=CLEANED_DATASET_PATH) -> StepRunner:
+    """
+    The analysis as memoized steps: a changed dataset or step only recomputes the steps that depend on it
+    """
+    steps = StepRunner(STEP_CACHE_DIR)
+    steps.source('cleaned_csv', path)
+
+    @steps.step(inputs=['cleaned_csv'])
+    def load(csv_path):
+        return read_listings(csv_path, cleaned=True)
+
     #Use the pivot_table function to create a detailed summary that reveals the average price for different combinations of neighbourhood_group and room_type. This analysis will help identify high-demand areas and optimize pricing strategies across various types of accommodations (e.g., Entire home/apt vs. Private room).
-    pivot_table = pd.pivot_table(data=df, index='neighbourhood_group', columns='room_type', values='price', aggfunc='mean')
-    print_analysis_results(pivot_table, message='Pivot table')
+    @steps.step(inputs=['load'])
+    def pivot(df):
+        return group_index(df, ['neighbourhood_group', 'room_type']).aggregate(price=('price', 'mean'))['price'].unstack('room_type')
+
     #Transform the dataset from a wide format to a long format using the melt function. This restructuring facilitates more flexible and detailed analysis of key metrics like price and minimum_nights, enabling the identification of trends, outliers, and correlations.
-    melted_df = pd.melt(df, id_vars=['name'], value_vars=['price', 'minimum_nights'], 
-                  var_name='metric', value_name='value')
-    print_analysis_results(melted_df, message='Melted table')
-    #Create a new column availability_status using the apply function, classifying each listing into one of three categories based on the availability_365 column
-    df['availability_status'] = df['availability_365'].apply(set_availiability_status)
+    #names are stored once as categories and metric as a category instead of repeated strings, see long_format.py
+    @steps.step(inputs=['load'])
+    def melt(df):
+        return compact_melt(df, id_vars=['name'], value_vars=['price', 'minimum_nights'], var_name='metric', value_name='value').to_frame()
+
+    #Create a new column availability_status, classifying each listing into one of three categories based on the availability_365 column
+    @steps.step(inputs=['load'], params={'edges': AVAILABILITY_EDGES, 'labels': AVAILABILITY_LABELS})
+    def categorize_availability(df, edges, labels):
+        return df.assign(availability_status=categorize(df['availability_365'], edges, labels, closed='left'))
+
     #Analyze trends and patterns using the new availability_status column, and investigate potential correlations between availability and other key variables like price, number_of_reviews, and neighbourhood_group to uncover insights that could inform marketing and operational strategies.
-    grouped_status_neighbour = df.groupby(['availability_status', 'neighbourhood_group'])[['price', 'number_of_reviews']].aggregate(['min', 'mean', 'median', 'max'])
-    print_analysis_results(grouped_status_neighbour, message='Grouped by status and neighbourhood_group')
+    @steps.step(inputs=['categorize_availability'])
+    def aggregate_status(df):
+        return in_label_order(group_index(df, ['availability_status', 'neighbourhood_group']).aggregate_table(['price', 'number_of_reviews'], ['min', 'mean', 'median', 'max']))
+
     #Perform basic descriptive statistics (e.g., mean, median, standard deviation) on numeric columns such as price, minimum_nights, and number_of_reviews to summarize the dataset's central tendencies and variability, which is crucial for understanding overall market dynamics.
-    describe_df = df[['price', 'minimum_nights', 'number_of_reviews']].describe()
-    print_analysis_results(describe_df, message='Descriptive statistics for price minimum_nights and number_of_reviews')
+    @steps.step(inputs=['load'])
+    def describe(df):
+        return df[['price', 'minimum_nights', 'number_of_reviews']].describe()
+
     #Convert the last_review column to a datetime object and set it as the index of the DataFrame to facilitate time-based analyses.
-    df['last_review'] = pd.to_datetime(df['last_review'])
-    df['month'] =  df['last_review'].dt.month
-    df.set_index('last_review', inplace=True)
+    #last_review is already parsed by read_listings
+    @steps.step(inputs=['categorize_availability'])
+    def time_series(df):
+        return df.assign(month=df['last_review'].dt.month).set_index('last_review')
+
+    #monthly trends are answered from the (month, neighbourhood_group) rollup store, which later extracts are folded into
+    #with `python common/monthly_rollup.py pandas/monthly_rollup extract.csv` instead of rescanning the dataset
+    @steps.step(inputs=['load'])
+    def resample(df):
+        return MonthlyRollup.from_frame(df)
+
+    return steps
+
+
+def run(path=CLEANED_DATASET_PATH):
+    steps = build_steps(path)
+    # only the printed and written steps, their inputs are not even loaded when they are cached
+    results = steps.run(['pivot', 'melt', 'aggregate_status', 'describe', 'time_series', 'resample'])
+    print_analysis_results(results['pivot'], message='Pivot table')
+    print_analysis_results(results['melt'], message='Melted table')
+    print_analysis_results(results['aggregate_status'], message='Grouped by status and neighbourhood_group')
+    print_analysis_results(results['describe'], message='Descriptive statistics for price minimum_nights and number_of_reviews')
+    rollup = update_rollup(path, results['resample'])
     #Resample the data to observe monthly trends in the number of reviews and average prices, providing insights into how demand and pricing fluctuate over time.
-    monthly_trends = df.resample('M').aggregate({
-        'price': 'mean',
-        'number_of_reviews': 'sum'
-    }).rename(columns={'price': 'avg_price', 'reviews': 'total_reviews'})
+    monthly_trends = rollup.trends()[['avg_price', 'number_of_reviews']]
     print_analysis_results(monthly_trends, message='Trends across years')
     #Group the data by month to calculate monthly averages and analyze seasonal patterns, enabling better forecasting and strategic planning around peak periods.
-    monthly_cycle_trend = df.groupby('month').aggregate({
-        'price': 'mean',
-        'number_of_reviews': 'sum'
-    }).rename(columns={'price': 'avg_price', 'reviews': 'total_reviews'})
+    monthly_cycle_trend = rollup.seasonal()[['avg_price', 'number_of_reviews']]
     print_analysis_results(monthly_cycle_trend, message='Yealry cycle trend')
-    df.to_csv(OUTPUT_PATH)
+    results['time_series'].to_csv(OUTPUT_PATH)
+    print("----------------Steps---------------")
+    print(steps.report().round(3), end="\n\n")
+
+
+def run_chunked(path, chunk_rows):
+    """
+    The same analysis for datasets that do not fit in memory: chunks of chunk_rows rows are reduced to group
+    partials, quantile sketches and the monthly rollup, and the time series file is written chunk by chunk.
+    Medians and quartiles are within QUANTILE_ACCURACY (relative) of the exact ones, the other statistics are exact
+    """
+    pivot_partials, status_partials, describe_partials, head_rows = [], [], [], []
+    dataset_rollup = MonthlyRollup()
+    for chunk_number, chunk in enumerate(iter_listings(path, chunk_rows, cleaned=True)):
+        pivot_partials.append(GroupPartials.from_frame(chunk, ['neighbourhood_group', 'room_type'], ['price']))
+        append_head(head_rows, chunk)
+        chunk['availability_status'] = categorize(chunk['availability_365'], AVAILABILITY_EDGES, AVAILABILITY_LABELS, closed='left')
+        status_partials.append(GroupPartials.from_frame(chunk, ['availability_status', 'neighbourhood_group'], ['price', 'number_of_reviews'],
+                                                        quantiles=True, accuracy=QUANTILE_ACCURACY))
+        describe_partials.append(GroupPartials.from_frame(chunk, [], ['price', 'minimum_nights', 'number_of_reviews'],
+                                                          quantiles=True, accuracy=QUANTILE_ACCURACY))
+        chunk['month'] = chunk['last_review'].dt.month
+        dataset_rollup.fold(chunk)
+        chunk.set_index('last_review', inplace=True)
+        chunk.to_csv(OUTPUT_PATH, mode='a' if chunk_number else 'w', header=not chunk_number)
+    rollup = update_rollup(path, dataset_rollup)
+
+    pivot_table = merge_partials(pivot_partials).aggregate(price=('price', 'mean'))['price'].unstack('room_type')
+    print_analysis_results(pivot_table, message='Pivot table')
+    # the head of the long format only holds the first rows of the first metric
+    melted_df = compact_melt(pd.concat(head_rows), id_vars=['name'], value_vars=['price', 'minimum_nights'],
+                             var_name='metric', value_name='value').head()
+    print_analysis_results(melted_df, message='Melted table')
+    grouped_status_neighbour = in_label_order(merge_partials(status_partials).aggregate_table(['price', 'number_of_reviews'], ['min', 'mean', 'median', 'max']))
+    print_analysis_results(grouped_status_neighbour, message='Grouped by status and neighbourhood_group')
+    describe_df = merge_partials(describe_partials).describe()
+    print_analysis_results(describe_df, message='Descriptive statistics for price minimum_nights and number_of_reviews')
+    print_analysis_results(rollup.trends()[['avg_price', 'number_of_reviews']], message='Trends across years')
+    print_analysis_results(rollup.seasonal()[['avg_price', 'number_of_reviews']], message='Yealry cycle trend')
+
+
+if __name__ == '__main__':
+    # python pandas/task3.py [chunk_rows]: with chunk_rows the dataset is processed in chunks of that many rows
+    if len(sys.argv) > 1:
+        run_chunked(CLEANED_DATASET_PATH, int(sys.argv[1]))
+    else:
+        run()